@@ -32,6 +32,44 @@ CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6381/
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default=None)
+# Una tarea por proceso a la vez: un tenant lento no retiene tareas que otro worker podría tomar
+CELERY_WORKER_PREFETCH_MULTIPLIER = config('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1, cast=int)
+
+#KPI evaluation
+KPI_ROLLUP_READS = config('KPI_ROLLUP_READS', default=True, cast=bool)
+# Revisión de índices al arrancar: solo en un servicio (celery-beat en docker-compose), no en cada proceso
+MONGO_INDEX_PROVISIONING = config('MONGO_INDEX_PROVISIONING', default=False, cast=bool)
+# Pool compartido de hilos (se limita al maxPoolSize de la conexión a MongoDB)
+EVALUATION_EXECUTOR_WORKERS = config('EVALUATION_EXECUTOR_WORKERS', default=32, cast=int)
+EVALUATION_EXECUTOR_MAX_PENDING = config('EVALUATION_EXECUTOR_MAX_PENDING', default=2000, cast=int)
+# Consultas simultáneas por proceso (event loop del worker ASGI) en la vista asíncrona `evaluate/async/`
+EVALUATION_ASYNC_CONCURRENCY = config('EVALUATION_ASYNC_CONCURRENCY', default=16, cast=int)
+# Caché de resultados (filtros no persistidos) invalidada por versión de datos
+EVALUATION_RESULT_CACHE = config('EVALUATION_RESULT_CACHE', default=True, cast=bool)
+EVALUATION_RESULT_CACHE_TTL = config('EVALUATION_RESULT_CACHE_TTL', default=86400, cast=int)
+# Hora local (America/Guayaquil) del precálculo nocturno de los filtros guardables
+EVALUATION_PRECOMPUTE_HOUR = config('EVALUATION_PRECOMPUTE_HOUR', default=3, cast=int)
+# Cola de eventos de tasklog (Redis Stream con grupo de consumidores)
+TASKLOG_STREAM_BATCH_SIZE = config('TASKLOG_STREAM_BATCH_SIZE', default=500, cast=int)
+# Debe superar la espera en cola de los subtasks de recálculo para no reclamarlos dos veces
+TASKLOG_STREAM_CLAIM_IDLE_MS = config('TASKLOG_STREAM_CLAIM_IDLE_MS', default=900000, cast=int)
+# Entregas sin confirmar antes de apartar un evento en tasklog_events:dead
+TASKLOG_STREAM_MAX_DELIVERIES = config('TASKLOG_STREAM_MAX_DELIVERIES', default=5, cast=int)
+TASKLOG_EVENT_CONSUMERS = config('TASKLOG_EVENT_CONSUMERS', default=4, cast=int)
+# Tope por corrida de cada consumidor (la corrida se programa cada minuto)
+TASKLOG_DRAIN_MAX_EVENTS = config('TASKLOG_DRAIN_MAX_EVENTS', default=20000, cast=int)
+TASKLOG_DRAIN_MAX_SECONDS = config('TASKLOG_DRAIN_MAX_SECONDS', default=50, cast=int)
+# Margen desde la última actualización del tasklog antes de procesar su evento
+TASKLOG_EVENT_BUFFER_SECONDS = config('TASKLOG_EVENT_BUFFER_SECONDS', default=60, cast=int)
+TASKLOG_SCHEDULER_POLL_SECONDS = config('TASKLOG_SCHEDULER_POLL_SECONDS', default=1.0, cast=float)
+# Ventana para descartar eventos repetidos (mismo tasklog _id y Ultima_actualizacion)
+TASKLOG_DEDUPE_TTL_SECONDS = config('TASKLOG_DEDUPE_TTL_SECONDS', default=86400, cast=int)
+# Recálculo de cada (tenant, tarea, lote de colaboradores) como subtask de celery
+TASKLOG_GROUP_FANOUT = config('TASKLOG_GROUP_FANOUT', default=True, cast=bool)
+TASKLOG_GROUP_BATCH_SIZE = config('TASKLOG_GROUP_BATCH_SIZE', default=50, cast=int)
+# Chord con callback de fin de lote (requiere CELERY_RESULT_BACKEND)
+TASKLOG_GROUP_CHORD = config('TASKLOG_GROUP_CHORD', default=False, cast=bool)
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -6,8 +6,9 @@ class EvaluationConfig(AppConfig):
     name = 'evaluation'
 
     def ready(self):
-        from django_celery_beat.models import PeriodicTask, IntervalSchedule
+        from django_celery_beat.models import PeriodicTask, IntervalSchedule, CrontabSchedule
         from django.db.utils import OperationalError, ProgrammingError
+        from django.conf import settings
 
         try:
             schedule, _ = IntervalSchedule.objects.get_or_create(
@@ -28,5 +29,36 @@ class EvaluationConfig(AppConfig):
             else:
                 logging.info("ℹ️ La tarea periódica 'Process tasklogs' ya existe.")
 
+            # Precálculo nocturno de los filtros guardables (ultimo_mes, ultimo_trimestre...)
+            crontab, _ = CrontabSchedule.objects.get_or_create(
+                minute='0',
+                hour=str(settings.EVALUATION_PRECOMPUTE_HOUR),
+                day_of_week='*',
+                day_of_month='*',
+                month_of_year='*',
+                timezone='America/Guayaquil'
+            )
+
+            precompute_name = 'Precompute cacheable evaluations'
+            precompute_task = PeriodicTask.objects.filter(name=precompute_name).first()
+
+            if precompute_task is None:
+                PeriodicTask.objects.create(
+                    crontab=crontab,
+                    name=precompute_name,
+                    task='evaluation.tasks.precompute_cacheable_evaluations',
+                    enabled=True
+                )
+                logging.info("✅ Tarea periódica 'Precompute cacheable evaluations' registrada automáticamente.")
+            elif precompute_task.crontab_id != crontab.id:
+                # Cambió EVALUATION_PRECOMPUTE_HOUR
+                precompute_task.crontab = crontab
+                precompute_task.save()
+
         except (OperationalError, ProgrammingError):
-            logging.warning("⚠️ La tarea periódica no se registró (migraciones no aplicadas aún).")
\ No newline at end of file
+            logging.warning("⚠️ Las tareas periódicas no se registraron (migraciones no aplicadas aún).")
+
+        # Índices de MongoDB derivados de los KPIs de cada tenant (solo en el servicio que lo activa)
+        if settings.MONGO_INDEX_PROVISIONING:
+            from evaluation.services.index_provisioning import start_index_provisioning
+            start_index_provisioning()
\ No newline at end of file
@@ -1,30 +1,35 @@
+from asgiref.sync import sync_to_async
 from evaluation.services.departments_analysis import get_employees_by_department
 from evaluation.services.evaluations_analysis import (
     calculate_single_employee_evaluation,
     calculate_evaluation_for_employees,
     calculate_evaluation_for_department
 )
+from evaluation.services.async_evaluations import (
+    acalculate_single_employee_evaluation,
+    acalculate_evaluation_for_employees
+)
 
 class EvaluationCalculationStrategy:
-    def calculate(self, tenant_id, filter_range, start_date_str, end_date_str, employee_id=None, evaluation_id=None, department_id=None):
+    def calculate(self, tenant_id, filter_range, start_date_str, end_date_str, employee_id=None, evaluation_id=None, department_id=None, **options):
         raise NotImplementedError("Subclasses should implement this method")
 
 
 class DepartmentBasedEvaluation(EvaluationCalculationStrategy):
-    def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None):
+    def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None, **options):
         print("Using DepartmentBasedEvaluation Strategy")
         # Lógica para recuperar empleados por departamento y calcular evaluación
         employees, dept_meta = get_employees_by_department(tenant_id, department_id)
         return calculate_evaluation_for_department(tenant_id, employees, filter_range, start_date_str, end_date_str, dept_meta)
 
 class EvaluationBasedEvaluation(EvaluationCalculationStrategy):
-    def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None):
+    def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None, **options):
         print("Using EvaluationBasedEvaluation Strategy")
         # Lógica para recuperar empleados asignados a la evaluación y calcular evaluación
-        return calculate_evaluation_for_employees(tenant_id, evaluation_id, filter_range, start_date_str, end_date_str)
+        return calculate_evaluation_for_employees(tenant_id, evaluation_id, filter_range, start_date_str, end_date_str, **options)
 
 class EmployeeBasedEvaluation(EvaluationCalculationStrategy):
-    def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None):
+    def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None, **options):
         print("Using EmployeeBasedEvaluation Strategy")
         # Lógica para calcular la evaluación para un solo empleado
         return calculate_single_employee_evaluation(tenant_id, evaluation_id, employee_id, filter_range, start_date_str, end_date_str)
@@ -36,5 +41,38 @@ class EvaluationContext:
     def set_strategy(self, strategy: EvaluationCalculationStrategy):
         self._strategy = strategy
 
-    def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None):
-        return self._strategy.calculate(tenant_id, filter_range, start_date_str, end_date_str, employee_id, evaluation_id, department_id)
+    def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None, **options):
+        return self._strategy.calculate(tenant_id, filter_range, start_date_str, end_date_str, employee_id, evaluation_id, department_id, **options)
+
+
+class AsyncEvaluationCalculationStrategy:
+    async def calculate(self, tenant_id, filter_range, start_date_str, end_date_str, employee_id=None, evaluation_id=None, department_id=None, **options):
+        raise NotImplementedError("Subclasses should implement this method")
+
+
+class AsyncDepartmentBasedEvaluation(AsyncEvaluationCalculationStrategy):
+    async def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None, **options):
+        # El cálculo por departamento agrupa varias evaluaciones: se reutiliza la versión síncrona fuera del event loop
+        return await sync_to_async(DepartmentBasedEvaluation().calculate, thread_sensitive=False)(
+            tenant_id, filter_range, start_date_str, end_date_str, employee_id, evaluation_id, department_id
+        )
+
+class AsyncEvaluationBasedEvaluation(AsyncEvaluationCalculationStrategy):
+    async def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None, **options):
+        print("Using AsyncEvaluationBasedEvaluation Strategy")
+        return await acalculate_evaluation_for_employees(tenant_id, evaluation_id, filter_range, start_date_str, end_date_str, **options)
+
+class AsyncEmployeeBasedEvaluation(AsyncEvaluationCalculationStrategy):
+    async def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None, **options):
+        print("Using AsyncEmployeeBasedEvaluation Strategy")
+        return await acalculate_single_employee_evaluation(tenant_id, evaluation_id, employee_id, filter_range, start_date_str, end_date_str)
+
+class AsyncEvaluationContext:
+    def __init__(self, strategy: AsyncEvaluationCalculationStrategy):
+        self._strategy = strategy
+
+    def set_strategy(self, strategy: AsyncEvaluationCalculationStrategy):
+        self._strategy = strategy
+
+    async def calculate(self, tenant_id, filter_range, start_date_str=None, end_date_str=None, employee_id=None, evaluation_id=None, department_id=None, **options):
+        return await self._strategy.calculate(tenant_id, filter_range, start_date_str, end_date_str, employee_id, evaluation_id, department_id, **options)
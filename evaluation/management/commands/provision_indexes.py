@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from evaluation.services.index_provisioning import provision_all_indexes
+
+
+class Command(BaseCommand):
+    help = "Crea en cada tenant los índices que necesitan las consultas de KPIs (tasklog) y de historial."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tenant", action="append", dest="tenants",
+                            help="Tenant a revisar (se puede repetir). Por defecto, todos los tenant_*.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Solo reporta los índices que faltan, sin crearlos.")
+        parser.add_argument("--dedupe", action="store_true",
+                            help="Elimina los documentos de historial repetidos y crea los índices únicos.")
+
+    def handle(self, *args, **options):
+        report = provision_all_indexes(options["tenants"], dry_run=options["dry_run"], dedupe=options["dedupe"])
+
+        for entry in report:
+            keys = ", ".join(f"{k}: {d}" for k, d in entry["keys"])
+            line = f"[{entry['status']}] {entry['tenant']} {entry['collection']} {{{keys}}}"
+            if entry.get("replaced"):
+                line += f" (reemplaza {entry['replaced']}, {entry.get('removed_duplicates', 0)} duplicados eliminados)"
+            if entry.get("pending_unique"):
+                line += " (hay documentos repetidos, sin índice único: ejecuta con --dedupe)"
+            if entry["status"] == "created":
+                self.stdout.write(self.style.SUCCESS(line))
+            elif entry["status"] in ("missing", "skipped", "error"):
+                self.stdout.write(self.style.WARNING(f"{line} {entry.get('error', '')}".rstrip()))
+            else:
+                self.stdout.write(line)
+
+        created = sum(1 for e in report if e["status"] == "created")
+        missing = [e for e in report if e["status"] in ("missing", "skipped", "error")]
+        self.stdout.write(f"Índices creados: {created}. Sin crear: {len(missing)}.")
+
+        if missing and not options["dry_run"]:
+            raise CommandError("Algunos índices no se pudieron crear.")
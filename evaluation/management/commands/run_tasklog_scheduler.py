@@ -0,0 +1,37 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from redis.exceptions import RedisError
+from evaluation.tasks import consume_tasklog_events
+from evaluation.utils.tasklog_stream import get_next_due_timestamp, promote_due_events
+
+
+class Command(BaseCommand):
+    help = "Pasa al stream de tasklog los eventos diferidos apenas vence su margen y lanza su procesamiento."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=settings.TASKLOG_SCHEDULER_POLL_SECONDS,
+                            help="Espera máxima en segundos entre revisiones del sorted set.")
+
+    def handle(self, *args, **options):
+        poll_interval = options["poll_interval"]
+        batch_size = settings.TASKLOG_STREAM_BATCH_SIZE
+        self.stdout.write(f"⏰ Planificador de eventos tasklog iniciado (revisión cada {poll_interval}s)")
+
+        while True:
+            try:
+                promoted = promote_due_events(batch_size)
+                if promoted:
+                    self.stdout.write(f"📤 Eventos vencidos enviados al stream: {promoted}")
+                    consume_tasklog_events.delay()
+                if promoted >= batch_size:
+                    continue  # Quedan más vencidos
+
+                # Solo se consulta el siguiente vencimiento: los eventos que no vencen no cuestan nada
+                next_due = get_next_due_timestamp()
+            except RedisError as e:
+                self.stderr.write(f"❌ Error en el planificador: {e}")
+                next_due = None
+
+            wait = poll_interval if next_due is None else min(poll_interval, max(next_due - time.time(), 0))
+            time.sleep(wait)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from evaluation.services.index_verification import verify_all_indexes
+
+
+class Command(BaseCommand):
+    help = "Verifica con explain que las búsquedas de KPIs e historial de cada tenant usan un índice."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tenant", action="append", dest="tenants",
+                            help="Tenant a revisar (se puede repetir). Por defecto, todos los tenant_*.")
+
+    def handle(self, *args, **options):
+        report = verify_all_indexes(options["tenants"])
+
+        for entry in report:
+            line = f"[{entry['status']}] {entry['tenant']} {entry['collection']} {entry['lookup']} {{{', '.join(entry['fields'])}}}"
+            if entry["status"] == "index":
+                self.stdout.write(self.style.SUCCESS(f"{line} → {', '.join(entry['indexes'])}"))
+            elif entry["status"] in ("collscan", "error"):
+                self.stdout.write(self.style.WARNING(f"{line} {entry.get('error', '')}".rstrip()))
+            else:
+                self.stdout.write(line)
+
+        failed = [e for e in report if e["status"] in ("collscan", "error")]
+        self.stdout.write(f"Búsquedas revisadas: {len(report)}. Sin índice: {len(failed)}.")
+
+        if failed:
+            raise CommandError("Algunas búsquedas hacen collection scan. Ejecuta provision_indexes.")
@@ -1,4 +1,8 @@
-from pymongo import MongoClient
+import asyncio
+import os
+import threading
+import weakref
+from pymongo import AsyncMongoClient, MongoClient
 from django.conf import settings
 from decouple import config  # Importamos config de python-decouple
 
@@ -6,8 +10,24 @@ from decouple import config  # Importamos config de python-decouple
 db_connection_string = config('DB_CONNECTION_STRING')
 print(f"DB_CONNECTION_STRING: {db_connection_string}")  # Imprimir para verificar que se carga correctamente
 
-# Crear la conexión a MongoDB
-client = MongoClient(db_connection_string)
+# Conexión a MongoDB: una por proceso. MongoClient no es seguro tras un fork (workers prefork de
+# celery o gunicorn), así que el proceso hijo crea la suya la primera vez que la usa.
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = MongoClient(db_connection_string)
+                _client_pid = os.getpid()
+    return _client
+
+# Clientes asíncronos: cada event loop necesita el suyo. Con ASGI hay un solo loop por worker;
+# con WSGI cada vista asíncrona corre en un loop nuevo y su cliente se cierra con `close_async_client`.
+_async_clients = weakref.WeakKeyDictionary()
 
 def pluralize_tenant(tenant_id):
     if tenant_id.endswith('y') and tenant_id[-2] not in 'aeiou':
@@ -25,10 +45,8 @@ def get_collection(tenant_id, collection_base):
     :param collection_base: El nombre base de la colección (ej: 'tasklog', 'employee')
     :return: Colección de pymongo lista para usar.
     """
-    db_name = f"tenant_{tenant_id}"
-    plural_tenant = pluralize_tenant(tenant_id)
-    collection_name = f"{collection_base}_{plural_tenant}"
-    db = client[db_name]
+    db_name, collection_name = get_collection_names(tenant_id, collection_base)
+    db = get_client()[db_name]
 
     #print(f"Conectando al client {client} -----------------------------> '")
     #print(f"Conectando al db_name {db_name} con colección 'evaluation'")
@@ -36,4 +54,29 @@ def get_collection(tenant_id, collection_base):
     #print(f"Conectando a la colección {collection_name} con colección 'evaluation'")
     #print(f"Conectando a la base de datos {db} con colección 'evaluation'")
 
-    return db[collection_name]
\ No newline at end of file
+    return db[collection_name]
+
+def get_collection_names(tenant_id, collection_base):
+    plural_tenant = pluralize_tenant(tenant_id)
+    return f"tenant_{tenant_id}", f"{collection_base}_{plural_tenant}"
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = AsyncMongoClient(db_connection_string)
+        _async_clients[loop] = async_client
+    return async_client
+
+async def close_async_client():
+    async_client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if async_client is not None:
+        await async_client.close()
+
+def get_async_collection(tenant_id, collection_base):
+    """
+    Igual que `get_collection`, pero con el driver asíncrono de pymongo
+    (debe llamarse dentro de un event loop).
+    """
+    db_name, collection_name = get_collection_names(tenant_id, collection_base)
+    return get_async_client()[db_name][collection_name]
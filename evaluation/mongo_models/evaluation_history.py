@@ -1,4 +1,4 @@
-from mongoengine import Document, ObjectIdField, FloatField, StringField, ListField, EmbeddedDocument, EmbeddedDocumentField, DateTimeField
+from mongoengine import Document, ObjectIdField, FloatField, StringField, ListField, EmbeddedDocument, EmbeddedDocumentField, DateTimeField, DynamicField
 
 class KPINote(EmbeddedDocument):
     kpi_id = ObjectIdField(required=True)
@@ -17,25 +17,29 @@ class KPISection(EmbeddedDocument):
     notas_kpis = ListField(EmbeddedDocumentField(KPINote))
 
 class EvaluationHistory(Document):
-    employee_id = ObjectIdField(required=True)
-    evaluacion_id = ObjectIdField()
+    # Campos tal como los guarda `save_or_update_evaluation` (ids como texto)
+    employee_id = StringField(required=True)
+    evaluacion_id = StringField()
     department = StringField()
     cargo = StringField()
     nota_final = FloatField()
     desempenio = StringField()
     color = StringField()
     notas_por_seccion = ListField(EmbeddedDocumentField(KPISection))
-    filter_range = StringField()  # Ejemplo: 'ultimo_mes', 'ultimo_trimestre', etc.
-    start_date = DateTimeField()
-    end_date = DateTimeField()
+    filter_name = StringField()  # Ejemplo: 'ultimo_mes', 'ultimo_trimestre', etc.
+    start_date = DynamicField()
+    end_date = DynamicField()
     created_at = DateTimeField()
     
     meta = {
-        'collection': 'kpi_evaluation_history',
+        'collection': 'evaluationhistory',
+        # Los índices de cada tenant los crea `provision_indexes` (ver index_provisioning.HISTORY_INDEXES)
+        'auto_create_index': False,
         'indexes': [
-            'employee_id',
-            'evaluacion_id',
-            'filter_range',
-            ('start_date', 'end_date')
+            {
+                'fields': ['employee_id', 'evaluacion_id', 'filter_name', 'start_date', 'end_date'],
+                'unique': True,
+                'partialFilterExpression': {'employee_id': {'$exists': True}},
+            },
         ]
     }
\ No newline at end of file
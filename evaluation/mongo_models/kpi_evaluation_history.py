@@ -13,13 +13,18 @@ class KpiEvaluationHistory(Document):
     Numero_de_Dias_laborales = FloatField(1)
     Numero_de_Dias_no_laborales = FloatField(0)
     Fecha_de_creacion = DateTimeField()
+    colaboradorId = ObjectIdField()  # Solo en las notas de KPIs de tipo evaluación
 
     meta = {
-        'collection': 'kpi_evaluation_history',
+        'collection': 'kpievaluationhistory',
+        # Los índices de cada tenant los crea `provision_indexes` (ver index_provisioning.HISTORY_INDEXES)
+        'auto_create_index': False,
         'indexes': [
-            'employeeId',
-            'kpiId',
-            'Fecha_de_inicio',
-            'Fecha_de_fin'
+            {
+                'fields': ['employeeId', 'kpiId', 'Fecha_de_inicio', 'Fecha_de_fin'],
+                'unique': True,
+                'partialFilterExpression': {'employeeId': {'$exists': True}},
+            },
+            ('colaboradorId', 'kpiId', 'labelId'),
         ]
     }
\ No newline at end of file
@@ -0,0 +1,386 @@
+"""
+Versión asíncrona de `/evaluate` (evaluación completa y un solo colaborador).
+
+Toda la lectura (evaluación en Redis, perfiles, historial, notas, rangos y agregaciones de KPIs)
+se hace con los drivers asíncronos de MongoDB y Redis, en paralelo con `asyncio.gather`.
+Cada solicitud limita sus consultas simultáneas con un semáforo de
+`EVALUATION_ASYNC_CONCURRENCY`. El cálculo de las notas (solo CPU) reutiliza las funciones
+síncronas en un único `asyncio.to_thread`.
+"""
+
+import asyncio
+import json
+import logging
+import weakref
+from bson import ObjectId
+from django.conf import settings
+from evaluation.mongo_client import get_async_collection
+from evaluation.utils.redis_client import get_async_redis_client
+from evaluation.services.custom_performance import cache_range_classifier, get_cached_range_classifier
+from evaluation.services.evaluation_cache import (
+    EVALUATION_CACHE_TTL,
+    EVALUATION_PROJECTION,
+    KPI_PROJECTION,
+    enrich_evaluation,
+    get_evaluation_cache_key,
+    get_evaluation_kpi_ids,
+)
+from evaluation.services.evaluations_analysis import (
+    CACHEABLE_FILTERS,
+    DEFAULT_PAGE_SIZE,
+    DEFAULT_SORT_BY,
+    EMPLOYEE_PROFILE_PROJECTION,
+    EVALUATION_NOTES_PROJECTION,
+    build_evaluation_notes_match,
+    build_roster_page_response,
+    build_roster_response,
+    build_single_employee_result,
+    calculate_employee_evaluation,
+    define_date_ranges,
+    flush_evaluation_saves,
+    group_metric_kpis_by_task,
+    index_evaluation_notes,
+    parse_sort_by,
+    select_roster_rows_to_compute,
+)
+from evaluation.services.holiday_calendar import get_tenant_holidays
+from evaluation.services.result_cache import lookup_cached_results, store_cached_results
+from evaluation.services.index_provisioning import ensure_kpi_indexes
+from evaluation.services.kpi_calculator import (
+    build_fused_kpi_queries,
+    build_roster_kpi_results,
+    read_fused_kpi_values,
+)
+from evaluation.services.kpi_rollups import (
+    MAX_RAW_WINDOWS,
+    build_rollup_pipeline,
+    combine_rollup_values,
+    get_rollup_positions,
+    plan_rollup_windows,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Un semáforo por event loop: con ASGI hay un solo loop por worker, así el límite es del proceso
+_query_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_query_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _query_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(settings.EVALUATION_ASYNC_CONCURRENCY)
+        _query_semaphores[loop] = semaphore
+    return semaphore
+
+
+#<-------------------------------------------CONSULTAS CON LÍMITE DE CONCURRENCIA------------------------------------------------------------->
+# El semáforo se toma solo alrededor de cada consulta, nunca mientras se esperan otras tareas
+
+async def find_one_limited(semaphore, collection, *args):
+    async with semaphore:
+        return await collection.find_one(*args)
+
+async def find_limited(semaphore, collection, *args):
+    async with semaphore:
+        return await collection.find(*args).to_list(None)
+
+async def aggregate_limited(semaphore, collection, pipeline, **kwargs):
+    async with semaphore:
+        cursor = await collection.aggregate(pipeline, **kwargs)
+        return await cursor.to_list(None)
+
+
+#<-------------------------------------------EVALUACIÓN Y DATOS DE LA NÓMINA------------------------------------------------------------------>
+async def aget_cached_or_fresh_evaluation(tenant_id, evaluation_id, semaphore):
+    # Igual que `get_cached_or_fresh_evaluation`
+    redis = get_async_redis_client()
+    key = get_evaluation_cache_key(tenant_id, evaluation_id)
+
+    cached = await redis.get(key)
+    if cached:
+        return json.loads(cached)
+
+    evaluation = await find_one_limited(
+        semaphore, get_async_collection(tenant_id, 'evaluation'), {"_id": ObjectId(evaluation_id)}, EVALUATION_PROJECTION
+    )
+    if not evaluation:
+        return None, "Evaluación no encontrada"
+
+    kpis = await find_limited(
+        semaphore, get_async_collection(tenant_id, 'kpi'), {"_id": {"$in": get_evaluation_kpi_ids(evaluation)}}, KPI_PROJECTION
+    )
+    await asyncio.to_thread(ensure_kpi_indexes, tenant_id, kpis)
+
+    enrich_evaluation(evaluation, kpis)
+
+    await redis.setex(key, EVALUATION_CACHE_TTL, json.dumps(evaluation, default=str))
+    return evaluation
+
+async def aprefetch_employee_profiles(tenant_id, employee_ids, semaphore):
+    if not employee_ids:
+        return {}
+
+    employees = await find_limited(
+        semaphore, get_async_collection(tenant_id, 'employee'),
+        {"_id": {"$in": [ObjectId(str(e)) for e in employee_ids]}}, EMPLOYEE_PROFILE_PROJECTION
+    )
+    return {str(employee["_id"]): employee for employee in employees}
+
+async def aprefetch_evaluation_history(tenant_id, evaluation_id, employee_ids, filter_range, start_date, end_date, semaphore):
+    if filter_range not in CACHEABLE_FILTERS or not employee_ids:
+        return {}
+
+    docs = await find_limited(semaphore, get_async_collection(tenant_id, 'evaluationhistory'), {
+        "employee_id": {"$in": [str(e) for e in employee_ids]},
+        "evaluacion_id": str(evaluation_id),
+        "filter_name": filter_range,
+        "start_date": start_date,
+        "end_date": end_date
+    })
+    return {doc["employee_id"]: doc for doc in docs}
+
+async def aprefetch_evaluation_notes(tenant_id, evaluation, colaborador_ids, semaphore):
+    match = build_evaluation_notes_match(evaluation, colaborador_ids)
+    if match is None:
+        return {}
+
+    docs = await find_limited(
+        semaphore, get_async_collection(tenant_id, 'kpievaluationhistory'), match, EVALUATION_NOTES_PROJECTION
+    )
+    return index_evaluation_notes(docs)
+
+async def aget_range_classifier(tenant_id, semaphore):
+    # Igual que `get_range_classifier`: los rangos se leen solo si el clasificador en memoria expiró
+    classifier = get_cached_range_classifier(tenant_id)
+    if classifier is not None:
+        return classifier
+
+    docs = await find_limited(semaphore, get_async_collection(tenant_id, 'metadataevaluationrange'), {})
+    return cache_range_classifier(tenant_id, docs)
+
+
+#<-------------------------------------------KPIS DE MÉTRICAS------------------------------------------------------------------------------------>
+async def aaggregate_fused_kpi_values(task_id, kpis, tenant_id, colaborador_ids, start_date, end_date, semaphore, windows=None):
+    # Igual que `aggregate_fused_kpi_values`: una agregación por `Filtro_de_fecha`, todas en paralelo
+    if not kpis or not colaborador_ids:
+        return [{} for _ in kpis]
+
+    task_logs_collection = get_async_collection(tenant_id, 'tasklog')
+    queries = build_fused_kpi_queries(task_id, kpis, colaborador_ids, start_date, end_date, windows)
+    docs_per_query = await asyncio.gather(*(
+        aggregate_limited(semaphore, task_logs_collection, pipeline, allowDiskUse=True) for _, pipeline in queries
+    ))
+    return read_fused_kpi_values(kpis, queries, docs_per_query)
+
+async def aget_fused_kpi_evaluations(task_id, kpis, tenant_id, colaborador_ids, start_date, end_date, holidays, semaphore):
+    values = await aaggregate_fused_kpi_values(task_id, kpis, tenant_id, colaborador_ids, start_date, end_date, semaphore)
+    return build_roster_kpi_results(kpis, values, tenant_id, colaborador_ids, start_date, end_date, holidays)
+
+async def aget_rollup_kpi_evaluations(task_id, kpis, tenant_id, colaborador_ids, start_date, end_date, holidays, semaphore):
+    # Igual que `get_rollup_kpi_evaluations`
+    pipeline = build_rollup_pipeline(kpis, colaborador_ids, start_date, end_date)
+    docs = await aggregate_limited(semaphore, get_async_collection(tenant_id, 'kpievaluationhistory'), pipeline)
+    totals, windows = plan_rollup_windows(docs[0] if docs else None, kpis, colaborador_ids, start_date, end_date)
+
+    total_windows = sum(len(w) for w in windows.values())
+    if total_windows > MAX_RAW_WINDOWS:
+        logger.info("Rollups incompletos (%s intervalos sin cubrir), se consulta tasklog completo", total_windows)
+        return await aget_fused_kpi_evaluations(
+            task_id, kpis, tenant_id, colaborador_ids, start_date, end_date, holidays, semaphore
+        )
+
+    raw_values = await aaggregate_fused_kpi_values(
+        task_id, kpis, tenant_id, colaborador_ids, start_date, end_date, semaphore, windows
+    )
+    values = combine_rollup_values(kpis, colaborador_ids, totals, raw_values)
+    return build_roster_kpi_results(kpis, values, tenant_id, colaborador_ids, start_date, end_date, holidays)
+
+async def aget_task_kpi_evaluations(task_id, kpis, tenant_id, colaborador_ids, start_date, end_date, holidays, semaphore):
+    # Igual que `get_task_kpi_evaluations`, con la parte de tasklog y la de rollups en paralelo
+    if not kpis or not colaborador_ids:
+        return [{} for _ in kpis]
+
+    rollup_positions = get_rollup_positions(kpis, start_date, end_date)
+    raw_positions = [i for i in range(len(kpis)) if i not in rollup_positions]
+
+    groups = []
+    if raw_positions:
+        groups.append((raw_positions, aget_fused_kpi_evaluations(
+            task_id, [kpis[i] for i in raw_positions], tenant_id, colaborador_ids, start_date, end_date, holidays, semaphore
+        )))
+    if rollup_positions:
+        groups.append((rollup_positions, aget_rollup_kpi_evaluations(
+            task_id, [kpis[i] for i in rollup_positions], tenant_id, colaborador_ids, start_date, end_date, holidays, semaphore
+        )))
+
+    results = [{} for _ in kpis]
+    outputs = await asyncio.gather(*(coro for _, coro in groups))
+    for (positions, _), group_results in zip(groups, outputs):
+        for position, kpi_results in zip(positions, group_results):
+            results[position] = kpi_results
+    return results
+
+async def aget_roster_kpi_results(evaluation, tenant_id, colaborador_ids, start_date, end_date, holidays, semaphore):
+    # Igual que `get_roster_kpi_results`: {kpi_id: {colaborador_id: resultado}}, una tarea por vez en paralelo
+    kpis_by_task = group_metric_kpis_by_task(evaluation)
+    if not kpis_by_task or not colaborador_ids:
+        return {}
+
+    items = list(kpis_by_task.items())
+    fused_per_task = await asyncio.gather(*(
+        aget_task_kpi_evaluations(
+            task_id, [info for _, info in task_kpis], tenant_id, colaborador_ids, start_date, end_date, holidays, semaphore
+        )
+        for task_id, task_kpis in items
+    ))
+
+    return {
+        kpi_id: kpi_results
+        for (_, task_kpis), fused in zip(items, fused_per_task)
+        for (kpi_id, _), kpi_results in zip(task_kpis, fused)
+    }
+
+
+#<-------------------------------------------ESTRATEGIAS ASÍNCRONAS--------------------------------------------------------------------------->
+async def acalculate_evaluation_for_employees(tenant_id, evaluation_id, filter_range, start_date_str, end_date_str,
+                                              page=None, page_size=DEFAULT_PAGE_SIZE, sort_by=DEFAULT_SORT_BY):
+    semaphore = get_query_semaphore()
+
+    # Paso 1: Evaluación y feriados del tenant
+    evaluation, holidays = await asyncio.gather(
+        aget_cached_or_fresh_evaluation(tenant_id, evaluation_id, semaphore),
+        asyncio.to_thread(get_tenant_holidays, tenant_id),
+    )
+    if not isinstance(evaluation, dict):
+        return {"error": "No se encontró la evaluación con el ID proporcionado."}
+
+    evaluados = evaluation.get("Evaluados", [])
+    if not evaluados:
+        logger.error("No se encontraron empleados para evaluar en esta evaluación.")
+        return {"error": "No se encontraron empleados para evaluar."}
+
+    # Paso 2: Calcular fechas
+    start_start_date, end_start_date, dias_laborables, dias_no_laborables = define_date_ranges(
+        filter_range, start_date_str, end_date_str, evaluation['Dias_no_laborables'], holidays
+    )
+
+    # Paso 3: Perfiles, evaluaciones guardadas y rangos de desempeño
+    employees, history, classifier = await asyncio.gather(
+        aprefetch_employee_profiles(tenant_id, evaluados, semaphore),
+        aprefetch_evaluation_history(
+            tenant_id, evaluation["_id"], evaluados, filter_range, start_start_date, end_start_date, semaphore
+        ),
+        aget_range_classifier(tenant_id, semaphore),
+    )
+
+    if page is not None:
+        # Paso 4: Solo se calculan las filas de la página (o las que faltan para ordenar por nota)
+        sort_field, descending = parse_sort_by(sort_by)
+        compute_ids, page_ids = select_roster_rows_to_compute(
+            evaluados, employees, history, sort_field, descending, page, page_size
+        )
+        notes = await aprefetch_evaluation_notes(tenant_id, evaluation, compute_ids, semaphore)
+
+        # Filtros no persistidos: las filas ya calculadas en otra página salen de la caché de resultados
+        cached_rows, stamps = {}, {}
+        if filter_range not in CACHEABLE_FILTERS:
+            cached_rows, stamps = await asyncio.to_thread(
+                lookup_cached_results, tenant_id, evaluation, compute_ids, start_start_date, end_start_date, employees, notes
+            )
+        pending_ids = [e for e in compute_ids if str(e) not in cached_rows]
+        roster_results = await aget_roster_kpi_results(
+            evaluation, tenant_id, pending_ids, start_start_date, end_start_date, holidays, semaphore
+        )
+
+        def score_page():
+            pending_saves = []
+            resultados = [
+                calculate_employee_evaluation(
+                    tenant_id, evaluation, employee, filter_range, start_start_date, end_start_date, roster_results,
+                    employees, {}, notes, classifier, pending_saves)
+                for employee in pending_ids
+            ]
+            flush_evaluation_saves(tenant_id, pending_saves)
+            computed = {str(e): r for e, r in zip(pending_ids, resultados) if isinstance(r, dict)}
+            store_cached_results(tenant_id, str(evaluation["_id"]), computed, stamps, start_start_date, end_start_date)
+            computed.update(cached_rows)
+            return build_roster_page_response(
+                evaluados, employees, history, computed, page_ids, sort_field, descending, page, page_size,
+                start_start_date, end_start_date, dias_laborables
+            )
+
+        return await asyncio.to_thread(score_page)
+
+    # Paso 4: KPIs de métricas y notas de evaluación para quienes no tienen evaluación guardada
+    pending_ids = [e for e in evaluados if str(e) not in history]
+    roster_results, notes = await asyncio.gather(
+        aget_roster_kpi_results(evaluation, tenant_id, pending_ids, start_start_date, end_start_date, holidays, semaphore),
+        aprefetch_evaluation_notes(tenant_id, evaluation, pending_ids, semaphore),
+    )
+
+    # Paso 5: Notas de cada colaborador (solo CPU) fuera del event loop
+    def score():
+        pending_saves = []
+        resultados = [
+            calculate_employee_evaluation(
+                tenant_id, evaluation, employee, filter_range, start_start_date, end_start_date, roster_results,
+                employees, history, notes, classifier, pending_saves)
+            for employee in evaluados
+        ]
+        flush_evaluation_saves(tenant_id, pending_saves)
+        return resultados
+
+    resultados = await asyncio.to_thread(score)
+
+    return build_roster_response(resultados, len(evaluados), start_start_date, end_start_date, dias_laborables)
+
+async def acalculate_single_employee_evaluation(tenant_id, evaluation_id, employee_id, filter_range, start_date_str, end_date_str):
+    semaphore = get_query_semaphore()
+
+    # Paso 1: Evaluación y feriados del tenant
+    evaluation, holidays = await asyncio.gather(
+        aget_cached_or_fresh_evaluation(tenant_id, evaluation_id, semaphore),
+        asyncio.to_thread(get_tenant_holidays, tenant_id),
+    )
+    if not isinstance(evaluation, dict):
+        return None, "No se encontró la evaluación con el ID proporcionado."
+
+    # Paso 2: Calcular fechas
+    start_start_date, end_start_date, dias_laborables, dias_no_laborables = define_date_ranges(
+        filter_range, start_date_str, end_date_str, evaluation['Dias_no_laborables'], holidays
+    )
+
+    # Paso 3: Evaluación guardada, perfil del colaborador y rangos de desempeño
+    existing, employee, classifier = await asyncio.gather(
+        find_one_limited(semaphore, get_async_collection(tenant_id, 'evaluationhistory'), {
+            "employee_id": employee_id,
+            "evaluacion_id": evaluation_id,
+            "filter_name": filter_range,
+            "start_date": start_start_date,
+            "end_date": end_start_date
+        }),
+        find_one_limited(
+            semaphore, get_async_collection(tenant_id, 'employee'), {"_id": ObjectId(employee_id)}, EMPLOYEE_PROFILE_PROJECTION
+        ),
+        aget_range_classifier(tenant_id, semaphore),
+    )
+
+    if existing:
+        existing["_id"] = str(existing["_id"])
+        return existing
+
+    if not employee:
+        return None, "No se encontró el colaborador a evaluar con el ID proporcionado."
+
+    # Paso 4: KPIs de métricas y notas de evaluación
+    roster_results, notes = await asyncio.gather(
+        aget_roster_kpi_results(evaluation, tenant_id, [employee_id], start_start_date, end_start_date, holidays, semaphore),
+        aprefetch_evaluation_notes(tenant_id, evaluation, [employee_id], semaphore),
+    )
+
+    return await asyncio.to_thread(
+        build_single_employee_result, tenant_id, evaluation, evaluation_id, employee, filter_range,
+        start_start_date, end_start_date, roster_results, notes, classifier
+    )
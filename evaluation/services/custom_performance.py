@@ -1,47 +1,153 @@
 import logging
+import threading
+import time
+from bisect import bisect_right
+import numpy as np
 from pytz import timezone
 from bson import ObjectId
 from evaluation.mongo_client import get_collection
 from datetime import timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
 
-def get_evaluation_range_by_percentage(percentage: float, tenant_id: str):
-    # Recuperar la colección de MetadataEvaluationrange
-    metadata_collection = get_collection(tenant_id, 'metadataevaluationrange')
-    
-    try:
-        # Si el porcentaje es mayor a 100, buscamos el rango con maxValue igual a 100
+logger = logging.getLogger(__name__)
+
+# Los rangos de desempeño casi no cambian; se mantienen en memoria por proceso
+RANGES_TTL_SECONDS = 300
+
+_classifiers = {}
+_classifiers_lock = threading.Lock()
+# Un lock por tenant para la carga: una lectura lenta no bloquea la clasificación de otros tenants
+_tenant_locks = {}
+
+
+class RangeClassifier:
+    """
+    Rangos de desempeño de un tenant (`metadataevaluationrange`) ordenados por `minValue`,
+    para clasificar notas sin consultar MongoDB. Misma regla que la consulta original:
+
+    - nota > 100: el rango con maxValue == 100
+    - nota == 100: el rango con minValue <= 100 y maxValue == 100
+    - resto: minValue <= nota < maxValue (los rangos no se solapan; si dos comparten minValue,
+      vale el primero en orden natural)
+    """
+    __slots__ = ("ranges", "mins", "maxs", "above_top", "at_top")
+
+    def __init__(self, docs: Sequence[Dict[str, Any]]):
+        docs = list(docs)
+        first_by_min = {}
+        for doc in docs:
+            if is_number(doc.get("minValue")) and is_number(doc.get("maxValue")):
+                first_by_min.setdefault(doc["minValue"], doc)
+        bounded = sorted(first_by_min.values(), key=lambda doc: doc["minValue"])
+        self.ranges = tuple(to_range_metadata(doc) for doc in bounded)
+        self.mins = tuple(doc["minValue"] for doc in bounded)
+        self.maxs = tuple(doc["maxValue"] for doc in bounded)
+
+        # Para 100 y más se respeta el orden natural de la colección, como `find_one`
+        top = [doc for doc in docs if doc.get("maxValue") == 100]
+        self.above_top = to_range_metadata(top[0]) if top else None
+        at_top = [doc for doc in top if is_number(doc.get("minValue")) and doc["minValue"] <= 100]
+        self.at_top = to_range_metadata(at_top[0]) if at_top else None
+
+    def classify(self, percentage: float) -> Optional[Dict[str, Any]]:
         if percentage > 100:
-            evaluation_range = metadata_collection.find_one({
-                "maxValue": 100
-            })
-        
-        # Si el porcentaje es exactamente 100, debe ser el último rango
-        elif percentage == 100:
-            evaluation_range = metadata_collection.find_one({
-                "minValue": {"$lte": percentage},
-                "maxValue": {"$eq": 100}  # Exactamente igual a 100
-            })
-        
-        # Caso general: el porcentaje está entre minValue y maxValue
+            return self.above_top
+        if percentage == 100:
+            return self.at_top
+
+        i = bisect_right(self.mins, percentage) - 1
+        if i >= 0 and percentage < self.maxs[i]:
+            return self.ranges[i]
+        return None
+
+    def classify_many(self, percentages: Sequence[float]) -> List[Optional[Dict[str, Any]]]:
+        # Toda una lista de notas con un solo `searchsorted`
+        values = np.asarray(percentages, dtype=float)
+        if not self.ranges:
+            positions = np.full(values.shape, -1)
         else:
-            evaluation_range = metadata_collection.find_one({
-                "minValue": {"$lte": percentage},  # minValue <= porcentaje
-                "maxValue": {"$gt": percentage}   # maxValue > porcentaje (excluye el límite superior)
-            })
-        
+            maxs = np.asarray(self.maxs, dtype=float)
+            positions = np.searchsorted(np.asarray(self.mins, dtype=float), values, side="right") - 1
+            positions[(positions >= 0) & ~(values < maxs[positions.clip(0)])] = -1
+
+        results = []
+        for value, position in zip(values.tolist(), positions.tolist()):
+            if value > 100:
+                results.append(self.above_top)
+            elif value == 100:
+                results.append(self.at_top)
+            else:
+                results.append(self.ranges[position] if position >= 0 else None)
+        return results
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def to_range_metadata(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "title": doc.get("title"),
+        "color": doc.get("color"),
+        "minValue": doc.get("minValue"),
+        "maxValue": doc.get("maxValue")
+    }
+
+
+def get_cached_range_classifier(tenant_id: str) -> Optional[RangeClassifier]:
+    cached = _classifiers.get(tenant_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+
+def cache_range_classifier(tenant_id: str, docs: Sequence[Dict[str, Any]]) -> RangeClassifier:
+    classifier = RangeClassifier(docs)
+    _classifiers[tenant_id] = (time.monotonic() + RANGES_TTL_SECONDS, classifier)
+    return classifier
+
+
+def invalidate_range_classifier(tenant_id: Optional[str] = None) -> None:
+    # Al modificar los rangos de un tenant (o de todos, sin `tenant_id`)
+    with _classifiers_lock:
+        if tenant_id is None:
+            _classifiers.clear()
+        else:
+            _classifiers.pop(tenant_id, None)
+
+
+def get_range_classifier(tenant_id: str) -> RangeClassifier:
+    """
+    Retorna el clasificador de rangos del tenant; los rangos se leen de MongoDB
+    como máximo una vez cada `RANGES_TTL_SECONDS`.
+    """
+    classifier = get_cached_range_classifier(tenant_id)
+    if classifier is not None:
+        return classifier
+
+    with _classifiers_lock:
+        tenant_lock = _tenant_locks.setdefault(tenant_id, threading.Lock())
+
+    with tenant_lock:
+        classifier = get_cached_range_classifier(tenant_id)
+        if classifier is not None:
+            return classifier
+
+        metadata_collection = get_collection(tenant_id, 'metadataevaluationrange')
+        return cache_range_classifier(tenant_id, metadata_collection.find({}))
+
+
+def get_evaluation_range_by_percentage(percentage: float, tenant_id: str):
+    try:
+        evaluation_range = get_range_classifier(tenant_id).classify(percentage)
+
         # Si no se encuentra el rango, lanzar un error
         if not evaluation_range:
             raise ValueError("No se encontró un rango para este porcentaje.")
-        
-        return {
-            "title": evaluation_range["title"],
-            "color": evaluation_range["color"],
-            "minValue": evaluation_range["minValue"],
-            "maxValue": evaluation_range["maxValue"]
-        }
+
+        return dict(evaluation_range)
 
     except Exception as e:
         # Capturar cualquier error y lanzarlo
         print(f"Error al obtener el rango de evaluación: {e}")
-        raise ValueError("Hubo un error al obtener el rango de evaluación.")
\ No newline at end of file
+        raise ValueError("Hubo un error al obtener el rango de evaluación.")
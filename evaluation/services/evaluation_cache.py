@@ -4,12 +4,35 @@ from bson import ObjectId
 from typing import List, Dict, Any, Optional
 from evaluation.mongo_client import get_collection
 from evaluation.utils.redis_client import redis_client
+from evaluation.utils.tasklog_stream import publish_tasklog_event
+from evaluation.services.index_provisioning import ensure_kpi_indexes
 
 logger = logging.getLogger(__name__)
 
+# Tiempo de vida de la evaluación enriquecida en Redis (6 horas)
+EVALUATION_CACHE_TTL = 21600
+
+EVALUATION_PROJECTION = {"Nombre": 1, "Evaluados": 1, "Secciones": 1, "Rango_evaluacion": 1, "Dias_no_laborables": 1}
+
+KPI_PROJECTION = {
+    "Nombre": 1,
+    "Tipo_de_KPI": 1,
+    "Objetivo": 1,
+    "Unidad_de_tiempo": 1,
+    "Campo_a_evaluar": 1,
+    "Formula": 1,
+    "Filtro_de_fecha": 1,
+    "Filters": 1,
+    "Task": 1,
+    "Dias_no_laborables": 1
+}
+
+def get_evaluation_cache_key(tenant_id, evaluation_id):
+    return f"tenant:{tenant_id}:evaluation:{evaluation_id}"
+
 def get_cached_or_fresh_evaluation(tenant_id, evaluation_id): 
     #1. Buscar en Redis
-    key = f"tenant:{tenant_id}:evaluation:{evaluation_id}"
+    key = get_evaluation_cache_key(tenant_id, evaluation_id)
 
     #logger.info("redis_client: %s", redis_client)
 
@@ -23,36 +46,32 @@ def get_cached_or_fresh_evaluation(tenant_id, evaluation_id):
     evaluation_collection = get_collection(tenant_id, 'evaluation')
     kpi_collection = get_collection(tenant_id, 'kpi')
 
-    evaluation = evaluation_collection.find_one(
-        {"_id": ObjectId(evaluation_id)},
-        {"Nombre": 1, "Evaluados": 1, "Secciones": 1, "Rango_evaluacion": 1, "Dias_no_laborables": 1}
-    )
+    evaluation = evaluation_collection.find_one({"_id": ObjectId(evaluation_id)}, EVALUATION_PROJECTION)
     if not evaluation:
         return None, "Evaluación no encontrada" 
     
     # Paso 3. Obetener todos los KPI Ids y sus datos
+    kpis = list(kpi_collection.find({"_id": {"$in": get_evaluation_kpi_ids(evaluation)}}, KPI_PROJECTION))
+    ensure_kpi_indexes(tenant_id, kpis)
+
+    # 4. Enriquecer cada KPI de cada sección
+    enrich_evaluation(evaluation, kpis)
+
+    # 5. Cachear en Redis
+    redis_client.setex(key, EVALUATION_CACHE_TTL, json.dumps(evaluation, default=str))
+    # 6. Devolver evaluación enriquecida
+    return evaluation
+
+def get_evaluation_kpi_ids(evaluation):
     kpi_ids = []
     for seccion in evaluation.get("Secciones", []):
         for k in seccion.get("KpisSeccion", []):
             kpi_ids.append(k["KpiId"])
 
-    unique_kpi_ids = list(set(kpi_ids))
-    kpis = kpi_collection.find(
-        {"_id": {"$in": unique_kpi_ids}},
-        {
-            "Nombre": 1,
-            "Tipo_de_KPI": 1,
-            "Objetivo": 1,
-            "Unidad_de_tiempo": 1,
-            "Campo_a_evaluar": 1,
-            "Formula": 1,
-            "Filtro_de_fecha": 1,
-            "Filters": 1,
-            "Task": 1,
-            "Dias_no_laborables": 1
-        }
-    )
+    return list(set(kpi_ids))
 
+def enrich_evaluation(evaluation, kpis):
+    # Copia en cada KPI de cada sección los datos de su definición
     kpi_map = {
         str(k["_id"]): {
             "_id": str(k["_id"]),
@@ -69,16 +88,12 @@ def get_cached_or_fresh_evaluation(tenant_id, evaluation_id):
         for k in kpis
     }
 
-    # 4. Enriquecer cada KPI de cada sección
     for seccion in evaluation.get("Secciones", []):
         for kpi in seccion.get("KpisSeccion", []):
             kpi_id_str = str(kpi["KpiId"])
             kpi_data = kpi_map.get(kpi_id_str, {})
             kpi.update(clean_kpi(kpi_data))
 
-    # 5. Cachear en Redis
-    redis_client.setex(key, 21600, json.dumps(evaluation, default=str))
-    # 6. Devolver evaluación enriquecida
     return evaluation
 
 def clean_kpi(kpi: dict) -> dict:
@@ -94,14 +109,8 @@ def clean_kpi(kpi: dict) -> dict:
 
 def save_changed_tasklogs(tenant_id: str, payload: dict) -> bool:
     try:
-        event = {
-            "tenant": tenant_id,
-            "payload": payload
-        }
-
-        logger.info("Estoy aquí a lo que emites el evento a redis :D %s")
-
-        redis_client.lpush('tasklog_events', json.dumps(event))
+        # Stream con grupo de consumidores (ver utils/tasklog_stream)
+        publish_tasklog_event(tenant_id, payload)
         return True
     except Exception as e:
         # Aquí podrías loggear el error si quieres rastrear
@@ -0,0 +1,42 @@
+"""
+Precálculo nocturno de los filtros que se guardan en `evaluationhistory` (CACHEABLE_FILTERS),
+así el primer usuario de cada período ya no paga el cálculo completo de la nómina.
+"""
+
+import logging
+from typing import Dict, List
+from evaluation.mongo_client import get_collection
+from evaluation.services.evaluations_analysis import CACHEABLE_FILTERS, calculate_evaluation_for_employees
+
+logger = logging.getLogger(__name__)
+
+
+def list_evaluation_ids(tenant_id: str) -> List[str]:
+    # Solo evaluaciones con colaboradores asignados
+    evaluation_collection = get_collection(tenant_id, 'evaluation')
+    return [str(doc["_id"]) for doc in evaluation_collection.find({"Evaluados.0": {"$exists": True}}, {"_id": 1})]
+
+
+def precompute_evaluation(tenant_id: str, evaluation_id: str) -> Dict[str, int]:
+    """
+    Calcula con el motor por nómina cada filtro guardable de la evaluación. Los colaboradores que ya
+    tienen el período en `evaluationhistory` no se recalculan; el resto se guarda en lote.
+
+    :return: {filtro: colaboradores evaluados} (-1 si el filtro falló)
+    """
+    summary = {}
+    for filter_range in sorted(CACHEABLE_FILTERS):
+        try:
+            response = calculate_evaluation_for_employees(tenant_id, evaluation_id, filter_range, None, None)
+        except Exception as e:
+            logger.exception("Error precalculando %s de la evaluación %s (tenant %s): %s", filter_range, evaluation_id, tenant_id, str(e))
+            summary[filter_range] = -1
+            continue
+
+        if not isinstance(response, dict) or "error" in response:
+            summary[filter_range] = 0
+            continue
+        summary[filter_range] = len(response.get("resultados", []))
+
+    logger.info("Evaluación %s precalculada (tenant %s): %s", evaluation_id, tenant_id, summary)
+    return summary
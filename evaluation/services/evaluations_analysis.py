@@ -1,33 +1,50 @@
 from datetime import datetime, timedelta
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
 from bson import ObjectId
 import pytz
 from dateutil.relativedelta import relativedelta
-from evaluation.services.kpi_calculator import (get_kpi_evaluation, calculate_working_days)
+from evaluation.services.kpi_calculator import (get_kpi_evaluation, calculate_working_days, aggregate_monthly_kpi_values,
+                                                compile_kpi)
+from evaluation.services.kpi_rollups import get_task_kpi_evaluations
 from evaluation.mongo_client import get_collection
 from evaluation.utils.date_utils import calculate_evaluation_range
 from evaluation.services.evaluation_cache import get_cached_or_fresh_evaluation
-from evaluation.services.custom_performance import get_evaluation_range_by_percentage
-from evaluation.tasks import save_employee_evaluation_task
+from evaluation.services.custom_performance import get_evaluation_range_by_percentage, get_range_classifier
+from evaluation.services.holiday_calendar import get_tenant_holidays
+from evaluation.services.result_cache import lookup_cached_results, store_cached_results
+from evaluation.utils.business_days import parse_excluded_days
+from evaluation.utils.executor import run_parallel
+from evaluation.tasks import save_employee_evaluation_task, save_employee_evaluations_task
 
 TIMEZONE = pytz.timezone("America/Guayaquil")
 
+# Tipos de KPI cuya nota viene de `kpievaluationhistory` (no se calculan desde tasklogs)
+EVALUATION_KPI_TYPES = ["formulario", "question", "dropdown", "static_metrics"]
+
+# Filtros cuyo resultado se persiste en `evaluationhistory`
+CACHEABLE_FILTERS = {"ultimo_mes", "ultimo_trimestre", "ultimo_semestre", "ultimo_anio"}
+
+# Paginación de `/evaluate` por evaluación: campos de orden → campo del perfil del colaborador
+ROSTER_SORT_FIELDS = {"nota_final": None, "colaborador": None, "departamento": "Departamento", "cargo": "Cargo"}
+DEFAULT_SORT_BY = "-nota_final"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Evaluaciones por task de guardado en lote (cada task hace un solo bulk_write)
+EVALUATION_SAVE_BATCH_SIZE = 500
+
+# Campos de `kpievaluationhistory` que se leen como nota de los KPIs de tipo evaluación
+EVALUATION_NOTES_PROJECTION = {"_id": 0, "colaboradorId": 1, "kpiId": 1, "labelId": 1, "Nota": 1}
+
+# Campos del colaborador que se muestran junto a su evaluación
+EMPLOYEE_PROFILE_PROJECTION = {"Nombres": 1, "Apellidos": 1, "Departamento": 1, "Cargo": 1, "Area": 1, "Fecha_de_inicio": 1}
+
 import logging
 logger = logging.getLogger(__name__)
 
 #<---------------------------------------------------------------------------------------------------------------------------------------------->
 def convert_day_names_to_indices(day_names):
-    day_name_to_index = {
-        "Monday": 0,
-        "Tuesday": 1,
-        "Wednesday": 2,
-        "Thursday": 3,
-        "Friday": 4,
-        "Saturday": 5,
-        "Sunday": 6
-    }
-    return [day_name_to_index[d] for d in day_names if d in day_name_to_index]
+    return parse_excluded_days(day_names)
 
 #<----------------------------------------------------------------------------------------------------------------------------------------------->
 def search_evaluation_history(data):
@@ -167,105 +184,145 @@ def group_secctions_kpis(tenant_id, evaluation_id):
 
 #<----------------------------------------------------------------------------------------------------------------------------------------------->
 def get_timeline_employee_evaluation(tenant_id, evaluation_id, employee_id, filter_range, number_of_data):
-    now = datetime.now(TIMEZONE)
-    timeline = []
+    """
+    Nota del colaborador en cada uno de los últimos `number_of_data` meses (incluido el actual).
+    Cada KPI de métricas se agrega una sola vez sobre todo el periodo, agrupado por mes local,
+    y cada mes se califica con esos valores.
+    """
+    evaluation = get_cached_or_fresh_evaluation(tenant_id, evaluation_id)
+    if not isinstance(evaluation, dict) or not number_of_data:
+        return [], None
 
-    for i in range(number_of_data):
+    # Paso 1: Meses del gráfico, del más antiguo al actual, con el mismo rango que "rango_de_fechas"
+    holidays = get_tenant_holidays(tenant_id)
+    now = datetime.now(TIMEZONE)
+    months = []
+    for i in reversed(range(number_of_data)):
         # Retroceder i meses desde el inicio del mes actual
-        month_date = (now.replace(day=1) - relativedelta(months=i))
-
-        start_date = month_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        start_date = (now.replace(day=1) - relativedelta(months=i)).replace(hour=0, minute=0, second=0, microsecond=0)
         end_date = (start_date + relativedelta(months=1)) - timedelta(seconds=1)
 
-        start_str = start_date.strftime("%Y-%m-%d")
-        end_str = end_date.strftime("%Y-%m-%d")
-
-        result = calculate_single_employee_evaluation(
-            tenant_id,
-            evaluation_id,
-            employee_id,
-            "rango_de_fechas",
-            start_str,
-            end_str
+        month_start, month_end, _, _ = define_date_ranges(
+            "rango_de_fechas", start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"),
+            evaluation['Dias_no_laborables'], holidays
         )
+        months.append((start_date.date(), month_start, month_end, start_date.strftime("%b %Y")))
 
-        if isinstance(result, tuple):
-            # Manejo de error: función devolvió (None, "error")
-            continue
+    # Paso 2: Perfil del colaborador, notas de KPIs de evaluación y rangos de desempeño (no dependen del mes)
+    employee_collection = get_collection(tenant_id, 'employee')
+    employee = employee_collection.find_one({"_id": ObjectId(employee_id)}, EMPLOYEE_PROFILE_PROJECTION)
+    if not employee:
+        return [], None
+
+    notes = prefetch_evaluation_notes(tenant_id, evaluation, [employee_id])
+    classifier = get_range_classifier(tenant_id)
 
+    # Paso 3: KPIs de métricas de todos los meses en una pasada
+    monthly_results = get_monthly_kpi_results(evaluation, tenant_id, employee_id, months, holidays)
+
+    # Paso 4: Calificar cada mes
+    timeline = []
+    for month, month_start, month_end, label in months:
+        result = build_single_employee_result(
+            tenant_id, evaluation, evaluation_id, employee, "rango_de_fechas", month_start, month_end,
+            monthly_results[month], notes, classifier
+        )
         timeline.append({
-            "month": start_date.strftime("%b %Y"),
+            "month": label,
             "score": result["nota_final"]
         })
 
-    # Invertimos para que sea cronológico (enero → abril)
-    timeline.reverse()
-
     return timeline, None
 
+def get_monthly_kpi_results(evaluation, tenant_id, employee_id, months, holidays):
+    """
+    KPIs de métricas del colaborador mes a mes: {mes: {kpi_id: {employee_id: resultado}}}.
+    Una agregación por tarea y `Filtro_de_fecha` sobre todo el periodo, agrupada con `$dateTrunc`.
+    """
+    span_start, span_end = months[0][1], months[-1][2]
+
+    def run(item):
+        task_id, task_kpis = item
+        monthly_values = aggregate_monthly_kpi_values(
+            task_id, [info for _, info in task_kpis], tenant_id, employee_id, span_start, span_end
+        )
+        return [(kpi_id, info, values) for (kpi_id, info), values in zip(task_kpis, monthly_values)]
+
+    results = {month: {} for month, *_ in months}
+    for task_results in run_parallel(tenant_id, run, list(group_metric_kpis_by_task(evaluation).items())):
+        for kpi_id, info, values in task_results:
+            compiled = compile_kpi(info)
+            for month, month_start, month_end, _ in months:
+                days_considered, non_considered_days = compiled.count_working_days(month_start, month_end, holidays)
+                results[month][kpi_id] = {
+                    str(employee_id): compiled.build_result(values.get(month, 0), days_considered, non_considered_days)
+                }
+
+    return results
+
 #<----------------------------------------------------------------------------------------------------------------------------------------------->
 def calculate_data_sections(resultados):
-    # 1️⃣ Agrupar datos por sección con totales y cuenta, y guardar título
-    medias_por_seccion = {}
+    """
+    Promedio por sección y por KPI (nota ponderada) de toda la nómina, en una sola pasada.
+    Secciones y KPIs se indexan por orden de aparición y se acumulan en listas planas.
+    """
+    section_index = {}
+    section_ids, section_titles, section_totals, section_counts = [], [], [], []
+    section_kpis = []  # por sección: {kpi_id: índice en las listas de KPIs}
+
+    kpi_ids, kpi_names, kpi_totals, kpi_counts = [], [], [], []
+
+    # 1️⃣ Acumular totales y cuentas por sección y por KPI
     for resultado in resultados:
         for seccion in resultado.get("notas_por_seccion", []):
             seccion_id = seccion["_id"]
-            if seccion_id not in medias_por_seccion:
-                medias_por_seccion[seccion_id] = {
-                    "total": 0,
-                    "count": 0,
-                    "titulo": seccion.get("titulo", "")
-                }
-            medias_por_seccion[seccion_id]["total"] += seccion.get("nota_seccion", 0)
-            medias_por_seccion[seccion_id]["count"] += 1
-
-    # 2️⃣ Calcular promedio por sección
-    promedio_por_seccion = {
-        seccion_id: round(data["total"] / data["count"], 2) if data["count"] > 0 else 0
-        for seccion_id, data in medias_por_seccion.items()
-    }
-
-    # 3️⃣ Construir estructura dataSections
+            s = section_index.get(seccion_id)
+            if s is None:
+                s = section_index[seccion_id] = len(section_ids)
+                section_ids.append(seccion_id)
+                section_titles.append(seccion.get("titulo", ""))
+                section_totals.append(0)
+                section_counts.append(0)
+                section_kpis.append({})
+            section_totals[s] += seccion.get("nota_seccion", 0)
+            section_counts[s] += 1
+
+            kpi_index = section_kpis[s]
+            for kpi in seccion.get("detalles_kpis", []):
+                kpi_id = kpi["_id"]
+                k = kpi_index.get(kpi_id)
+                if k is None:
+                    k = kpi_index[kpi_id] = len(kpi_ids)
+                    kpi_ids.append(kpi_id)
+                    kpi_names.append("")
+                    kpi_totals.append(0)
+                    kpi_counts.append(0)
+                kpi_totals[k] += kpi.get("nota_ponderada", 0)
+                kpi_counts[k] += 1
+                if not kpi_names[k]:
+                    kpi_names[k] = kpi.get("kpi", "")
+
+    # 2️⃣ Construir estructura dataSections con los promedios
     data_sections = []
-    for seccion_id, data in medias_por_seccion.items():
-        titulo = data["titulo"]
-        media = promedio_por_seccion.get(seccion_id, 0)
-
-        # Reunir todos los KPIs para la sección
-        all_kpis = []
-        for resultado in resultados:
-            for seccion in resultado.get("notas_por_seccion", []):
-                if seccion["_id"] == seccion_id:
-                    all_kpis.extend(seccion.get("detalles_kpis", []))
-
-        # Agrupar KPIs por _id para promediar notas ponderadas
-        kpi_map = defaultdict(lambda: {"total": 0, "count": 0, "name": ""})
-        for kpi in all_kpis:
-            kpi_id = kpi["_id"]
-            kpi_map[kpi_id]["total"] += kpi.get("nota_ponderada", 0)
-            kpi_map[kpi_id]["count"] += 1
-            if not kpi_map[kpi_id]["name"]:
-                kpi_map[kpi_id]["name"] = kpi.get("kpi", "")
-
-        # Crear lista final de KPIs con promedio
-        kpis = []
-        for kpi_id, kpi_data in kpi_map.items():
-            avg_value = round(kpi_data["total"] / kpi_data["count"], 2) if kpi_data["count"] > 0 else 0
-            kpis.append({
-                "_id": kpi_id,
-                "name": kpi_data["name"],
+    for s, seccion_id in enumerate(section_ids):
+        kpis = [
+            {
+                "_id": kpi_ids[k],
+                "name": kpi_names[k],
                 "ranking": "",
-                "value": avg_value,
+                "value": round(kpi_totals[k] / kpi_counts[k], 2) if kpi_counts[k] > 0 else 0,
                 "oldValue": 50,
                 "color": "",
                 "colorRanking": ""
-            })
+            }
+            for k in section_kpis[s].values()
+        ]
 
         data_sections.append({
             "_id": seccion_id,
-            "name": titulo,
+            "name": section_titles[s],
             "ranking": "",
-            "value": media,
+            "value": round(section_totals[s] / section_counts[s], 2) if section_counts[s] > 0 else 0,
             "oldValue": 50,
             "color": "",
             "colorRanking": "",
@@ -276,7 +333,7 @@ def calculate_data_sections(resultados):
     return data_sections
 
 #<--------------------------------------------METHOD TO CALCULATE DATE RANGE--------------------------------------------------------------------->
-def define_date_ranges(filter_range, start_date_str, end_date_str, non_working_days_evaluation):
+def define_date_ranges(filter_range, start_date_str, end_date_str, non_working_days_evaluation, holidays=None):
     excluded_days = convert_day_names_to_indices(non_working_days_evaluation)
     
     # Paso 1: Calcular fechas según filtro
@@ -289,21 +346,165 @@ def define_date_ranges(filter_range, start_date_str, end_date_str, non_working_d
             end_start_date = TIMEZONE.localize(end_start_date).replace(hour=23, minute=59, second=59).astimezone(pytz.utc)
 
             # Calculamos días laborables también para mantener la consistencia
-            days_considered, non_considered_days = calculate_working_days(start_start_date, end_start_date, excluded_days)
+            days_considered, non_considered_days = calculate_working_days(start_start_date, end_start_date, excluded_days, holidays)
             
             return start_start_date, end_start_date, days_considered, non_considered_days
         
         except ValueError:
             return None, None, 0, 0
     else:
-        rango = calculate_evaluation_range(filter_range, non_working_days_evaluation)
+        rango = calculate_evaluation_range(filter_range, non_working_days_evaluation, holidays)
         start_start_date = rango["start"]
         end_start_date = rango["end"]
 
-        days_considered, non_considered_days = calculate_working_days(start_start_date, end_start_date, excluded_days)
+        days_considered, non_considered_days = calculate_working_days(start_start_date, end_start_date, excluded_days, holidays)
 
         return start_start_date, end_start_date, days_considered, non_considered_days
 
+#<-------------------------------------------METHODS TO BATCH KPIS BY ROSTER--------------------------------------------------------------------->
+def prefetch_employee_profiles(tenant_id, employee_ids):
+    # Un solo $in para todos los perfiles: {employee_id (str): documento}
+    if not employee_ids:
+        return {}
+
+    employee_collection = get_collection(tenant_id, 'employee')
+    employees = employee_collection.find(
+        {"_id": {"$in": [ObjectId(str(e)) for e in employee_ids]}}, EMPLOYEE_PROFILE_PROJECTION
+    )
+    return {str(employee["_id"]): employee for employee in employees}
+
+def prefetch_evaluation_history(tenant_id, evaluation_id, employee_ids, filter_range, start_date, end_date):
+    # Un solo $in para las evaluaciones guardadas de la nómina: {employee_id (str): documento}
+    if filter_range not in CACHEABLE_FILTERS or not employee_ids:
+        return {}
+
+    evaluation_history_collection = get_collection(tenant_id, "evaluationhistory")
+    docs = evaluation_history_collection.find({
+        "employee_id": {"$in": [str(e) for e in employee_ids]},
+        "evaluacion_id": str(evaluation_id),
+        "filter_name": filter_range,
+        "start_date": start_date,
+        "end_date": end_date
+    })
+    return {doc["employee_id"]: doc for doc in docs}
+
+def build_evaluation_notes_match(evaluation, colaborador_ids):
+    # Notas de los KPIs de tipo evaluación de todas las secciones para toda la nómina
+    pairs = {}
+    for seccion in evaluation.get("Secciones", []):
+        for kpi in seccion.get("KpisSeccion", []):
+            if kpi.get("Tipo_de_KPI") in EVALUATION_KPI_TYPES:
+                pairs[(str(kpi["KpiId"]), str(kpi["Etiqueta"]) if kpi.get("Etiqueta") else None)] = True
+
+    if not pairs or not colaborador_ids:
+        return None
+
+    return {
+        "colaboradorId": {"$in": [ObjectId(str(c)) for c in colaborador_ids]},
+        "$or": [
+            {"kpiId": ObjectId(kpi_id), **({"labelId": ObjectId(label_id)} if label_id else {})}
+            for kpi_id, label_id in pairs
+        ]
+    }
+
+def index_evaluation_notes(docs):
+    """
+    {colaborador_id: {(kpi_id, label_id): nota}}. Un KPI sin etiqueta acepta la nota de cualquier
+    etiqueta, igual que el `$or` por sección de `get_kpis_from_evaluation`.
+    """
+    notes = defaultdict(dict)
+    for doc in docs:
+        colaborador_notes = notes[str(doc["colaboradorId"])]
+        kpi_id = str(doc["kpiId"])
+        colaborador_notes[(kpi_id, None)] = doc
+        if doc.get("labelId"):
+            colaborador_notes[(kpi_id, str(doc["labelId"]))] = doc
+    return notes
+
+def prefetch_evaluation_notes(tenant_id, evaluation, colaborador_ids):
+    match = build_evaluation_notes_match(evaluation, colaborador_ids)
+    if match is None:
+        return {}
+
+    kpievaluationhistory_collection = get_collection(tenant_id, 'kpievaluationhistory')
+    return index_evaluation_notes(kpievaluationhistory_collection.find(match, EVALUATION_NOTES_PROJECTION))
+
+def group_metric_kpis_by_task(evaluation):
+    # KPIs de métricas (sin repetir) agrupados por tarea: {task_id: [(kpi_id, kpi)]}
+    metric_kpis = {}
+    for seccion in evaluation.get("Secciones", []):
+        for kpi in seccion.get("KpisSeccion", []):
+            if kpi.get("Tipo_de_KPI") in EVALUATION_KPI_TYPES or not kpi.get("Task"):
+                continue
+            metric_kpis.setdefault(str(kpi["KpiId"]), kpi)
+
+    kpis_by_task = defaultdict(list)
+    for kpi_id, info in metric_kpis.items():
+        kpis_by_task[str(info["Task"])].append((kpi_id, info))
+    return kpis_by_task
+
+def get_roster_kpi_results(evaluation, tenant_id, colaborador_ids, start_date, end_date):
+    """
+    Calcula los KPIs de métricas de toda la evaluación para toda la nómina.
+    Los KPIs que comparten tarea se fusionan en una sola pasada sobre tasklog
+    (o sobre los rollups diarios cuando el rango es largo).
+    Retorna {kpi_id: {colaborador_id: resultado}}.
+    """
+    kpis_by_task = group_metric_kpis_by_task(evaluation)
+    if not kpis_by_task or not colaborador_ids:
+        return {}
+
+    def run(item):
+        task_id, task_kpis = item
+        fused = get_task_kpi_evaluations(
+            task_id, [info for _, info in task_kpis], tenant_id, colaborador_ids, start_date, end_date
+        )
+        return [(kpi_id, kpi_results) for (kpi_id, _), kpi_results in zip(task_kpis, fused)]
+
+    return {
+        kpi_id: kpi_results
+        for task_results in run_parallel(tenant_id, run, list(kpis_by_task.items()))
+        for kpi_id, kpi_results in task_results
+    }
+
+def get_department_evaluation_groups(tenant_id, employees, filter_range, start_date, end_date):
+    """
+    Agrupa a los empleados por su evaluación principal y prepara cada grupo una sola vez:
+    definición de la evaluación, rango de fechas, evaluaciones guardadas, KPIs de métricas
+    en lote y notas de los KPIs de evaluación de quienes no tienen evaluación guardada.
+    Retorna {evaluation_id: grupo}.
+    """
+    employees_by_evaluation = defaultdict(list)
+    for employee in employees:
+        if employee.get("Evaluations"):
+            employees_by_evaluation[str(employee["Evaluations"][0])].append(employee["_id"])
+
+    holidays = get_tenant_holidays(tenant_id)
+    groups = {}
+    for evaluation_id, employee_ids in employees_by_evaluation.items():
+        evaluation = get_cached_or_fresh_evaluation(tenant_id, evaluation_id)
+        if not isinstance(evaluation, dict):
+            continue
+
+        group_start, group_end = start_date, end_date
+        if filter_range != "rango_de_fechas":
+            rango = calculate_evaluation_range(filter_range, evaluation['Dias_no_laborables'], holidays)
+            group_start, group_end = rango["start"], rango["end"]
+
+        history = prefetch_evaluation_history(tenant_id, evaluation_id, employee_ids, filter_range, group_start, group_end)
+        pending_ids = [e for e in employee_ids if str(e) not in history]
+
+        groups[evaluation_id] = {
+            "evaluation": evaluation,
+            "start_date": group_start,
+            "end_date": group_end,
+            "history": history,
+            "roster_results": get_roster_kpi_results(evaluation, tenant_id, pending_ids, group_start, group_end),
+            "notes": prefetch_evaluation_notes(tenant_id, evaluation, pending_ids),
+        }
+
+    return groups
+
 #<-------------------------------------------METHOD TO GET DEPARTMENT EVALUATION----------------------------------------------------------------->
 
 def calculate_evaluation_for_department(tenant_id, employees, filter_range, start_date_str, end_date_str, dept_meta=None):
@@ -326,15 +527,22 @@ def calculate_evaluation_for_department(tenant_id, employees, filter_range, star
     else:
         start_start_date, end_start_date = None, None  # Si no es "rango_de_fechas", cada empleado tiene su propio rango
 
-    # Paso 2: Usar ThreadPoolExecutor para paralelizar el cálculo para múltiples empleados
-    with ThreadPoolExecutor() as executor:
-        # Paralelizamos el cálculo de evaluación de todos los empleados
-        resultados = list(executor.map(
-            lambda employee: calculate_single_employee_evaluation_department(
-                tenant_id, employee, filter_range, start_start_date, end_start_date
-            ),
-            employees  # Lista de empleados
-        ))
+    # Paso 2: Cada evaluación se prepara una vez para todos sus empleados (definición, guardadas, KPIs en lote)
+    groups = get_department_evaluation_groups(tenant_id, employees, filter_range, start_start_date, end_start_date)
+    classifier = get_range_classifier(tenant_id)
+    pending_saves = []
+
+    # Paso 3: Paralelizar el cálculo para múltiples empleados en el pool compartido
+    resultados = run_parallel(
+        tenant_id,
+        lambda employee: calculate_single_employee_evaluation_department(
+            tenant_id, employee, filter_range, start_start_date, end_start_date,
+            group=groups.get(str(employee["Evaluations"][0])) if employee.get("Evaluations") else None,
+            classifier=classifier, pending_saves=pending_saves
+        ),
+        employees  # Lista de empleados
+    )
+    flush_evaluation_saves(tenant_id, pending_saves)
 
      # Paso 3: Procesamos los resultados
     for resultado in resultados:
@@ -347,34 +555,31 @@ def calculate_evaluation_for_department(tenant_id, employees, filter_range, star
     average_by_position = {}
     position_performance = {}
 
+    avg_scores = {}
     for position, employees_in_position in employees_by_position.items():
         total_position_score = sum([employee["nota_final"] for employee in employees_in_position])
-        avg_score = total_position_score / len(employees_in_position)
-        average_by_position[position] = round(avg_score, 2)
+        avg_scores[position] = total_position_score / len(employees_in_position)
+        average_by_position[position] = round(avg_scores[position], 2)
 
-        try:
-            metadata = get_evaluation_range_by_percentage(avg_score, tenant_id)
-            position_performance[position] = {
-                "desempenio": metadata.get("title", "Sin clasificación") if metadata else "Sin clasificación",
-                "color": metadata.get("color", "#808080") if metadata else "#808080"
-            }
-        except Exception as e:
-            logger.warning("Error obteniendo desempeño de cargo %s: %s", position, str(e))
-            position_performance[position] = {
-                "desempenio": "Error",
-                "color": "#FF0000"
-            }
-
-    # Paso 5: Calcular el promedio general del departamento y su desempeño
+    # Paso 5: Calcular el promedio general del departamento
     department_average = total_score / total_employees if total_employees else 0
-    try:
-        dept_metadata = get_evaluation_range_by_percentage(department_average, tenant_id)
-        department_desempenio = dept_metadata.get("title", "Sin clasificación") if dept_metadata else "Sin clasificación"
-        department_color = dept_metadata.get("color", "#808080") if dept_metadata else "#808080"
-    except Exception as e:
-        logger.warning("Error en desempeño del departamento: %s", str(e))
-        department_desempenio = "Error"
-        department_color = "#FF0000"
+
+    # Desempeño de cada cargo y del departamento en una sola clasificación
+    positions = list(avg_scores)
+    metadatas = classifier.classify_many([avg_scores[p] for p in positions] + [department_average])
+    for position, metadata in zip(positions, metadatas):
+        if metadata is None:
+            logger.warning("Sin rango de desempeño para el cargo %s (%s)", position, avg_scores[position])
+        position_performance[position] = {
+            "desempenio": metadata.get("title", "Sin clasificación") if metadata else "Error",
+            "color": metadata.get("color", "#808080") if metadata else "#FF0000"
+        }
+
+    dept_metadata = metadatas[-1]
+    if dept_metadata is None:
+        logger.warning("Sin rango de desempeño para el promedio del departamento (%s)", department_average)
+    department_desempenio = dept_metadata.get("title", "Sin clasificación") if dept_metadata else "Error"
+    department_color = dept_metadata.get("color", "#808080") if dept_metadata else "#FF0000"
 
     #Paso 6: Formatear el resultado
     department_result = {
@@ -413,7 +618,8 @@ def calculate_evaluation_for_department(tenant_id, employees, filter_range, star
 
     return department_result
 
-def calculate_single_employee_evaluation_department(tenant_id, employee, filter_range, start_date_str, end_date_str):
+def calculate_single_employee_evaluation_department(tenant_id, employee, filter_range, start_date_str, end_date_str, roster_results=None,
+                                                    group=None, classifier=None, pending_saves=None):
     # Paso 1: Construir estructura de resultado predeterminado
     resultado = {
         "_id": str(employee["_id"]) if isinstance(employee.get("_id"), (str, ObjectId)) else "SIN_ID",
@@ -433,31 +639,37 @@ def calculate_single_employee_evaluation_department(tenant_id, employee, filter_
         # Si no tiene evaluaciones, devolvemos un resultado predeterminado
         return resultado
     
-    # Paso 3. Obtener la evaluación cacheada o desde MongoDB
     evaluation_id = employee["Evaluations"][0]  # Usamos la primera evaluación
-    evaluation = get_cached_or_fresh_evaluation(tenant_id, evaluation_id)
-
-    if not evaluation:
-        return None, "No se encontró la evaluación con el ID proporcionado."
+    notes = None
+
+    if group is not None:
+        # Evaluación, fechas, evaluación guardada, KPIs y notas ya preparados para todo el grupo
+        evaluation = group["evaluation"]
+        start_date_str, end_date_str = group["start_date"], group["end_date"]
+        existing = group["history"].get(str(employee["_id"]))
+        roster_results, notes = group["roster_results"], group["notes"]
+    else:
+        # Paso 3. Obtener la evaluación cacheada o desde MongoDB
+        evaluation = get_cached_or_fresh_evaluation(tenant_id, evaluation_id)
 
-    # Paso 5: Calcular fechas según filtro
-    if filter_range != "rango_de_fechas":
-        rango = calculate_evaluation_range(filter_range, evaluation['Dias_no_laborables'])
-        start_date_str = rango["start"]
-        end_date_str = rango["end"]
+        if not evaluation:
+            return None, "No se encontró la evaluación con el ID proporcionado."
 
-    #logger.info("start_start_date: %s", start_date_str)
-    #logger.info("end_start_date: %s", end_date_str)
+        # Paso 5: Calcular fechas según filtro
+        if filter_range != "rango_de_fechas":
+            rango = calculate_evaluation_range(filter_range, evaluation['Dias_no_laborables'], get_tenant_holidays(tenant_id))
+            start_date_str = rango["start"]
+            end_date_str = rango["end"]
 
-    # : Buscar evaluación guardada
-    evaluation_history_collection = get_collection(tenant_id, "evaluationhistory")
-    existing = evaluation_history_collection.find_one({
-        "employee_id": str(employee["_id"]),
-        "evaluacion_id": str(evaluation_id),
-        "filter_name": filter_range,
-        "start_date": start_date_str,
-        "end_date": end_date_str
-    })
+        # : Buscar evaluación guardada
+        evaluation_history_collection = get_collection(tenant_id, "evaluationhistory")
+        existing = evaluation_history_collection.find_one({
+            "employee_id": str(employee["_id"]),
+            "evaluacion_id": str(evaluation_id),
+            "filter_name": filter_range,
+            "start_date": start_date_str,
+            "end_date": end_date_str
+        })
 
     if existing:
         evaluation_result = {
@@ -483,6 +695,8 @@ def calculate_single_employee_evaluation_department(tenant_id, employee, filter_
         employee["_id"],
         start_date_str,
         end_date_str,
+        roster_results,
+        notes,
     )
 
     # Actualizar estructura resultado
@@ -491,20 +705,12 @@ def calculate_single_employee_evaluation_department(tenant_id, employee, filter_
     resultado["evaluationId"] = str(evaluation["_id"])
     resultado["nombreEvaluacion"] = evaluation.get("Nombre", "Sin nombre")
     # Paso Final: asignar desempeño y color
-    try:
-        metadata = get_evaluation_range_by_percentage(resultado["nota_final"], tenant_id)
-        resultado["desempenio"] = metadata.get("title", "Sin clasificación") if metadata else "Sin clasificación"
-        resultado["color"] = metadata.get("color", "#808080") if metadata else "#808080"
-    except (TypeError, KeyError, AttributeError) as e:
-        logger.warning("Error obteniendo desempeño: %s", str(e))
-        resultado["desempenio"] = "Error"
-        resultado["color"] = "#FF0000"
+    assign_performance(resultado, tenant_id, classifier)
 
     # 🔥 Emitir evento SOLO si el filtro es uno de los cacheables
-    CACHEABLE_FILTERS = {"ultimo_mes", "ultimo_trimestre", "ultimo_semestre", "ultimo_anio"}
     if filter_range in CACHEABLE_FILTERS:
     # 🔥 Emitir evento para guardar la evaluación
-        save_employee_evaluation_task.delay(tenant_id, {
+        queue_evaluation_save(tenant_id, {
             "employee_id": str(employee["_id"]),
             "evaluacion_id": str(evaluation["_id"]),
             "department": resultado["departamento"],
@@ -516,13 +722,26 @@ def calculate_single_employee_evaluation_department(tenant_id, employee, filter_
             "start_date": start_date_str,
             "end_date": end_date_str,
             "filter_name": filter_range,
-        })
+        }, pending_saves)
 
     return resultado
 
 #<-------------------------------------------METHOD TO GET EVALUATION COLLABORATORS-------------------------------------------------------------->
 
-def calculate_evaluation_for_employees(tenant_id, evaluation_id, filter_range, start_date_str, end_date_str):
+def queue_evaluation_save(tenant_id, document, pending_saves=None):
+    # En nómina y departamento se acumulan y se envían juntos con `flush_evaluation_saves`
+    if pending_saves is not None:
+        pending_saves.append(document)
+    else:
+        save_employee_evaluation_task.delay(tenant_id, document)
+
+def flush_evaluation_saves(tenant_id, pending_saves):
+    # Un solo task (y un bulk_write) por lote en lugar de uno por colaborador
+    for i in range(0, len(pending_saves), EVALUATION_SAVE_BATCH_SIZE):
+        save_employee_evaluations_task.delay(tenant_id, pending_saves[i:i + EVALUATION_SAVE_BATCH_SIZE])
+
+def calculate_evaluation_for_employees(tenant_id, evaluation_id, filter_range, start_date_str, end_date_str,
+                                       page=None, page_size=DEFAULT_PAGE_SIZE, sort_by=DEFAULT_SORT_BY):
     # Paso 1: Inicializar una lista para los resultados
     resultados = []
     evaluation = get_cached_or_fresh_evaluation(tenant_id, evaluation_id)
@@ -539,19 +758,114 @@ def calculate_evaluation_for_employees(tenant_id, evaluation_id, filter_range, s
 
     # Paso 2: Calcular fechas
     start_start_date, end_start_date, dias_laborables, dias_no_laborables = define_date_ranges(
-        filter_range, start_date_str, end_date_str, evaluation['Dias_no_laborables']
+        filter_range, start_date_str, end_date_str, evaluation['Dias_no_laborables'], get_tenant_holidays(tenant_id)
+    )
+
+    # Paso 3: Perfiles y evaluaciones guardadas de toda la nómina (dos consultas en total)
+    employees = prefetch_employee_profiles(tenant_id, evaluados)
+    history = prefetch_evaluation_history(
+        tenant_id, evaluation["_id"], evaluados, filter_range, start_start_date, end_start_date
+    )
+
+    if page is not None:
+        # Paso 4: Solo se calculan las filas de la página (o las que faltan para ordenar por nota)
+        sort_field, descending = parse_sort_by(sort_by)
+        compute_ids, page_ids = select_roster_rows_to_compute(
+            evaluados, employees, history, sort_field, descending, page, page_size
+        )
+        computed = calculate_roster_rows(
+            tenant_id, evaluation, compute_ids, filter_range, start_start_date, end_start_date, employees
+        )
+        return build_roster_page_response(
+            evaluados, employees, history, computed, page_ids, sort_field, descending, page, page_size,
+            start_start_date, end_start_date, dias_laborables
+        )
+
+    # Notas de los KPIs de evaluación de quienes no tienen evaluación guardada (también forman el sello de la caché)
+    notes = prefetch_evaluation_notes(tenant_id, evaluation, [e for e in evaluados if str(e) not in history])
+
+    # Filtros no persistidos: resultados en caché cuyos datos no han cambiado
+    cached_results, stamps = {}, {}
+    if filter_range not in CACHEABLE_FILTERS:
+        cached_results, stamps = lookup_cached_results(
+            tenant_id, evaluation, evaluados, start_start_date, end_start_date, employees, notes
+        )
+
+    # Paso 4: KPIs de métricas en lote para quienes no tienen evaluación guardada
+    pending_ids = [e for e in evaluados if str(e) not in history and str(e) not in cached_results]
+    roster_results = get_roster_kpi_results(evaluation, tenant_id, pending_ids, start_start_date, end_start_date)
+
+    # Paso 5: Paralelizar el cálculo para múltiples empleados en el pool compartido
+    pending_saves = []
+    resultados = run_parallel(
+        tenant_id,
+        lambda employee: cached_results.get(str(employee)) or calculate_employee_evaluation(
+            tenant_id, evaluation, employee, filter_range, start_start_date, end_start_date, roster_results,
+            employees, history, notes, pending_saves=pending_saves),
+        evaluados  # Ahora estamos usando la lista de empleados directamente
+    )
+    flush_evaluation_saves(tenant_id, pending_saves)
+    store_cached_results(
+        tenant_id, str(evaluation["_id"]), {str(e): r for e, r in zip(evaluados, resultados)}, stamps,
+        start_start_date, end_start_date
     )
 
-    # Paso 2: Usar ThreadPoolExecutor para paralelizar el cálculo para múltiples empleados
-    with ThreadPoolExecutor() as executor:
-        resultados = list(executor.map(
-            lambda employee: calculate_employee_evaluation(
-                tenant_id, evaluation, employee, filter_range, start_start_date, end_start_date),
-            evaluados  # Ahora estamos usando la lista de empleados directamente
-        ))
+    return build_roster_response(resultados, len(evaluados), start_start_date, end_start_date, dias_laborables)
 
+def calculate_roster_rows(tenant_id, evaluation, employee_ids, filter_range, start_start_date, end_start_date, employees):
+    # Calcula (sin buscar evaluaciones guardadas) las filas de `employee_ids`: {employee_id: resultado}
+    if not employee_ids:
+        return {}
+
+    notes = prefetch_evaluation_notes(tenant_id, evaluation, employee_ids)
+    rows, stamps = {}, {}
+    if filter_range not in CACHEABLE_FILTERS:
+        rows, stamps = lookup_cached_results(
+            tenant_id, evaluation, employee_ids, start_start_date, end_start_date, employees, notes
+        )
+    pending_ids = [e for e in employee_ids if str(e) not in rows]
+    if not pending_ids:
+        return rows
+
+    roster_results = get_roster_kpi_results(evaluation, tenant_id, pending_ids, start_start_date, end_start_date)
+
+    pending_saves = []
+    resultados = run_parallel(
+        tenant_id,
+        lambda employee: calculate_employee_evaluation(
+            tenant_id, evaluation, employee, filter_range, start_start_date, end_start_date, roster_results,
+            employees, {}, notes, pending_saves=pending_saves),
+        pending_ids
+    )
+    flush_evaluation_saves(tenant_id, pending_saves)
+    computed = {
+        str(employee_id): resultado
+        for employee_id, resultado in zip(pending_ids, resultados)
+        if isinstance(resultado, dict)
+    }
+    store_cached_results(tenant_id, str(evaluation["_id"]), computed, stamps, start_start_date, end_start_date)
+
+    rows.update(computed)
+    return rows
+
+def build_roster_response(resultados, total_employees, start_start_date, end_start_date, dias_laborables):
     resultados.sort(key=lambda x: x.get("nota_final", 0), reverse=True)
 
+    # Paso Final: Retornar los resultados
+    return {
+        "resultados": resultados,
+        "totalEmployees": total_employees,
+        "totalPages": 1,
+        "currentPage": 1,
+        "periodo_inicial": start_start_date.isoformat(),
+        "periodo_final": end_start_date.isoformat(),
+        "dias_laborables": dias_laborables,
+        **build_roster_summary(resultados)
+    }
+
+def build_roster_summary(resultados):
+    # Encabezado del reporte: media general, media por sección y dataSections
+
     #Paso 4: Calcular la media de la evaluación
     total_notas = sum(resultado["nota_final"] for resultado in resultados)
     media_evaluacion = round(total_notas / len(resultados), 2) if resultados else 0
@@ -576,56 +890,168 @@ def calculate_evaluation_for_employees(tenant_id, evaluation_id, filter_range, s
 
     data_sections = calculate_data_sections(resultados)
 
-    # Paso Final: Retornar los resultados
+    return {
+        "media_evaluacion": media_evaluacion,
+        "medias_por_seccion": promedio_por_seccion,
+        "dataSections": data_sections
+    }
+
+#<-------------------------------------------METHODS TO PAGINATE THE ROSTER---------------------------------------------------------------------->
+def parse_roster_query(page, page_size, sort_by):
+    """
+    Valida `page`, `pageSize` y `sortBy` de `/evaluate`. Sin `page` se mantiene la respuesta completa.
+    Lanza ValueError con el mensaje para el cliente.
+    """
+    sort_by = sort_by or DEFAULT_SORT_BY
+    parse_sort_by(sort_by)
+
+    if page is None:
+        return None, DEFAULT_PAGE_SIZE, sort_by
+
+    try:
+        page = int(page)
+        page_size = int(page_size) if page_size is not None else DEFAULT_PAGE_SIZE
+    except (TypeError, ValueError):
+        raise ValueError("page y pageSize deben ser números enteros")
+
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page debe ser mayor a 0 y pageSize estar entre 1 y {MAX_PAGE_SIZE}")
+
+    return page, page_size, sort_by
+
+def parse_sort_by(sort_by):
+    # "-campo" ordena de mayor a menor; "campo", de menor a mayor
+    sort_by = sort_by or DEFAULT_SORT_BY
+    descending = sort_by.startswith("-")
+    field = sort_by.lstrip("-")
+    if field not in ROSTER_SORT_FIELDS:
+        raise ValueError(f"sortBy no válido: {sort_by}. Opciones: {', '.join(ROSTER_SORT_FIELDS)}")
+    return field, descending
+
+def get_profile_sort_value(employee, field):
+    if field == "colaborador":
+        value = f"{employee.get('Nombres', '')} {employee.get('Apellidos', '')}"
+    else:
+        value = employee.get(ROSTER_SORT_FIELDS[field]) or ""
+    return str(value).strip().lower()
+
+def get_page_slice(page, page_size):
+    start = (page - 1) * page_size
+    return slice(start, start + page_size)
+
+def select_roster_rows_to_compute(evaluados, employees, history, sort_field, descending, page, page_size):
+    """
+    Decide qué colaboradores hay que calcular para responder la página.
+
+    - Orden por perfil (nombre, departamento, cargo): se ordena con los perfiles precargados y solo
+      se calculan los de la página que no tienen evaluación guardada.
+    - Orden por nota: la nota de quien no tiene evaluación guardada solo se conoce calculándola,
+      así que se calculan todos ellos. Con los filtros cacheables quedan guardados en
+      `evaluationhistory` para las siguientes páginas; con los demás (dia_anterior,
+      ultima_semana, rango_de_fechas) las siguientes páginas leen las filas de la caché de
+      resultados (`result_cache`) y, si está desactivada, cada página recalcula la nómina completa.
+
+    :return: (ids a calcular, ids de la página en orden o None si depende de la nota)
+    """
+    candidates = [e for e in evaluados if str(e) in employees]
+    pending_ids = [e for e in candidates if str(e) not in history]
+
+    if sort_field == "nota_final":
+        return pending_ids, None
+
+    ordered = sorted(
+        candidates, key=lambda e: get_profile_sort_value(employees[str(e)], sort_field), reverse=descending
+    )
+    page_ids = ordered[get_page_slice(page, page_size)]
+    return [e for e in page_ids if str(e) not in history], page_ids
+
+def build_stored_evaluation_result(employee_id, employee, existing):
+    # Fila de la nómina a partir del resumen guardado en `evaluationhistory`
+    return {
+        "_id": str(employee_id),
+        "colaborador": f"{employee.get('Nombres', '')} {employee.get('Apellidos', '')}",
+        "departamento": existing.get("department", "No asignado"),
+        "cargo": existing.get("cargo", "No asignado"),
+        "nota_final": existing["nota_final"],
+        "desempenio": existing["desempenio"],
+        "color": existing["color"],
+        "notas_por_seccion": existing["notas_por_seccion"]
+    }
+
+def build_roster_page_response(evaluados, employees, history, computed, page_ids, sort_field, descending, page, page_size,
+                               start_start_date, end_start_date, dias_laborables):
+    """
+    Respuesta paginada de la nómina. El encabezado (`media_evaluacion`, `medias_por_seccion`,
+    `dataSections`) se arma con los resúmenes guardados más las filas calculadas en esta solicitud;
+    `evaluatedEmployees` indica cuántos colaboradores cubre y `partialSummary` es verdadero si no
+    cubre a toda la nómina (orden por perfil con filas que no están guardadas, por ejemplo en los
+    filtros no persistidos: el encabezado es solo de las filas conocidas, no de la evaluación).
+    """
+    rows = {
+        str(e): build_stored_evaluation_result(e, employees[str(e)], history[str(e)])
+        for e in evaluados if str(e) in history and str(e) in employees
+    }
+    rows.update(computed)
+
+    if page_ids is None:
+        # Orden estable: a igual nota, por nombre
+        ordered = sorted(rows.values(), key=lambda r: r["colaborador"].lower())
+        ordered.sort(key=lambda r: r.get("nota_final", 0), reverse=descending)
+        total_rows = len(ordered)
+        resultados = ordered[get_page_slice(page, page_size)]
+    else:
+        total_rows = sum(1 for e in evaluados if str(e) in employees)
+        resultados = [rows[str(e)] for e in page_ids if str(e) in rows]
+
     return {
         "resultados": resultados,
         "totalEmployees": len(evaluados),
-        "totalPages": 1,
-        "currentPage": 1,
+        "evaluatedEmployees": len(rows),
+        "partialSummary": len(rows) < sum(1 for e in evaluados if str(e) in employees),
+        "totalPages": max(1, -(-total_rows // page_size)),
+        "currentPage": page,
+        "pageSize": page_size,
+        "sortBy": f"{'-' if descending else ''}{sort_field}",
         "periodo_inicial": start_start_date.isoformat(),
         "periodo_final": end_start_date.isoformat(),
-        "media_evaluacion": media_evaluacion,
-        "medias_por_seccion": promedio_por_seccion,  
         "dias_laborables": dias_laborables,
-        "dataSections": data_sections
+        **build_roster_summary(list(rows.values()))
     }
 
-def calculate_employee_evaluation(tenant_id, evaluation, employee_id, filter_range, start_start_date, end_start_date):
+def calculate_employee_evaluation(tenant_id, evaluation, employee_id, filter_range, start_start_date, end_start_date,
+                                  roster_results=None, employees=None, history=None, notes=None, classifier=None,
+                                  pending_saves=None):
 
     #logger.info("Employee: %s", employee_id)
     #logger.info("filter_range: %s", filter_range)
     #logger.info("start_start_date: %s", start_start_date)
     #logger.info("end_start_date: %s", end_start_date)
 
-    # Paso 1: Buscar evaluación guardada
-    evaluation_history_collection = get_collection(tenant_id, "evaluationhistory")
-    existing = evaluation_history_collection.find_one({
-        "employee_id": employee_id,
-        "evaluacion_id": evaluation["_id"],
-        "filter_name": filter_range,
-        "start_date": start_start_date,
-        "end_date": end_start_date
-    })
+    # Paso 1: Buscar evaluación guardada (precargada para toda la nómina si se recibe `history`)
+    if history is not None:
+        existing = history.get(str(employee_id))
+    else:
+        evaluation_history_collection = get_collection(tenant_id, "evaluationhistory")
+        existing = evaluation_history_collection.find_one({
+            "employee_id": str(employee_id),
+            "evaluacion_id": str(evaluation["_id"]),
+            "filter_name": filter_range,
+            "start_date": start_start_date,
+            "end_date": end_start_date
+        })
 
-    # Paso 2: Obtener el _id y parametros necesarios del empleado (solo se hace por empleado)
-    employee_collection = get_collection(tenant_id, 'employee')
-    employee = employee_collection.find_one({"_id": ObjectId(employee_id)}, {"Nombres": 1, "Apellidos": 1, "Departamento": 1, "Cargo": 1, "Area": 1, "Fecha_de_inicio": 1})
+    # Paso 2: Obtener el _id y parametros necesarios del empleado (precargados si se recibe `employees`)
+    if employees is not None:
+        employee = employees.get(str(employee_id))
+    else:
+        employee_collection = get_collection(tenant_id, 'employee')
+        employee = employee_collection.find_one({"_id": ObjectId(employee_id)}, EMPLOYEE_PROFILE_PROJECTION)
 
     if not employee:
         return None, "No se encontró el colaborador a evaluar con el ID proporcionado."
 
     if existing:
-        evaluation_result = {
-            "_id": employee_id,
-            "colaborador": f"{employee.get('Nombres', '')} {employee.get('Apellidos', '')}",
-            "departamento": existing.get("department", "No asignado"),
-            "cargo": existing.get("cargo", "No asignado"),
-            "nota_final": existing["nota_final"],
-            "desempenio": existing["desempenio"],
-            "color": existing["color"],
-            "notas_por_seccion": existing["notas_por_seccion"]
-        }
-        return evaluation_result  
+        return build_stored_evaluation_result(employee_id, employee, existing)
 
     # Paso 3: Construir estructura de resultado
     resultado = {
@@ -646,6 +1072,8 @@ def calculate_employee_evaluation(tenant_id, evaluation, employee_id, filter_ran
         employee_id,
         start_start_date,
         end_start_date,
+        roster_results,
+        notes,
     )
 
     # Actualizar estructura resultado
@@ -653,20 +1081,12 @@ def calculate_employee_evaluation(tenant_id, evaluation, employee_id, filter_ran
     resultado["notas_por_seccion"] = resultado_kpis["notas_por_seccion"]
 
     # Paso Final: asignar desempeño y color
-    try:
-        metadata = get_evaluation_range_by_percentage(resultado["nota_final"], tenant_id)
-        resultado["desempenio"] = metadata.get("title", "Sin clasificación") if metadata else "Sin clasificación"
-        resultado["color"] = metadata.get("color", "#808080") if metadata else "#808080"
-    except (TypeError, KeyError, AttributeError) as e:
-        logger.warning("Error obteniendo desempeño: %s", str(e))
-        resultado["desempenio"] = "Error"
-        resultado["color"] = "#FF0000"
+    assign_performance(resultado, tenant_id, classifier)
 
     # 🔥 Emitir evento SOLO si el filtro es uno de los cacheables
-    CACHEABLE_FILTERS = {"ultimo_mes", "ultimo_trimestre", "ultimo_semestre", "ultimo_anio"}
     if filter_range in CACHEABLE_FILTERS:
     # 🔥 Emitir evento para guardar la evaluación
-        save_employee_evaluation_task.delay(tenant_id, {
+        queue_evaluation_save(tenant_id, {
             "employee_id": str(employee["_id"]),
             "evaluacion_id": str(evaluation["_id"]),
             "department": resultado["departamento"],
@@ -678,11 +1098,11 @@ def calculate_employee_evaluation(tenant_id, evaluation, employee_id, filter_ran
             "start_date": start_start_date,
             "end_date": end_start_date,
             "filter_name": filter_range,
-        })
+        }, pending_saves)
 
     return resultado
 
-def get_kpis_from_grupal_evaluation(evaluation, tenant_id, colaborador_id, start_date, end_date):
+def get_kpis_from_grupal_evaluation(evaluation, tenant_id, colaborador_id, start_date, end_date, roster_results=None, notes=None):
     kpievaluationhistory_collection = get_collection(tenant_id, 'kpievaluationhistory')
 
     # Paso 1: Inicializar variables
@@ -705,7 +1125,7 @@ def get_kpis_from_grupal_evaluation(evaluation, tenant_id, colaborador_id, start
             label_id = str(kpi.get("Etiqueta")) if kpi.get("Etiqueta") else None
             tipo_kpi = kpi.get("Tipo_de_KPI")
 
-            if tipo_kpi in ["formulario", "question", "dropdown", "static_metrics"]:
+            if tipo_kpi in EVALUATION_KPI_TYPES:
                 kpis_tipo_evaluacion.append({
                     "kpi_id": kpi_id,
                     "peso_kpi": peso_kpi,
@@ -720,7 +1140,14 @@ def get_kpis_from_grupal_evaluation(evaluation, tenant_id, colaborador_id, start
                 })
 
         # Paso 3: Buscar notas en `KPIEvaluationHistory` para los KPIs de tipo evaluación
-        if kpis_tipo_evaluacion:
+        if kpis_tipo_evaluacion and notes is not None:
+            # Notas precargadas para toda la nómina
+            colaborador_notes = notes.get(str(colaborador_id), {})
+            notas_dict = {
+                kpi["kpi_id"]: colaborador_notes.get((kpi["kpi_id"], kpi.get("label_id")))
+                for kpi in kpis_tipo_evaluacion
+            }
+        elif kpis_tipo_evaluacion:
             # Construir el pipeline de agregación para todos los KPIs de tipo evaluación
             pipeline_match = {
                 "colaboradorId": ObjectId(colaborador_id),
@@ -743,6 +1170,7 @@ def get_kpis_from_grupal_evaluation(evaluation, tenant_id, colaborador_id, start
             # Crear un diccionario de notas por kpiId para una búsqueda rápida
             notas_dict = {str(note["kpiId"]): note for note in notas_kpi}
 
+        if kpis_tipo_evaluacion:
             # Ahora asignamos las notas a los KPIs correspondientes
             for kpi in kpis_tipo_evaluacion:
                 kpi_id = kpi["kpi_id"]
@@ -767,13 +1195,18 @@ def get_kpis_from_grupal_evaluation(evaluation, tenant_id, colaborador_id, start
                     "metricObjetivo": info.get("Objetivo")
                 })
 
-        # Paso 4: Calcular KPIs de tipo métricas en paralelo usando ThreadPoolExecutor
-        if kpis_tipo_metrics:
-            with ThreadPoolExecutor() as executor:
-                kpi_results = list(executor.map(calculate_kpi_metric, kpis_tipo_metrics, [tenant_id] * len(kpis_tipo_metrics),
-                                                [colaborador_id] * len(kpis_tipo_metrics), [start_date] * len(kpis_tipo_metrics),
-                                                [end_date] * len(kpis_tipo_metrics)))
+        # Paso 4: Calcular KPIs de tipo métricas (desde el lote de la nómina o en paralelo)
+        if kpis_tipo_metrics and roster_results is not None:
+            kpi_results = [
+                calculate_kpi_metric(kpi, tenant_id, colaborador_id, start_date, end_date, roster_results)
+                for kpi in kpis_tipo_metrics
+            ]
+        elif kpis_tipo_metrics:
+            kpi_results = run_parallel(tenant_id, calculate_kpi_metric, kpis_tipo_metrics, [tenant_id] * len(kpis_tipo_metrics),
+                                       [colaborador_id] * len(kpis_tipo_metrics), [start_date] * len(kpis_tipo_metrics),
+                                       [end_date] * len(kpis_tipo_metrics))
 
+        if kpis_tipo_metrics:
             # Filtrar los resultados no nulos y agregar los resultados válidos
             for kpi_result in filter(None, kpi_results):
                 detalles_kpis.append(kpi_result)
@@ -808,7 +1241,7 @@ def calculate_single_employee_evaluation(tenant_id, evaluation_id, employee_id,
 
     # # Paso 2: Calcular fechas
     start_start_date, end_start_date, dias_laborables, dias_no_laborables = define_date_ranges(
-        filter_range, start_date_str, end_date_str, evaluation['Dias_no_laborables']
+        filter_range, start_date_str, end_date_str, evaluation['Dias_no_laborables'], get_tenant_holidays(tenant_id)
     )
 
     # Paso 3: Buscar evaluación guardada
@@ -827,7 +1260,38 @@ def calculate_single_employee_evaluation(tenant_id, evaluation_id, employee_id,
 
     # Paso 4: Obtener el _id y parametros necesarios del empleado
     employee_collection = get_collection(tenant_id, 'employee')
-    employee = employee_collection.find_one({"_id": ObjectId(employee_id)}, {"Nombres": 1, "Apellidos": 1, "Departamento": 1, "Cargo": 1, "Area": 1, "Fecha_de_inicio": 1})
+    employee = employee_collection.find_one({"_id": ObjectId(employee_id)}, EMPLOYEE_PROFILE_PROJECTION)
+
+    if not employee:
+        return None, "No se encontró el colaborador a evaluar con el ID proporcionado."
+
+    # Filtros no persistidos: resultado en caché si sus datos no han cambiado
+    notes = prefetch_evaluation_notes(tenant_id, evaluation, [employee_id])
+    stamps = {}
+    if filter_range not in CACHEABLE_FILTERS:
+        cached_results, stamps = lookup_cached_results(
+            tenant_id, evaluation, [employee_id], start_start_date, end_start_date, {employee_id: employee}, notes
+        )
+        if employee_id in cached_results:
+            return cached_results[employee_id]
+
+    # KPIs que comparten tarea se resuelven en una sola pasada
+    roster_results = get_roster_kpi_results(evaluation, tenant_id, [employee_id], start_start_date, end_start_date)
+
+    resultado = build_single_employee_result(
+        tenant_id, evaluation, evaluation_id, employee, filter_range, start_start_date, end_start_date, roster_results,
+        notes
+    )
+    store_cached_results(tenant_id, str(evaluation["_id"]), {employee_id: resultado}, stamps, start_start_date, end_start_date)
+    return resultado
+
+def build_single_employee_result(tenant_id, evaluation, evaluation_id, employee, filter_range, start_start_date,
+                                 end_start_date, roster_results, notes=None, classifier=None):
+    """
+    Calcula la nota del colaborador con los KPIs ya resueltos (`roster_results`, `notes`) y
+    emite el guardado si el filtro es cacheable. La usan la versión síncrona y la asíncrona.
+    """
+    employee_id = str(employee["_id"])
 
     # Paso 5: Construir estructura de resultado
     resultado = {
@@ -841,9 +1305,6 @@ def calculate_single_employee_evaluation(tenant_id, evaluation_id, employee_id,
         "notas_por_seccion": []
     }
 
-    if not employee:
-        return None, "No se encontró el colaborador a evaluar con el ID proporcionado."
-
     # 🎯 Nuevo paso: calcular KPIs desde evaluación
     resultado_kpis = get_kpis_from_evaluation(
         evaluation,
@@ -851,6 +1312,8 @@ def calculate_single_employee_evaluation(tenant_id, evaluation_id, employee_id,
         employee_id,
         start_start_date,
         end_start_date,
+        roster_results,
+        notes,
     )
 
     # Actualizar estructura resultado
@@ -862,20 +1325,12 @@ def calculate_single_employee_evaluation(tenant_id, evaluation_id, employee_id,
     #logger.info("result %s", resultado_kpis["nota_final"])
 
     # Paso Final: asignar desempeño y color
-    try:
-        metadata = get_evaluation_range_by_percentage(resultado["nota_final"], tenant_id)
-        resultado["desempenio"] = metadata.get("title", "Sin clasificación") if metadata else "Sin clasificación"
-        resultado["color"] = metadata.get("color", "#808080") if metadata else "#808080"
-    except (TypeError, KeyError, AttributeError) as e:
-        logger.warning("Error obteniendo desempeño: %s", str(e))
-        resultado["desempenio"] = "Error"
-        resultado["color"] = "#FF0000"
+    assign_performance(resultado, tenant_id, classifier)
 
     # 🔥 Emitir evento SOLO si el filtro es uno de los cacheables
-    CACHEABLE_FILTERS = {"ultimo_mes", "ultimo_trimestre", "ultimo_semestre", "ultimo_anio"}
     if filter_range in CACHEABLE_FILTERS:
         # 🔥 Emitir evento para guardar la evaluación
-        save_employee_evaluation_task.delay(tenant_id, {
+        queue_evaluation_save(tenant_id, {
             "employee_id": str(employee["_id"]),
             "evaluacion_id": str(evaluation_id),
             "department": resultado["departamento"],
@@ -890,7 +1345,7 @@ def calculate_single_employee_evaluation(tenant_id, evaluation_id, employee_id,
         })
     return resultado
 
-def get_kpis_from_evaluation(evaluation, tenant_id, colaborador_id, start_date, end_date):
+def get_kpis_from_evaluation(evaluation, tenant_id, colaborador_id, start_date, end_date, roster_results=None, notes=None):
     kpievaluationhistory_collection = get_collection(tenant_id, 'kpievaluationhistory')
 
     # Paso 1: Inicializar variables
@@ -913,7 +1368,7 @@ def get_kpis_from_evaluation(evaluation, tenant_id, colaborador_id, start_date,
             label_id = str(kpi.get("Etiqueta")) if kpi.get("Etiqueta") else None
             tipo_kpi = kpi.get("Tipo_de_KPI")
 
-            if tipo_kpi in ["formulario", "question", "dropdown", "static_metrics"]:
+            if tipo_kpi in EVALUATION_KPI_TYPES:
                 kpis_tipo_evaluacion.append({
                     "kpi_id": kpi_id,
                     "peso_kpi": peso_kpi,
@@ -928,7 +1383,14 @@ def get_kpis_from_evaluation(evaluation, tenant_id, colaborador_id, start_date,
                 })
 
         # Paso 3: Buscar notas en `KPIEvaluationHistory` para los KPIs de tipo evaluación
-        if kpis_tipo_evaluacion:
+        if kpis_tipo_evaluacion and notes is not None:
+            # Notas precargadas para toda la nómina
+            colaborador_notes = notes.get(str(colaborador_id), {})
+            notas_dict = {
+                kpi["kpi_id"]: colaborador_notes.get((kpi["kpi_id"], kpi.get("label_id")))
+                for kpi in kpis_tipo_evaluacion
+            }
+        elif kpis_tipo_evaluacion:
             # Construir el pipeline de agregación para todos los KPIs de tipo evaluación
             pipeline_match = {
                 "colaboradorId": ObjectId(colaborador_id),
@@ -951,6 +1413,7 @@ def get_kpis_from_evaluation(evaluation, tenant_id, colaborador_id, start_date,
             # Crear un diccionario de notas por kpiId para una búsqueda rápida
             notas_dict = {str(note["kpiId"]): note for note in notas_kpi}
 
+        if kpis_tipo_evaluacion:
             # Ahora asignamos las notas a los KPIs correspondientes
             for kpi in kpis_tipo_evaluacion:
                 kpi_id = kpi["kpi_id"]
@@ -975,13 +1438,18 @@ def get_kpis_from_evaluation(evaluation, tenant_id, colaborador_id, start_date,
                     "metricObjetivo": info.get("Objetivo")
                 })
 
-        # Paso 4: Calcular KPIs de tipo métricas en paralelo usando ThreadPoolExecutor
-        if kpis_tipo_metrics:
-            with ThreadPoolExecutor() as executor:
-                kpi_results = list(executor.map(calculate_kpi_metric, kpis_tipo_metrics, [tenant_id] * len(kpis_tipo_metrics),
-                                                [colaborador_id] * len(kpis_tipo_metrics), [start_date] * len(kpis_tipo_metrics),
-                                                [end_date] * len(kpis_tipo_metrics)))
+        # Paso 4: Calcular KPIs de tipo métricas (desde el lote de la nómina o en paralelo)
+        if kpis_tipo_metrics and roster_results is not None:
+            kpi_results = [
+                calculate_kpi_metric(kpi, tenant_id, colaborador_id, start_date, end_date, roster_results)
+                for kpi in kpis_tipo_metrics
+            ]
+        elif kpis_tipo_metrics:
+            kpi_results = run_parallel(tenant_id, calculate_kpi_metric, kpis_tipo_metrics, [tenant_id] * len(kpis_tipo_metrics),
+                                       [colaborador_id] * len(kpis_tipo_metrics), [start_date] * len(kpis_tipo_metrics),
+                                       [end_date] * len(kpis_tipo_metrics))
 
+        if kpis_tipo_metrics:
             # Filtrar los resultados no nulos y agregar los resultados válidos
             for kpi_result in filter(None, kpi_results):
                 detalles_kpis.append(kpi_result)
@@ -1006,16 +1474,35 @@ def get_kpis_from_evaluation(evaluation, tenant_id, colaborador_id, start_date,
         "nota_final": round(nota_final, 2)
     }
 
-def calculate_kpi_metric(kpi, tenant_id, colaborador_id, start_date, end_date):
+def assign_performance(resultado, tenant_id, classifier=None):
+    # Desempeño y color según la nota final (con `classifier`, el clasificador de rangos ya cargado)
+    try:
+        if classifier is not None:
+            metadata = classifier.classify(resultado["nota_final"])
+        else:
+            metadata = get_evaluation_range_by_percentage(resultado["nota_final"], tenant_id)
+        resultado["desempenio"] = metadata.get("title", "Sin clasificación") if metadata else "Sin clasificación"
+        resultado["color"] = metadata.get("color", "#808080") if metadata else "#808080"
+    except (TypeError, KeyError, AttributeError) as e:
+        logger.warning("Error obteniendo desempeño: %s", str(e))
+        resultado["desempenio"] = "Error"
+        resultado["color"] = "#FF0000"
+
+def calculate_kpi_metric(kpi, tenant_id, colaborador_id, start_date, end_date, roster_results=None):
     info = kpi["kpi_info"]
     task_id = info.get("Task")
     if not task_id:
         return None  # Si no tiene task_id, no se hace nada.
 
-    # Llamamos a la función que calcula el KPI
-    kpi_result = get_kpi_evaluation(
-        task_id, info, tenant_id, colaborador_id, start_date, end_date
-    )
+    # Si la nómina ya fue evaluada en lote, solo se toma el resultado del colaborador
+    roster_kpi = (roster_results or {}).get(kpi["kpi_id"], {})
+    kpi_result = roster_kpi.get(str(colaborador_id))
+
+    if kpi_result is None:
+        # Llamamos a la función que calcula el KPI
+        kpi_result = get_kpi_evaluation(
+            task_id, info, tenant_id, colaborador_id, start_date, end_date
+        )
 
     # Estructuramos el resultado
     return {
@@ -0,0 +1,46 @@
+import logging
+import threading
+import time
+from datetime import date, datetime
+from typing import Tuple
+from evaluation.mongo_client import get_collection
+from evaluation.utils.business_days import to_local_date
+
+logger = logging.getLogger(__name__)
+
+# Los feriados cambian muy pocas veces al año; se mantienen en memoria por proceso
+HOLIDAYS_TTL_SECONDS = 600
+
+_holidays_cache = {}
+_holidays_lock = threading.Lock()
+
+
+def get_tenant_holidays(tenant_id: str) -> Tuple[date, ...]:
+    """
+    Retorna los feriados del tenant (colección `metadataholidays`, campo `Fecha`)
+    como una tupla ordenada de días locales, lista para `count_working_days`.
+    """
+    now = time.monotonic()
+    cached = _holidays_cache.get(tenant_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    with _holidays_lock:
+        cached = _holidays_cache.get(tenant_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        try:
+            collection = get_collection(tenant_id, 'metadataholidays')
+            docs = collection.find({}, {"Fecha": 1, "_id": 0})
+            holidays = tuple(sorted({
+                to_local_date(doc["Fecha"]) for doc in docs
+                if isinstance(doc.get("Fecha"), (datetime, date))
+            }))
+        except Exception as e:
+            # Sin calendario disponible se cuentan solo los días de la semana
+            logger.warning("No se pudieron obtener los feriados del tenant %s: %s", tenant_id, str(e))
+            holidays = ()
+
+        _holidays_cache[tenant_id] = (now + HOLIDAYS_TTL_SECONDS, holidays)
+        return holidays
@@ -0,0 +1,292 @@
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pymongo.errors import PyMongoError
+from evaluation.mongo_client import get_client, get_collection
+
+logger = logging.getLogger(__name__)
+
+TENANT_DB_PREFIX = "tenant_"
+
+# MongoDB admite 64 índices por colección; se deja margen para los que ya existan
+MAX_TASKLOG_INDEXES = 32
+
+EVALUATION_HISTORY_KEYS = (("employee_id", 1), ("evaluacion_id", 1), ("filter_name", 1), ("start_date", 1), ("end_date", 1))
+METRIC_KPI_HISTORY_KEYS = (("employeeId", 1), ("kpiId", 1), ("Fecha_de_inicio", 1), ("Fecha_de_fin", 1))
+EVALUATION_NOTES_KEYS = (("colaboradorId", 1), ("kpiId", 1), ("labelId", 1))
+
+# Índices de las colecciones de historial (claves de búsqueda de evaluations_analysis,
+# services_evaluation_history y kpi_rollups)
+HISTORY_INDEXES = {
+    "evaluationhistory": [EVALUATION_HISTORY_KEYS],
+    "kpievaluationhistory": [METRIC_KPI_HISTORY_KEYS, EVALUATION_NOTES_KEYS],
+}
+
+# Claves de upsert de services_evaluation_history: un solo documento por clave. En kpievaluationhistory
+# conviven las notas de evaluación (sin `employeeId`), por eso el índice es parcial. Ambos son parciales
+# para que MongoDB acepte crearlos junto al índice no único con las mismas claves antes de eliminarlo.
+# Se crean solos si la colección no tiene duplicados; si los tiene, con `provision_indexes --dedupe`.
+UNIQUE_INDEX_OPTIONS = {
+    EVALUATION_HISTORY_KEYS: {"unique": True, "partialFilterExpression": {"employee_id": {"$exists": True}}},
+    METRIC_KPI_HISTORY_KEYS: {"unique": True, "partialFilterExpression": {"employeeId": {"$exists": True}}},
+}
+
+# Campo con la fecha de la última escritura: al deduplicar se conserva el documento más reciente
+HISTORY_WRITTEN_AT = {"evaluationhistory": "created_at", "kpievaluationhistory": "Fecha_de_creacion"}
+
+# Índices ya verificados en este proceso: {(tenant_id, colección, claves)}
+_ensured = set()
+_ensured_lock = threading.Lock()
+
+
+def list_tenants() -> List[str]:
+    return sorted(
+        name[len(TENANT_DB_PREFIX):] for name in get_client().list_database_names()
+        if name.startswith(TENANT_DB_PREFIX)
+    )
+
+
+def get_kpi_tasklog_indexes(kpis: Iterable[Dict[str, Any]]) -> List[Tuple]:
+    """
+    Índices de tasklog que necesitan las consultas de `kpi_calculator`:
+    igualdad sobre TaskId, colaboradorId y `Filters`, rango sobre `Filtro_de_fecha`.
+    """
+    indexes = []
+    for kpi in kpis:
+        filter_date = kpi.get("Filtro_de_fecha") or "Fecha_de_creacion"
+        filter_keys = sorted({
+            f["key"] for f in kpi.get("Filters") or []
+            if isinstance(f, dict) and f.get("key") and f["key"] not in ("TaskId", "colaboradorId", filter_date)
+        })
+
+        base = (("TaskId", 1), ("colaboradorId", 1), (filter_date, 1))
+        if base not in indexes:
+            indexes.append(base)
+
+        if filter_keys:
+            with_filters = (("TaskId", 1), ("colaboradorId", 1), *((k, 1) for k in filter_keys), (filter_date, 1))
+            if with_filters not in indexes:
+                indexes.append(with_filters)
+
+    return indexes
+
+
+def get_required_indexes(tenant_id: str) -> Dict[str, List[Tuple]]:
+    kpi_collection = get_collection(tenant_id, 'kpi')
+    kpis = kpi_collection.find({}, {"Filtro_de_fecha": 1, "Filters": 1})
+
+    return {"tasklog": get_kpi_tasklog_indexes(kpis), **HISTORY_INDEXES}
+
+
+def get_existing_indexes(collection) -> Dict[Tuple, List[Dict[str, Any]]]:
+    # {claves: [información de cada índice con esas claves (name, unique, partialFilterExpression...)]}
+    indexes = {}
+    for name, info in collection.index_information().items():
+        keys = tuple((k, d if isinstance(d, str) else int(d)) for k, d in info["key"])
+        indexes.setdefault(keys, []).append({"name": name, **info})
+    return indexes
+
+
+def has_index_options(info: Dict[str, Any], options: Dict[str, Any]) -> bool:
+    return all(info.get(option) == value for option, value in options.items())
+
+
+def get_unique_index_name(keys: Tuple) -> str:
+    return "_".join(f"{k}_{d}" for k, d in keys) + "_unique"
+
+
+def build_duplicates_pipeline(keys: Tuple, options: Dict[str, Any], sort: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    # Grupos con más de un documento por clave (los `ids` en el orden de `sort`)
+    pipeline = [{"$match": options.get("partialFilterExpression", {})}]
+    if sort:
+        pipeline.append({"$sort": sort})
+    pipeline += [
+        {"$group": {"_id": {k: f"${k}" for k, _ in keys}, "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ]
+    return pipeline
+
+
+def has_duplicates(collection, keys: Tuple, options: Dict[str, Any]) -> bool:
+    pipeline = build_duplicates_pipeline(keys, options) + [{"$limit": 1}]
+    return next(collection.aggregate(pipeline, allowDiskUse=True), None) is not None
+
+
+def remove_duplicates(collection, keys: Tuple, options: Dict[str, Any], written_at: Optional[str]) -> int:
+    """
+    Elimina los documentos repetidos por clave (quedan de los check-then-insert concurrentes)
+    para poder crear el índice único. Se conserva el escrito más recientemente.
+    """
+    sort = {written_at: -1, "_id": -1} if written_at else {"_id": -1}
+    pipeline = build_duplicates_pipeline(keys, options, sort)
+
+    duplicated = [_id for doc in collection.aggregate(pipeline, allowDiskUse=True) for _id in doc["ids"][1:]]
+    for i in range(0, len(duplicated), 1000):
+        collection.delete_many({"_id": {"$in": duplicated[i:i + 1000]}})
+
+    if duplicated:
+        logger.info("Eliminados %s documentos duplicados en %s", len(duplicated), collection.name)
+    return len(duplicated)
+
+
+def create_index(collection, collection_base: str, keys: Tuple, options: Dict[str, Any],
+                 current: List[Dict[str, Any]], dedupe: bool = False) -> Dict[str, Any]:
+    """
+    Crea el índice. Si es único (y `dedupe`, primero deduplica) lo construye con otro nombre; los
+    índices anteriores con las mismas claves se eliminan solo cuando el nuevo ya existe, así un fallo
+    al construirlo (un duplicado escrito entretanto) deja la colección con su índice de siempre.
+    """
+    if not options.get("unique"):
+        return {"name": collection.create_index(list(keys), **options)}
+
+    entry = {}
+    if dedupe:
+        entry["removed_duplicates"] = remove_duplicates(collection, keys, options, HISTORY_WRITTEN_AT.get(collection_base))
+    entry["name"] = collection.create_index(list(keys), name=get_unique_index_name(keys), **options)
+
+    replaced = [info["name"] for info in current if info["name"] != entry["name"]]
+    for name in replaced:
+        collection.drop_index(name)
+    if replaced:
+        entry["replaced"] = ", ".join(replaced)
+    return entry
+
+
+def provision_collection_indexes(tenant_id: str, collection_base: str, indexes: List[Tuple],
+                                 dry_run: bool = False, dedupe: bool = False) -> List[Dict[str, Any]]:
+    """
+    Crea los índices que faltan en una colección del tenant. Un índice único se crea (o reemplaza
+    al no único) si la colección no tiene documentos repetidos por su clave; si los tiene y no se
+    pide `dedupe`, queda el índice normal y se reporta `pending_unique`: deduplicar borra documentos
+    y se hace solo a pedido, desde un único proceso.
+
+    :return: Un registro por índice con su estado: "exists", "created", "missing" (dry run),
+             "skipped" (límite de índices) o "error".
+    """
+    collection = get_collection(tenant_id, collection_base)
+    existing = get_existing_indexes(collection)
+    limit = MAX_TASKLOG_INDEXES if collection_base == "tasklog" else None
+
+    report = []
+    for keys in indexes:
+        entry = {"tenant": tenant_id, "collection": collection.name, "keys": list(keys)}
+        unique_options = UNIQUE_INDEX_OPTIONS.get(keys, {})
+        current = existing.get(keys, [])
+
+        if any(has_index_options(info, unique_options) for info in current):
+            entry["status"] = "exists"
+            report.append(entry)
+            continue
+        if not current and limit is not None and len(existing) >= limit:
+            entry["status"] = "skipped"
+            report.append(entry)
+            continue
+
+        try:
+            # Con duplicados (y sin `dedupe`) solo se asegura el índice normal
+            if unique_options and not dedupe and has_duplicates(collection, keys, unique_options):
+                entry["pending_unique"] = True
+                options = {}
+            else:
+                options = unique_options
+
+            if current and not options:
+                entry["status"] = "exists"
+            elif dry_run:
+                entry["status"] = "missing"
+            else:
+                entry.update(create_index(collection, collection_base, keys, options, current, dedupe))
+                entry["status"] = "created"
+                existing[keys] = [{"name": entry["name"], **options}]
+        except PyMongoError as e:
+            entry["status"] = "error"
+            entry["error"] = str(e)
+
+        report.append(entry)
+
+    return report
+
+
+def provision_tenant_indexes(tenant_id: str, dry_run: bool = False, dedupe: bool = False) -> List[Dict[str, Any]]:
+    report = []
+    for collection_base, indexes in get_required_indexes(tenant_id).items():
+        report += provision_collection_indexes(tenant_id, collection_base, indexes, dry_run, dedupe)
+
+    with _ensured_lock:
+        for entry in report:
+            if entry["status"] in ("exists", "created"):
+                _ensured.add((tenant_id, entry["collection"], tuple(entry["keys"])))
+
+    return report
+
+
+def provision_all_indexes(tenants: Optional[List[str]] = None, dry_run: bool = False,
+                          dedupe: bool = False) -> List[Dict[str, Any]]:
+    report = []
+    for tenant_id in tenants or list_tenants():
+        try:
+            report += provision_tenant_indexes(tenant_id, dry_run, dedupe)
+        except PyMongoError as e:
+            logger.warning("No se pudieron revisar los índices del tenant %s: %s", tenant_id, str(e))
+            report.append({"tenant": tenant_id, "collection": None, "keys": [], "status": "error", "error": str(e)})
+    return report
+
+
+def ensure_kpi_indexes(tenant_id: str, kpis: Iterable[Dict[str, Any]]) -> None:
+    """
+    Verifica los índices de tasklog de los KPIs recién leídos (por ejemplo al refrescar la
+    evaluación en caché), así un KPI nuevo no provoca collection scans hasta el próximo arranque.
+    Aquí solo se revisa qué falta (una lectura de `listIndexes`); los que faltan se crean en
+    segundo plano con `provision_tasklog_indexes_task`, sin bloquear la petición ni el recálculo.
+    Cada índice se revisa una sola vez por proceso.
+    """
+    collection_name = get_collection(tenant_id, 'tasklog').name
+    with _ensured_lock:
+        pending = [
+            keys for keys in get_kpi_tasklog_indexes(kpis)
+            if (tenant_id, collection_name, keys) not in _ensured
+        ]
+    if not pending:
+        return
+
+    try:
+        report = provision_collection_indexes(tenant_id, 'tasklog', pending, dry_run=True)
+    except PyMongoError as e:
+        logger.warning("No se pudieron verificar los índices de tasklog del tenant %s: %s", tenant_id, str(e))
+        return
+
+    missing = [entry["keys"] for entry in report if entry["status"] == "missing"]
+    with _ensured_lock:
+        for entry in report:
+            # Los que faltan quedan como revisados: ya van en el task de abajo
+            if entry["status"] in ("exists", "missing"):
+                _ensured.add((tenant_id, collection_name, tuple(entry["keys"])))
+            elif entry["status"] == "skipped":
+                logger.warning("Índice no creado en %s (límite de índices): %s", collection_name, entry["keys"])
+
+    if missing:
+        from evaluation.tasks import provision_tasklog_indexes_task
+        logger.info("Índices pendientes en %s, se crean en segundo plano: %s", collection_name, missing)
+        provision_tasklog_indexes_task.delay(tenant_id, missing)
+
+
+def start_index_provisioning() -> threading.Thread:
+    # Hook de arranque: se ejecuta en segundo plano para no bloquear el inicio del proceso
+    def run():
+        try:
+            report = provision_all_indexes()
+        except PyMongoError as e:
+            logger.warning("No se pudieron aprovisionar los índices de MongoDB: %s", str(e))
+            return
+        created = [e for e in report if e["status"] == "created"]
+        missing = [e for e in report if e["status"] in ("skipped", "error")]
+        pending_unique = [e for e in report if e.get("pending_unique")]
+        logger.info("Índices de MongoDB: %s creados, %s sin crear", len(created), len(missing))
+        if pending_unique:
+            logger.info("%s índices de historial sin la opción única: ejecuta provision_indexes --dedupe", len(pending_unique))
+        for entry in missing:
+            logger.warning("Índice sin crear en %s: %s (%s)", entry["collection"], entry["keys"], entry.get("error", entry["status"]))
+
+    thread = threading.Thread(target=run, name="mongo-index-provisioning", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,126 @@
+"""
+Verifica con `explain` que las búsquedas reales de KPIs e historial usan un índice en cada tenant.
+Los filtros se construyen con las mismas funciones que usan los servicios, con valores de ejemplo.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from evaluation.mongo_client import get_collection
+from evaluation.services.evaluations_analysis import build_evaluation_notes_match
+from evaluation.services.index_provisioning import list_tenants
+from evaluation.services.kpi_calculator import build_fused_kpi_queries
+from evaluation.services.kpi_rollups import build_rollup_pipeline
+from evaluation.services.services_evaluation_history import get_evaluation_filter, get_metric_kpi_filter
+
+logger = logging.getLogger(__name__)
+
+
+def get_plan_stages(plan: Any) -> List[str]:
+    # Etapas del plan ganador en cualquier nivel (inputStage, inputStages, queryPlan...)
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages += get_plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            stages += get_plan_stages(value)
+    return stages
+
+
+def get_plan_indexes(plan: Any) -> List[str]:
+    if isinstance(plan, dict):
+        names = [plan["indexName"]] if "indexName" in plan else []
+        return names + [n for value in plan.values() for n in get_plan_indexes(value)]
+    if isinstance(plan, list):
+        return [n for value in plan for n in get_plan_indexes(value)]
+    return []
+
+
+def get_history_lookups() -> List[Tuple[str, str, Dict[str, Any]]]:
+    # [(colección, descripción, filtro)] de las búsquedas en las colecciones de historial
+    sample_id = ObjectId()
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=30)
+
+    evaluation = {"Secciones": [{"KpisSeccion": [
+        {"Tipo_de_KPI": "formulario", "KpiId": sample_id, "Etiqueta": sample_id},
+        {"Tipo_de_KPI": "static_metrics", "KpiId": sample_id},
+    ]}]}
+    rollup_match = build_rollup_pipeline([{"_id": sample_id}], [sample_id], start_date, end_date)[0]["$match"]
+
+    return [
+        ("evaluationhistory", "evaluación guardada", get_evaluation_filter({
+            "employee_id": str(sample_id), "evaluacion_id": str(sample_id), "filter_name": "ultimo_mes",
+            "start_date": start_date, "end_date": end_date,
+        })),
+        ("kpievaluationhistory", "resultado de KPI de métricas", get_metric_kpi_filter({
+            "employeeId": sample_id, "kpiId": sample_id, "Fecha_de_inicio": start_date, "Fecha_de_fin": end_date,
+        })),
+        ("kpievaluationhistory", "rollups diarios", rollup_match),
+        ("kpievaluationhistory", "notas de evaluación", build_evaluation_notes_match(evaluation, [sample_id])),
+    ]
+
+
+def get_tasklog_lookups(tenant_id: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+    # Un $match por forma de consulta (mismos campos) de las agregaciones fusionadas de cada tarea
+    kpis_by_id = {str(k["_id"]): k for k in get_collection(tenant_id, 'kpi').find({})}
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=30)
+
+    lookups, shapes = [], set()
+    for task in get_collection(tenant_id, 'task').find({"Kpis": {"$exists": True, "$ne": []}}, {"Kpis": 1}):
+        kpis = [kpis_by_id[str(k)] for k in task["Kpis"] if str(k) in kpis_by_id]
+        if not kpis:
+            continue
+        for _, pipeline in build_fused_kpi_queries(task["_id"], kpis, [ObjectId()], start_date, end_date):
+            match = pipeline[0]["$match"]
+            shape = tuple(sorted(match))
+            if shape not in shapes:
+                shapes.add(shape)
+                lookups.append(("tasklog", f"KPIs de la tarea {task['_id']}", match))
+    return lookups
+
+
+def explain_lookup(tenant_id: str, collection_base: str, description: str, query: Dict[str, Any]) -> Dict[str, Any]:
+    collection = get_collection(tenant_id, collection_base)
+    entry = {"tenant": tenant_id, "collection": collection.name, "lookup": description, "fields": sorted(query)}
+    try:
+        plan = collection.find(query).explain()["queryPlanner"]["winningPlan"]
+    except PyMongoError as e:
+        entry.update(status="error", error=str(e))
+        return entry
+
+    entry["stages"] = get_plan_stages(plan)
+    entry["indexes"] = get_plan_indexes(plan)
+    if "COLLSCAN" in entry["stages"]:
+        entry["status"] = "collscan"
+    elif entry["indexes"]:
+        entry["status"] = "index"
+    else:
+        # Colección vacía o inexistente (EOF): no hay nada que recorrer
+        entry["status"] = "empty"
+    return entry
+
+
+def verify_tenant_indexes(tenant_id: str) -> List[Dict[str, Any]]:
+    return [
+        explain_lookup(tenant_id, collection_base, description, query)
+        for collection_base, description, query in get_history_lookups() + get_tasklog_lookups(tenant_id)
+    ]
+
+
+def verify_all_indexes(tenants: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    report = []
+    for tenant_id in tenants or list_tenants():
+        try:
+            report += verify_tenant_indexes(tenant_id)
+        except PyMongoError as e:
+            logger.warning("No se pudieron verificar los índices del tenant %s: %s", tenant_id, str(e))
+            report.append({"tenant": tenant_id, "collection": None, "lookup": "", "fields": [],
+                           "status": "error", "error": str(e)})
+    return report
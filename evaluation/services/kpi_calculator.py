@@ -1,60 +1,181 @@
 import logging
+import threading
+from collections import OrderedDict
 from pytz import timezone
 import pytz
-from bson import ObjectId
+from bson import ObjectId, json_util
 from evaluation.mongo_client import get_collection
-from datetime import timedelta
-from typing import List, Dict, Any, Optional
+from datetime import date
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from evaluation.utils.business_days import count_working_days, parse_excluded_days, working_days_mask
+from evaluation.services.holiday_calendar import get_tenant_holidays
+from evaluation.services.kpi_formulas import get_formula
 
 logger = logging.getLogger(__name__)
 # Zona horaria de Ecuador
 Ecuador_tz = pytz.timezone('America/Guayaquil')
 
-def calculate_working_days(start_date, end_date, excluded_days: List[int]) -> (int, int):
-    # Asegurarse de que las fechas sean convertidas a la zona horaria de Ecuador
-    start_date = start_date.astimezone(Ecuador_tz) if start_date.tzinfo else start_date
-    end_date = end_date.astimezone(Ecuador_tz) if end_date.tzinfo else end_date
-
-    # Normalizamos las fechas a las 00:00 para el inicio y 23:59 para el fin en la zona horaria de Ecuador
-    start_local = start_date.replace(hour=0, minute=0, second=0)
-    end_local = end_date.replace(hour=23, minute=59, second=59)
-
-    days_considered = 0
-    non_considered_days = 0
-    d = start_local
-
-    # Mapeo de días en Python: 0 = lunes, 1 = martes, ..., 6 = domingo
-    # Los días excluidos estarán en la lista 'excluded_days' (0 para lunes, 6 para domingo)
-    
-    # Calculamos los días laborables y no laborables
-    while d <= end_local:
-        day_of_week = d.weekday()  # `weekday()` devuelve 0 para lunes, 1 para martes, ..., 6 para domingo
-        if day_of_week not in excluded_days:
-            days_considered += 1
-        else:
-            non_considered_days += 1
-        d += timedelta(days=1)
-
-    return days_considered, non_considered_days
+def calculate_working_days(start_date, end_date, excluded_days: List[int],
+                           holidays: Optional[Sequence[date]] = None) -> (int, int):
+    # Conteo en tiempo constante (bitmask semanal + feriados del tenant), días locales de Ecuador
+    return count_working_days(start_date, end_date, excluded_days, holidays)
 
 def apply_kpi_formula(values: List[Any], formula: str) -> float:
-    if formula == "count":
-        return len(values)
-    elif formula == "count_distinct":
-        return len(set(values))
-    elif formula == "sum":
-        numeric_values = []
-        for val in values:
-            if isinstance(val, str):
-                try:
-                    val = float(val)
-                except ValueError:
-                    continue
-            if isinstance(val, (int, float)):
-                numeric_values.append(val)
-        return sum(numeric_values)
+    # Reducción en Python/NumPy con el registro de fórmulas (ver `kpi_formulas`)
+    return get_formula(formula).reduce(values)
+
+def to_mongo_day_of_week(day_index: int) -> int:
+    # Python: 0 = lunes ... 6 = domingo  →  MongoDB $dayOfWeek: 1 = domingo ... 7 = sábado
+    return (day_index + 1) % 7 + 1
+
+def build_excluded_days_stages(filter_date: str, excluded_days: List[int]) -> List[Dict[str, Any]]:
+    """
+    Etapas que descartan los registros cuyo día local (America/Guayaquil) es no laborable.
+    """
+    if not excluded_days:
+        return []
+
+    mongo_days = sorted({to_mongo_day_of_week(d) for d in excluded_days})
+    return [{"$match": {"$expr": {"$not": [{"$in": [
+        {"$dayOfWeek": {"date": f"${filter_date}", "timezone": "America/Guayaquil"}},
+        mongo_days
+    ]}]}}}]
+
+def build_month_bucket(filter_date: str) -> Dict[str, Any]:
+    # Inicio del mes local (America/Guayaquil) del registro
+    return {"$dateTrunc": {"date": f"${filter_date}", "unit": "month", "timezone": "America/Guayaquil"}}
+
+def to_local_month(value) -> date:
+    # `_id` de un grupo por `build_month_bucket` (datetime naive en UTC) → primer día del mes local
+    if value.tzinfo is None:
+        value = pytz.utc.localize(value)
+    return value.astimezone(Ecuador_tz).date().replace(day=1)
+
+def build_formula_stages(field_to_evaluate: str, formula: str, group_key: Any = None) -> List[Dict[str, Any]]:
+    """
+    Etapas de agregación que calculan la fórmula del KPI en el servidor.
+    Cada grupo (`group_key`, por defecto uno solo) devuelve un documento `{"_id": ..., "value": ...}`;
+    el valor final se obtiene con `get_formula(formula).finalize(doc["value"])`.
+    """
+    return get_formula(formula).build_stages(field_to_evaluate, group_key)
+
+# Campos de la definición del KPI que determinan su versión compilada
+KPI_DEFINITION_FIELDS = (
+    "_id", "KpiId", "Filtro_de_fecha", "Campo_a_evaluar", "Formula", "Objetivo",
+    "Unidad_de_tiempo", "Dias_no_laborables", "Filters"
+)
+
+# Máximo de definiciones compiladas en memoria (LRU por proceso)
+COMPILED_KPI_CACHE_SIZE = 2048
+
+_compiled_kpis = OrderedDict()
+_compiled_kpis_lock = threading.Lock()
+
+
+class CompiledKpi:
+    """
+    Definición de KPI ya interpretada: filtros, días no laborables, objetivo y etapas de
+    agregación se calculan una vez por versión del KPI y se reutilizan entre colaboradores
+    y solicitudes. Las etapas precalculadas se comparten: no se deben modificar.
+    """
+    __slots__ = (
+        "filter_date", "field_to_evaluate", "formula", "formula_def", "target", "unit_time",
+        "excluded_days", "working_days_mask", "dynamic_filters",
+        "single_stages", "roster_stages", "monthly_stages"
+    )
+
+    def __init__(self, kpi_data: Dict[str, Any]):
+        try:
+            # Verifica si "Filters" existe y tiene elementos
+            if "Filters" in kpi_data and kpi_data["Filters"]:
+                dynamic_filters = {f["key"]: f["value"] for f in kpi_data["Filters"] if "key" in f and "value" in f}
+            else:
+                dynamic_filters = {}
+
+            self.filter_date = kpi_data.get("Filtro_de_fecha", "Fecha_de_creacion")
+            self.field_to_evaluate = kpi_data["Campo_a_evaluar"]
+            self.formula = kpi_data["Formula"]
+            self.target = float(kpi_data.get("Objetivo", 0))
+            self.unit_time = float(kpi_data.get("Unidad_de_tiempo", 1))
+            self.excluded_days = parse_excluded_days(kpi_data.get("Dias_no_laborables", ["Saturday", "Sunday"]))
+        except KeyError as e:
+            raise ValueError(f"Missing required KPI field: {e}")
+
+        self.formula_def = get_formula(self.formula)
+        self.working_days_mask = working_days_mask(self.excluded_days)
+        self.dynamic_filters = dynamic_filters
+
+        excluded_days_stages = build_excluded_days_stages(self.filter_date, self.excluded_days)
+        self.single_stages = excluded_days_stages + self.formula_def.build_stages(self.field_to_evaluate)
+        self.roster_stages = excluded_days_stages + self.formula_def.build_stages(
+            self.field_to_evaluate, group_key="$colaboradorId"
+        )
+        self.monthly_stages = excluded_days_stages + self.formula_def.build_stages(
+            self.field_to_evaluate, group_key=build_month_bucket(self.filter_date)
+        )
+
+    def build_match(self, task_oid: ObjectId, colaborador_id, start_date, end_date) -> Dict[str, Any]:
+        match_stage = {"TaskId": task_oid, "colaboradorId": to_object_id(colaborador_id), **self.dynamic_filters}
+        if start_date and end_date:
+            match_stage[self.filter_date] = {"$gte": start_date, "$lte": end_date}
+        return match_stage
+
+    def count_working_days(self, start_date, end_date, holidays=None) -> (int, int):
+        return count_working_days(start_date, end_date, self.excluded_days, holidays, mask=self.working_days_mask)
+
+    def build_result(self, result_value, days_considered: int, non_considered_days: int) -> Dict[str, Any]:
+        return build_kpi_result(result_value, days_considered, non_considered_days,
+                                self.target, self.unit_time, self.formula_def.scales_with_days)
+
+
+def get_kpi_fingerprint(kpi_data: Dict[str, Any]) -> str:
+    # Extended JSON: un ObjectId ({"$oid": ...}) no se confunde con su string hexadecimal
+    return json_util.dumps([kpi_data.get(field) for field in KPI_DEFINITION_FIELDS], sort_keys=True)
+
+
+def compile_kpi(kpi_data: Dict[str, Any]) -> CompiledKpi:
+    """
+    Retorna la definición compilada del KPI; se reconstruye solo si cambia alguno de
+    los campos de `KPI_DEFINITION_FIELDS`.
+    """
+    fingerprint = get_kpi_fingerprint(kpi_data)
+    with _compiled_kpis_lock:
+        compiled = _compiled_kpis.get(fingerprint)
+        if compiled is not None:
+            _compiled_kpis.move_to_end(fingerprint)
+            return compiled
+
+    compiled = CompiledKpi(kpi_data)
+    with _compiled_kpis_lock:
+        _compiled_kpis[fingerprint] = compiled
+        if len(_compiled_kpis) > COMPILED_KPI_CACHE_SIZE:
+            _compiled_kpis.popitem(last=False)
+    return compiled
+
+
+def to_object_id(value) -> ObjectId:
+    return value if isinstance(value, ObjectId) else ObjectId(str(value))
+
+def build_kpi_result(result_value, days_considered: int, non_considered_days: int,
+                     target: float, unit_time: float, scales_with_days: bool = True) -> Dict[str, Any]:
+    # Meta esperada (promedios, mínimos, percentiles, tasas... no dependen de los días del rango)
+    if scales_with_days:
+        exact_quotient = round(days_considered / unit_time, 2)
+        target_sales = round(exact_quotient * target, 2)
     else:
-        raise ValueError(f"Invalid KPI formula: {formula}")
+        target_sales = round(target, 2)
+
+    # Resultado
+    kpi_percentage = (result_value / target_sales * 100) if target_sales else 0
+    rounded_kpi_percentage = round(kpi_percentage, 2)
+
+    return {
+        "kpiPercentage": rounded_kpi_percentage,
+        "totalCount": result_value,
+        "daysConsidered": days_considered,
+        "targetSales": target_sales,
+        "nonConsideredDaysCount": non_considered_days
+    }
 
 
 def get_kpi_evaluation(task_id: str, kpi_data: Dict[str, Any], tenant_id: str,
@@ -62,116 +183,197 @@ def get_kpi_evaluation(task_id: str, kpi_data: Dict[str, Any], tenant_id: str,
 
     task_logs_collection = get_collection(tenant_id, 'tasklog')
 
-    logger.info("<-----------------Inicia la evaluación de un KPI ------------------------------------------>: %s")
-
-    logger.info("kpi_data: %s", kpi_data)
-    logger.info("task_id: %s", task_id)
-    logger.info("tenant_id: %s", tenant_id)
-    logger.info("colaborador_id: %s", colaborador_id)
-    logger.info("start_date: %s", start_date)
-    logger.info("end_date: %s", end_date)
-
-    try:
-        filter_date = kpi_data.get("Filtro_de_fecha", "Fecha_de_creacion")
-        field_to_evaluate = kpi_data["Campo_a_evaluar"]
-        formula = kpi_data["Formula"]
-        target = float(kpi_data.get("Objetivo", 0))
-        unit_time = float(kpi_data.get("Unidad_de_tiempo", 1))
-
-        raw_excluded_days = kpi_data.get("Dias_no_laborables", ["Saturday", "Sunday"])
-        day_name_to_index = {
-            "Monday": 0,
-            "Tuesday": 1,
-            "Wednesday": 2,
-            "Thursday": 3,
-            "Friday": 4,
-            "Saturday": 5,
-            "Sunday": 6
-        }
-        excluded_days = [day_name_to_index[d] for d in raw_excluded_days if d in day_name_to_index]
-        # Verifica si "Filters" existe y tiene elementos
-        if "Filters" in kpi_data and kpi_data["Filters"]:
-            dynamic_filters = {f["key"]: f["value"] for f in kpi_data["Filters"] if "key" in f and "value" in f}
-        else:
-            dynamic_filters = {}
-    except KeyError as e:
-        raise ValueError(f"Missing required KPI field: {e}")
-    
-
-    #logger.info("filter_date: %s", filter_date)
-    #ogger.info("field_to_evaluate: %s", field_to_evaluate)
-    #logger.info("formula: %s", formula)
-    #logger.info("target: %s", target)
-    #logger.info("unit_time: %s", unit_time)
-    #logger.info("excluded_days: %s", excluded_days)
-
-    # Construir pipeline
-    match_stage = {
-        "TaskId": ObjectId(task_id),
-        "colaboradorId": ObjectId(colaborador_id),
-        **dynamic_filters
-    }
+    logger.debug("Evaluando KPI %s: task=%s, tenant=%s, colaborador=%s, rango=%s - %s",
+                 kpi_data.get("_id") or kpi_data.get("KpiId"), task_id, tenant_id, colaborador_id, start_date, end_date)
 
-    if start_date and end_date:
-        match_stage[filter_date] = {"$gte": start_date, "$lte": end_date}
+    compiled = compile_kpi(kpi_data)
 
+    # Fórmula y exclusión de días no laborables resueltas en MongoDB: solo vuelve un documento
     pipeline = [
-        {"$match": match_stage},
-        #{"$addFields": {
-        #    "localDate": {
-        #        "$dateToString": {
-        #            "format": "%Y-%m-%d",
-        #            "date": f"${filter_date}",
-        #            "timezone": "America/Guayaquil"
-        #        }
-        #    },
-        #    "dayOfWeek": {
-        #        "$dayOfWeek": {
-        #            "date": f"${filter_date}",
-        #            "timezone": "America/Guayaquil"
-        #        }
-        #    }
-        #}},
-        #{"$match": {
-        #    "dayOfWeek": {"$nin": excluded_days}
-        #}},
-        {"$project": {
-            field_to_evaluate: 1,
-            "colaboradorId": 1,
-            "TaskId": 1,
-            filter_date: 1
-        }}
+        {"$match": compiled.build_match(to_object_id(task_id), colaborador_id, start_date, end_date)},
+        *compiled.single_stages
     ]
 
-    task_logs = list(task_logs_collection.aggregate(pipeline))
-    #logger.info("TaskLogs Retrieved: %s", len(task_logs))
-    values = [log.get(field_to_evaluate) for log in task_logs if log.get(field_to_evaluate) is not None]
+    aggregated = next(task_logs_collection.aggregate(pipeline), None)
+    result_value = compiled.formula_def.finalize(aggregated["value"]) if aggregated else 0
 
     # Días considerados
-    days_considered, non_considered_days = calculate_working_days(start_date, end_date, excluded_days)
+    days_considered, non_considered_days = compiled.count_working_days(
+        start_date, end_date, get_tenant_holidays(tenant_id)
+    )
 
-    # Meta esperada
-    exact_quotient = round(days_considered / unit_time, 2)
-    target_sales = round(exact_quotient * target, 2)
+    return compiled.build_result(result_value, days_considered, non_considered_days)
 
-    # Resultado
-    result_value = apply_kpi_formula(values, formula)
-    kpi_percentage = (result_value / target_sales * 100) if target_sales else 0
-    rounded_kpi_percentage = round(kpi_percentage, 2)
 
-    #logger.info("<------------------Resultados----------------------------------------------------------->: %s")
-    #logger.info("rounded_kpi_percentage: %s", rounded_kpi_percentage)
-    #logger.info("result_value: %s", result_value)
-    #logger.info("days_considered: %s", days_considered)
-    #logger.info("target_sales: %s", target_sales)
-    #logger.info("non_considered_days: %s", non_considered_days)
+def get_kpi_evaluation_for_roster(task_id: str, kpi_data: Dict[str, Any], tenant_id: str,
+                                  colaborador_ids: List[Any], start_date, end_date) -> Dict[str, Dict[str, Any]]:
+    """
+    Evalúa un KPI para toda una nómina de colaboradores con UNA sola agregación
+    (`colaboradorId: {$in: ...}` + `$group` por colaborador).
 
-    logger.info("<-----------------Finaliza la evaluación de un KPI ------------------------------------------>: %s")
+    :return: {colaborador_id (str): resultado con el mismo formato que `get_kpi_evaluation`}
+    """
+    return get_fused_kpi_evaluations(task_id, [kpi_data], tenant_id, colaborador_ids, start_date, end_date)[0]
 
+
+def get_common_filters(filters_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Filtros (clave y valor) compartidos por todos los KPIs: van al $match inicial y usan el índice
+    first, *others = filters_list
     return {
-        "kpiPercentage": rounded_kpi_percentage,
-        "totalCount": result_value,
-        "daysConsidered": days_considered,
-        "targetSales": target_sales,
-        "nonConsideredDaysCount": non_considered_days
-    }
\ No newline at end of file
+        key: value for key, value in first.items()
+        if all(key in other and other[key] == value for other in others)
+    }
+
+
+def aggregate_fused_kpi_values(task_id: str, kpis: List[Dict[str, Any]], tenant_id: str,
+                               colaborador_ids: List[Any], start_date, end_date,
+                               windows: Optional[Dict[str, List]] = None) -> List[Dict[str, Any]]:
+    """
+    Calcula el valor crudo de la fórmula de cada KPI de la tarea, por colaborador, en una sola pasada.
+
+    Los KPIs se agrupan por `Filtro_de_fecha` (el rango se aplica sobre ese campo) y cada grupo
+    se resuelve con un único `$match` seguido de un `$facet` con una rama por KPI
+    (sus propios `Filters`, días no laborables y fórmula, agrupando por colaborador).
+    Las fórmulas que juntan todos los valores (mediana, percentiles) van en su propia agregación.
+
+    :param windows: Opcional. {colaborador_id: [(inicio, fin), ...]} para limitar cada colaborador
+                    a ciertos intervalos en lugar de todo el rango `start_date`-`end_date`.
+    :return: Lista alineada con `kpis`; cada elemento es {colaborador_id (str): valor}.
+    """
+    if not kpis or not colaborador_ids:
+        return [{} for _ in kpis]
+
+    task_logs_collection = get_collection(tenant_id, 'tasklog')
+
+    queries = build_fused_kpi_queries(task_id, kpis, colaborador_ids, start_date, end_date, windows)
+    docs_per_query = [list(task_logs_collection.aggregate(pipeline, allowDiskUse=True)) for _, pipeline in queries]
+    return read_fused_kpi_values(kpis, queries, docs_per_query)
+
+
+def build_fused_kpi_queries(task_id: str, kpis: List[Dict[str, Any]], colaborador_ids: List[Any], start_date, end_date,
+                            windows: Optional[Dict[str, List]] = None,
+                            by_month: bool = False) -> List[Tuple[List[int], List[Dict[str, Any]]]]:
+    """
+    Construye las agregaciones de `aggregate_fused_kpi_values` sin ejecutarlas (las usa también
+    la versión asíncrona). Retorna [(posiciones de los KPIs, pipeline)], una por `Filtro_de_fecha`.
+
+    :param by_month: Agrupa por mes local en lugar de por colaborador (ver `aggregate_monthly_kpi_values`).
+    """
+    compiled_list = [compile_kpi(kpi_data) for kpi_data in kpis]
+    positions_by_filter_date = {}
+    for position, compiled in enumerate(compiled_list):
+        positions_by_filter_date.setdefault(compiled.filter_date, []).append(position)
+
+    task_oid = to_object_id(task_id)
+
+    queries = []
+    for filter_date, positions in positions_by_filter_date.items():
+        common_filters = get_common_filters([compiled_list[p].dynamic_filters for p in positions])
+
+        match_stage = {"TaskId": task_oid, **common_filters}
+
+        if windows is not None:
+            match_stage["$or"] = [
+                {"colaboradorId": to_object_id(colaborador_id), filter_date: {"$gte": window_start, "$lte": window_end}}
+                for colaborador_id, colaborador_windows in windows.items()
+                for window_start, window_end in colaborador_windows
+            ]
+            if not match_stage["$or"]:
+                continue
+        else:
+            match_stage["colaboradorId"] = {"$in": [to_object_id(c) for c in colaborador_ids]}
+            if start_date and end_date:
+                match_stage[filter_date] = {"$gte": start_date, "$lte": end_date}
+
+        branches = {}
+        for position in positions:
+            compiled = compiled_list[position]
+            own_filters = {k: v for k, v in compiled.dynamic_filters.items() if k not in common_filters}
+
+            branch = [{"$match": own_filters}] if own_filters else []
+            branch += compiled.monthly_stages if by_month else compiled.roster_stages
+            branches[position] = branch
+
+        # El resultado de un $facet es un solo documento (máximo 16 MB): las fórmulas que devuelven
+        # todos los valores de cada colaborador van en su propia agregación, un documento por grupo
+        facet_positions = [p for p in positions if not compiled_list[p].formula_def.collects_values]
+        fused_groups = ([facet_positions] if facet_positions else []) + [
+            [p] for p in positions if compiled_list[p].formula_def.collects_values
+        ]
+
+        for group in fused_groups:
+            if len(group) == 1:
+                # Un solo KPI: no hace falta $facet
+                queries.append((group, [{"$match": match_stage}, *branches[group[0]]]))
+            else:
+                queries.append((group, [{"$match": match_stage}, {"$facet": {f"kpi_{p}": branches[p] for p in group}}]))
+
+    return queries
+
+
+def read_fused_kpi_values(kpis: List[Dict[str, Any]], queries: List[Tuple[List[int], List[Dict[str, Any]]]],
+                          docs_per_query: List[List[Dict[str, Any]]], key=str) -> List[Dict[str, Any]]:
+    # Documentos devueltos por cada agregación de `build_fused_kpi_queries` → valores por colaborador (o por `key(_id)`)
+    values = [{} for _ in kpis]
+    for (positions, _), docs in zip(queries, docs_per_query):
+        if len(positions) == 1:
+            facet_doc = {f"kpi_{positions[0]}": docs}
+        else:
+            facet_doc = docs[0] if docs else {}
+
+        for position in positions:
+            finalize = compile_kpi(kpis[position]).formula_def.finalize
+            values[position] = {key(doc["_id"]): finalize(doc["value"]) for doc in facet_doc.get(f"kpi_{position}", [])}
+
+    return values
+
+
+def aggregate_monthly_kpi_values(task_id: str, kpis: List[Dict[str, Any]], tenant_id: str,
+                                 colaborador_id, start_date, end_date) -> List[Dict[date, Any]]:
+    """
+    Valor de la fórmula de cada KPI de la tarea para un colaborador, por mes local, en una sola
+    pasada sobre todo el rango (misma fusión por `Filtro_de_fecha` que `aggregate_fused_kpi_values`).
+
+    :return: Lista alineada con `kpis`; cada elemento es {primer día del mes (date): valor}.
+    """
+    if not kpis:
+        return []
+
+    task_logs_collection = get_collection(tenant_id, 'tasklog')
+
+    queries = build_fused_kpi_queries(task_id, kpis, [colaborador_id], start_date, end_date, by_month=True)
+    docs_per_query = [list(task_logs_collection.aggregate(pipeline, allowDiskUse=True)) for _, pipeline in queries]
+    return read_fused_kpi_values(kpis, queries, docs_per_query, key=to_local_month)
+
+
+def build_roster_kpi_results(kpis: List[Dict[str, Any]], values: List[Dict[str, Any]], tenant_id: str,
+                             colaborador_ids: List[Any], start_date, end_date,
+                             holidays: Optional[Sequence[date]] = None) -> List[Dict[str, Dict[str, Any]]]:
+    # Todos comparten el mismo rango, así que los días laborables se calculan una vez por KPI
+    if holidays is None:
+        holidays = get_tenant_holidays(tenant_id)
+    results = []
+    for kpi_data, values_by_colaborador in zip(kpis, values):
+        compiled = compile_kpi(kpi_data)
+        days_considered, non_considered_days = compiled.count_working_days(start_date, end_date, holidays)
+        results.append({
+            str(colaborador_id): compiled.build_result(
+                values_by_colaborador.get(str(colaborador_id), 0), days_considered, non_considered_days
+            )
+            for colaborador_id in colaborador_ids
+        })
+    return results
+
+
+def get_fused_kpi_evaluations(task_id: str, kpis: List[Dict[str, Any]], tenant_id: str,
+                              colaborador_ids: List[Any], start_date, end_date) -> List[Dict[str, Dict[str, Any]]]:
+    """
+    Evalúa en una sola pasada sobre tasklog todos los KPIs que comparten la misma tarea.
+
+    :return: Lista alineada con `kpis`; cada elemento es {colaborador_id (str): resultado}.
+    """
+    if not kpis or not colaborador_ids:
+        return [{} for _ in kpis]
+
+    values = aggregate_fused_kpi_values(task_id, kpis, tenant_id, colaborador_ids, start_date, end_date)
+    return build_roster_kpi_results(kpis, values, tenant_id, colaborador_ids, start_date, end_date)
@@ -0,0 +1,183 @@
+import re
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+# Tipos BSON que se pueden convertir a número; los strings se convierten como hacía `float()`
+NUMERIC_BSON_TYPES = ["double", "int", "long", "decimal", "bool", "string"]
+
+# Strings numéricos que se aceptan ("12", " 3.5 ", "-1e3"); el resto se enmascara
+NUMERIC_STRING = re.compile(r"^\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*$")
+
+# percentile_90 / percentil_90 / p90
+PERCENTILE_FORMULA = re.compile(r"^(?:percentile_|percentil_|p)(\d{1,3}(?:\.\d+)?)$")
+
+# Códigos de tipo usados al clasificar los valores
+_MASKED, _NUMBER, _NUMERIC_STRING = 0, 1, 2
+
+
+def to_numeric_array(values: List[Any]) -> np.ndarray:
+    """
+    Convierte los valores del campo evaluado en un arreglo float64 en una sola pasada.
+    Los valores que no son numéricos (ni strings numéricos) quedan fuera, sin excepciones por elemento.
+    """
+    if not len(values):
+        return np.empty(0, dtype=np.float64)
+
+    kinds = np.fromiter(
+        (
+            _NUMBER if isinstance(v, (int, float)) else
+            _NUMERIC_STRING if isinstance(v, str) and NUMERIC_STRING.match(v) else
+            _MASKED
+            for v in values
+        ),
+        dtype=np.int8,
+        count=len(values)
+    )
+    raw = np.asarray(values, dtype=object)
+
+    numbers = np.full(len(values), np.nan)
+    numbers[kinds == _NUMBER] = raw[kinds == _NUMBER].astype(np.float64)
+    numbers[kinds == _NUMERIC_STRING] = raw[kinds == _NUMERIC_STRING].astype(str).astype(np.float64)
+
+    return numbers[~np.isnan(numbers)]
+
+
+def numeric_expression(field_ref: str) -> Dict[str, Any]:
+    # Equivalente en MongoDB de `to_numeric_array`: null para lo que no se puede convertir
+    return {"$cond": [
+        {"$in": [{"$type": field_ref}, NUMERIC_BSON_TYPES]},
+        {"$convert": {"input": field_ref, "to": "double", "onError": None, "onNull": None}},
+        None
+    ]}
+
+
+class KpiFormula:
+    """
+    Fórmula de KPI: cómo se reduce con NumPy y cómo se calcula dentro de MongoDB.
+
+    - `additive`: el valor de un rango es la suma de sus valores diarios (admite rollups).
+    - `scales_with_days`: el objetivo se multiplica por los días laborables del rango.
+    - `accumulator`: acumulador de `$group` que calcula la fórmula en el servidor. Si es None,
+      el servidor solo junta los valores numéricos y la reducción se hace con NumPy
+      (`collects_values`: mediana, percentiles).
+    """
+    __slots__ = ("name", "reducer", "numeric", "accumulator", "additive", "scales_with_days")
+
+    def __init__(self, name: str, reducer: Callable, numeric: bool = True,
+                 accumulator: Optional[Callable[[str], Dict[str, Any]]] = None,
+                 additive: bool = False, scales_with_days: bool = False):
+        self.name = name
+        self.reducer = reducer
+        self.numeric = numeric
+        self.accumulator = accumulator
+        self.additive = additive
+        self.scales_with_days = scales_with_days
+
+    @property
+    def collects_values(self) -> bool:
+        # Devuelve todos los valores de cada grupo ($push) en lugar de un solo número
+        return self.accumulator is None and self.name != "count_distinct"
+
+    def reduce(self, values: List[Any]):
+        if self.numeric:
+            return self.reducer(to_numeric_array(values))
+        return self.reducer(values)
+
+    def build_stages(self, field_to_evaluate: str, group_key: Any = None) -> List[Dict[str, Any]]:
+        """
+        Etapas de agregación que calculan la fórmula en el servidor.
+        Cada grupo (`group_key`, por defecto uno solo) devuelve un documento `{"_id": ..., "value": ...}`.
+        """
+        field_ref = f"${field_to_evaluate}"
+        stages = [{"$match": {field_to_evaluate: {"$ne": None}}}]
+
+        if self.name == "count_distinct":
+            stages.append({"$group": {"_id": {"group": group_key, "value": field_ref}}})
+            stages.append({"$group": {"_id": "$_id.group", "value": {"$sum": 1}}})
+        elif self.accumulator:
+            stages.append({"$group": {"_id": group_key, "value": self.accumulator(field_ref)}})
+        else:
+            stages.append({"$group": {"_id": group_key, "value": {"$push": numeric_expression(field_ref)}}})
+
+        return stages
+
+    def finalize(self, aggregated_value):
+        # Resultado de `build_stages` → valor final del KPI
+        if self.accumulator or self.name == "count_distinct":
+            return aggregated_value if aggregated_value is not None else 0
+        return self.reduce([v for v in aggregated_value or [] if v is not None])
+
+
+KPI_FORMULAS: Dict[str, KpiFormula] = {}
+
+
+def register_formula(name: str, **options):
+    def decorator(reducer):
+        KPI_FORMULAS[name] = KpiFormula(name, reducer, **options)
+        return reducer
+    return decorator
+
+
+def get_formula(name: str) -> KpiFormula:
+    formula = KPI_FORMULAS.get(name)
+    if formula:
+        return formula
+
+    match = PERCENTILE_FORMULA.match(name or "")
+    if match and 0 <= float(match.group(1)) <= 100:
+        q = float(match.group(1))
+        formula = KpiFormula(name, lambda values: percentile(values, q))
+        KPI_FORMULAS[name] = formula
+        return formula
+
+    raise ValueError(f"Invalid KPI formula: {name}")
+
+
+def percentile(values: np.ndarray, q: float) -> float:
+    return float(np.percentile(values, q)) if values.size else 0
+
+
+@register_formula("count", numeric=False, additive=True, scales_with_days=True,
+                  accumulator=lambda field_ref: {"$sum": 1})
+def count(values):
+    return len(values)
+
+
+@register_formula("count_distinct", numeric=False, scales_with_days=True)
+def count_distinct(values):
+    return len(set(values))
+
+
+@register_formula("sum", additive=True, scales_with_days=True,
+                  accumulator=lambda field_ref: {"$sum": numeric_expression(field_ref)})
+def sum_values(values):
+    return values.sum().item() if values.size else 0
+
+
+@register_formula("avg", accumulator=lambda field_ref: {"$avg": numeric_expression(field_ref)})
+def avg(values):
+    return float(values.mean()) if values.size else 0
+
+
+@register_formula("min", accumulator=lambda field_ref: {"$min": numeric_expression(field_ref)})
+def min_value(values):
+    return float(values.min()) if values.size else 0
+
+
+@register_formula("max", accumulator=lambda field_ref: {"$max": numeric_expression(field_ref)})
+def max_value(values):
+    return float(values.max()) if values.size else 0
+
+
+@register_formula("median")
+def median(values):
+    return float(np.median(values)) if values.size else 0
+
+
+@register_formula("rate", accumulator=lambda field_ref: {"$avg": {"$let": {
+    "vars": {"n": numeric_expression(field_ref)},
+    "in": {"$cond": [{"$eq": ["$$n", None]}, None, {"$cond": [{"$ne": ["$$n", 0]}, 100, 0]}]}
+}}})
+def rate(values):
+    # Porcentaje de registros con valor numérico distinto de cero
+    return float(np.count_nonzero(values) * 100 / values.size) if values.size else 0
@@ -0,0 +1,234 @@
+import logging
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, List
+import pytz
+from bson import ObjectId
+from django.conf import settings
+from evaluation.mongo_client import get_collection
+from evaluation.services.kpi_calculator import (
+    aggregate_fused_kpi_values,
+    build_roster_kpi_results,
+    get_fused_kpi_evaluations,
+    compile_kpi,
+)
+from evaluation.services.kpi_formulas import KPI_FORMULAS
+from evaluation.utils.business_days import TIMEZONE, to_local_date
+
+logger = logging.getLogger(__name__)
+
+# Por debajo de este número de días cerrados no compensa leer los rollups
+ROLLUP_MIN_CLOSED_DAYS = 7
+
+# Límite de intervalos ($or) para completar en tasklog los días sin rollup
+MAX_RAW_WINDOWS = 2000
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def get_kpi_id(kpi_data: Dict[str, Any]):
+    return kpi_data.get("KpiId") or kpi_data.get("_id")
+
+
+def local_day_start(day):
+    return TIMEZONE.localize(datetime.combine(day, time.min)).astimezone(pytz.utc)
+
+
+def local_day_end(day):
+    return TIMEZONE.localize(datetime.combine(day, time.max)).astimezone(pytz.utc)
+
+
+def utc_to_local_day(value):
+    # pymongo devuelve datetimes naive en UTC
+    if value.tzinfo is None:
+        value = pytz.utc.localize(value)
+    return to_local_date(value)
+
+
+def get_closed_end_day(end_date):
+    # El día de hoy todavía no está cerrado: siempre se lee de tasklog
+    yesterday = datetime.now(TIMEZONE).date() - timedelta(days=1)
+    return min(to_local_date(end_date), yesterday)
+
+
+def rollups_enabled(start_date, end_date) -> bool:
+    if not getattr(settings, "KPI_ROLLUP_READS", True) or not start_date or not end_date:
+        return False
+    closed_days = (get_closed_end_day(end_date) - to_local_date(start_date)).days + 1
+    return closed_days >= ROLLUP_MIN_CLOSED_DAYS
+
+
+def is_rollup_eligible(kpi_data: Dict[str, Any]) -> bool:
+    # Solo fórmulas aditivas: el valor del rango es la suma de los valores diarios
+    formula = KPI_FORMULAS.get(kpi_data.get("Formula"))
+    return bool(formula and formula.additive and get_kpi_id(kpi_data))
+
+
+def build_windows(days, start_date, end_date) -> List:
+    """
+    Convierte una lista ordenada de días locales en intervalos UTC contiguos,
+    recortados al rango evaluado.
+    """
+    windows = []
+    run_start = previous = None
+    for day in days:
+        if previous is not None and day == previous + timedelta(days=1):
+            previous = day
+            continue
+        if run_start is not None:
+            windows.append((run_start, previous))
+        run_start = previous = day
+    if run_start is not None:
+        windows.append((run_start, previous))
+
+    return [
+        (max(local_day_start(first), start_date), min(local_day_end(last), end_date))
+        for first, last in windows
+    ]
+
+
+def get_rollup_positions(kpis: List[Dict[str, Any]], start_date, end_date) -> List[int]:
+    # Posiciones de los KPIs que se responden desde los rollups diarios
+    if not rollups_enabled(start_date, end_date):
+        return []
+    return [i for i, kpi_data in enumerate(kpis) if is_rollup_eligible(kpi_data)]
+
+
+def get_task_kpi_evaluations(task_id: str, kpis: List[Dict[str, Any]], tenant_id: str,
+                             colaborador_ids: List[Any], start_date, end_date) -> List[Dict[str, Dict[str, Any]]]:
+    """
+    Evalúa los KPIs de una tarea para la nómina. Los KPIs aditivos (`count`, `sum`) en rangos
+    largos se responden desde los rollups diarios de `kpievaluationhistory`; el resto, desde tasklog.
+
+    :return: Lista alineada con `kpis`; cada elemento es {colaborador_id (str): resultado}.
+    """
+    if not kpis or not colaborador_ids:
+        return [{} for _ in kpis]
+
+    rollup_positions = get_rollup_positions(kpis, start_date, end_date)
+
+    if not rollup_positions:
+        return get_fused_kpi_evaluations(task_id, kpis, tenant_id, colaborador_ids, start_date, end_date)
+
+    results = [{} for _ in kpis]
+
+    raw_positions = [i for i in range(len(kpis)) if i not in rollup_positions]
+    if raw_positions:
+        raw_results = get_fused_kpi_evaluations(
+            task_id, [kpis[i] for i in raw_positions], tenant_id, colaborador_ids, start_date, end_date
+        )
+        for position, kpi_results in zip(raw_positions, raw_results):
+            results[position] = kpi_results
+
+    rollup_results = get_rollup_kpi_evaluations(
+        task_id, [kpis[i] for i in rollup_positions], tenant_id, colaborador_ids, start_date, end_date
+    )
+    for position, kpi_results in zip(rollup_positions, rollup_results):
+        results[position] = kpi_results
+
+    return results
+
+
+def build_rollup_pipeline(kpis: List[Dict[str, Any]], colaborador_ids: List[Any], start_date, end_date) -> List[Dict[str, Any]]:
+    kpi_oids = [ObjectId(str(get_kpi_id(kpi_data))) for kpi_data in kpis]
+
+    return [
+        {"$match": {
+            "employeeId": {"$in": [ObjectId(str(c)) for c in colaborador_ids]},
+            "kpiId": {"$in": kpi_oids},
+            "Fecha_de_inicio": {
+                "$gte": local_day_start(to_local_date(start_date)),
+                "$lte": local_day_start(get_closed_end_day(end_date))
+            }
+        }},
+        # Solo rollups diarios (los escribe `process_task_group`)
+        {"$match": {"$expr": {"$lt": [{"$subtract": ["$Fecha_de_fin", "$Fecha_de_inicio"]}, DAY_MS]}}},
+        # Un valor por colaborador, día y KPI aunque existan documentos duplicados
+        {"$group": {
+            "_id": {"e": "$employeeId", "d": "$Fecha_de_inicio", "k": "$kpiId"},
+            "v": {"$last": "$Numero_total"}
+        }},
+        {"$group": {
+            "_id": {"e": "$_id.e", "d": "$_id.d"},
+            "n": {"$sum": 1},
+            "values": {"$push": {"k": "$_id.k", "v": "$v"}}
+        }},
+        {"$match": {"n": len(set(kpi_oids))}},
+        {"$facet": {
+            "totals": [
+                {"$unwind": "$values"},
+                {"$group": {"_id": {"e": "$_id.e", "k": "$values.k"}, "total": {"$sum": "$values.v"}}}
+            ],
+            "days": [
+                {"$group": {"_id": "$_id.e", "days": {"$push": "$_id.d"}}}
+            ]
+        }}
+    ]
+
+
+def plan_rollup_windows(facet_doc: Dict[str, Any], kpis: List[Dict[str, Any]], colaborador_ids: List[Any],
+                        start_date, end_date):
+    """
+    A partir del resultado de `build_rollup_pipeline` retorna los totales de rollup
+    {(colaborador, kpi): total} y los intervalos sin rollup de cada colaborador {colaborador: [(inicio, fin)]}.
+    """
+    facet_doc = facet_doc or {"totals": [], "days": []}
+    totals = {(str(doc["_id"]["e"]), str(doc["_id"]["k"])): doc["total"] or 0 for doc in facet_doc["totals"]}
+    covered_days = {str(doc["_id"]): {utc_to_local_day(d) for d in doc["days"]} for doc in facet_doc["days"]}
+
+    start_day = to_local_date(start_date)
+    end_day = to_local_date(end_date)
+
+    # Días no laborables para todos los KPIs no aportan registros: no hace falta consultarlos
+    always_excluded = set.intersection(*(set(compile_kpi(kpi_data).excluded_days) for kpi_data in kpis))
+    range_days = [
+        start_day + timedelta(days=n) for n in range((end_day - start_day).days + 1)
+        if (start_day + timedelta(days=n)).weekday() not in always_excluded
+    ]
+
+    windows = {}
+    for colaborador_id in (str(c) for c in colaborador_ids):
+        covered = covered_days.get(colaborador_id, set())
+        windows[colaborador_id] = build_windows([d for d in range_days if d not in covered], start_date, end_date)
+
+    return totals, windows
+
+
+def combine_rollup_values(kpis: List[Dict[str, Any]], colaborador_ids: List[Any], totals: Dict,
+                          raw_values: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Total de rollups + valor de tasklog de los días sin rollup
+    values = []
+    for kpi_data, raw_by_colaborador in zip(kpis, raw_values):
+        kpi_id = str(get_kpi_id(kpi_data))
+        values.append({
+            str(c): totals.get((str(c), kpi_id), 0) + raw_by_colaborador.get(str(c), 0)
+            for c in colaborador_ids
+        })
+    return values
+
+
+def get_rollup_kpi_evaluations(task_id: str, kpis: List[Dict[str, Any]], tenant_id: str,
+                               colaborador_ids: List[Any], start_date, end_date) -> List[Dict[str, Dict[str, Any]]]:
+    """
+    Suma el `Numero_total` de los rollups diarios de los días cerrados del rango y consulta
+    tasklog solo para los días sin rollup de cada colaborador (por ejemplo, hoy).
+
+    Un día se considera cubierto para un colaborador cuando existe el rollup de TODOS los KPIs
+    del grupo, así los totales de rollup y de tasklog nunca se solapan.
+    """
+    kpi_history_collection = get_collection(tenant_id, 'kpievaluationhistory')
+
+    pipeline = build_rollup_pipeline(kpis, colaborador_ids, start_date, end_date)
+    facet_doc = next(kpi_history_collection.aggregate(pipeline), None)
+    totals, windows = plan_rollup_windows(facet_doc, kpis, colaborador_ids, start_date, end_date)
+
+    total_windows = sum(len(w) for w in windows.values())
+    if total_windows > MAX_RAW_WINDOWS:
+        logger.info("Rollups incompletos (%s intervalos sin cubrir), se consulta tasklog completo", total_windows)
+        return get_fused_kpi_evaluations(task_id, kpis, tenant_id, colaborador_ids, start_date, end_date)
+
+    raw_values = aggregate_fused_kpi_values(
+        task_id, kpis, tenant_id, colaborador_ids, start_date, end_date, windows
+    )
+
+    values = combine_rollup_values(kpis, colaborador_ids, totals, raw_values)
+    return build_roster_kpi_results(kpis, values, tenant_id, colaborador_ids, start_date, end_date)
@@ -0,0 +1,154 @@
+"""
+Caché en Redis de las notas por colaborador para los filtros que no se guardan en
+`evaluationhistory` (dia_anterior, ultima_semana, rango_de_fechas...).
+
+Cada resultado se guarda con un sello: el hash de la definición de la evaluación, la versión
+de cada par (tarea, colaborador) de sus KPIs de métricas y el hash del resto de datos que
+entran en la fila (notas de los KPIs de tipo evaluación, perfil del colaborador y rangos de
+desempeño). `process_tasklog_events` incrementa la versión del par cuando llega un cambio de
+tasklog, así el resultado sigue siendo válido hasta que sus datos cambian de verdad.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+from redis.exceptions import RedisError
+from evaluation.services.custom_performance import get_range_classifier
+from evaluation.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+def get_result_key(tenant_id, evaluation_id, employee_id, start_date, end_date) -> str:
+    return f"tenant:{tenant_id}:evalresult:{evaluation_id}:{employee_id}:{start_date.isoformat()}:{end_date.isoformat()}"
+
+
+def get_version_key(tenant_id, task_id, colaborador_id) -> str:
+    return f"tenant:{tenant_id}:dataversion:{task_id}:{colaborador_id}"
+
+
+def result_cache_enabled(start_date, end_date) -> bool:
+    return bool(settings.EVALUATION_RESULT_CACHE and start_date is not None and end_date is not None)
+
+
+def get_evaluation_stamp(evaluation: Dict[str, Any]) -> str:
+    # Cambia si cambian las secciones, pesos o definiciones de KPIs de la evaluación
+    definition = json.dumps(evaluation.get("Secciones", []), sort_keys=True, default=str)
+    return hashlib.md5(definition.encode()).hexdigest()
+
+
+def get_ranges_stamp(classifier) -> str:
+    # Cambia si cambian los rangos de desempeño (título, color o límites)
+    ranges = [list(classifier.ranges), classifier.above_top, classifier.at_top]
+    return hashlib.md5(json.dumps(ranges, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_inputs_stamp(profile: Optional[Dict[str, Any]], notes: Optional[Dict[Tuple, Dict[str, Any]]]) -> str:
+    # Perfil ({campo: valor}) y notas de los KPIs de tipo evaluación ({(kpi_id, label_id): documento})
+    profile_fields = sorted((k, v) for k, v in (profile or {}).items() if k != "_id")
+    note_values = sorted((kpi_id, label_id or "", doc.get("Nota")) for (kpi_id, label_id), doc in (notes or {}).items())
+    inputs = json.dumps([profile_fields, note_values], default=str)
+    return hashlib.md5(inputs.encode()).hexdigest()
+
+
+def get_evaluation_task_ids(evaluation: Dict[str, Any]) -> List[str]:
+    return sorted({
+        str(kpi["Task"])
+        for seccion in evaluation.get("Secciones", [])
+        for kpi in seccion.get("KpisSeccion", [])
+        if kpi.get("Task")
+    })
+
+
+def read_stamps(tenant_id, evaluation: Dict[str, Any], employee_ids: List[Any],
+                profiles: Dict[str, Any], notes: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    # Sello actual de cada colaborador con un solo MGET de todas las versiones
+    task_ids = get_evaluation_task_ids(evaluation)
+    evaluation_stamp = get_evaluation_stamp(evaluation)
+    ranges_stamp = get_ranges_stamp(get_range_classifier(tenant_id))
+
+    keys = [get_version_key(tenant_id, t, e) for e in employee_ids for t in task_ids]
+    versions = [int(v or 0) for v in redis_client.mget(keys)] if keys else []
+
+    return {
+        str(e): {
+            "evaluation": evaluation_stamp,
+            "ranges": ranges_stamp,
+            "inputs": get_inputs_stamp(profiles.get(str(e)), notes.get(str(e))),
+            "versions": versions[i * len(task_ids):(i + 1) * len(task_ids)],
+        }
+        for i, e in enumerate(employee_ids)
+    }
+
+
+def lookup_cached_results(tenant_id, evaluation: Dict[str, Any], employee_ids: List[Any], start_date, end_date,
+                          profiles: Optional[Dict[str, Any]] = None,
+                          notes: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Busca en Redis el resultado de cada colaborador para el rango ya resuelto (solo para los
+    filtros que no están en `CACHEABLE_FILTERS`; los demás se guardan en `evaluationhistory`).
+    `profiles` y `notes` son los perfiles y notas de evaluación ya leídos de esos colaboradores.
+
+    :return: (resultados vigentes {employee_id: resultado}, sellos actuales de los que faltan
+             para guardarlos con `store_cached_results` después de calcularlos)
+    """
+    if not employee_ids or not result_cache_enabled(start_date, end_date):
+        return {}, {}
+
+    evaluation_id = str(evaluation["_id"])
+    try:
+        stamps = read_stamps(tenant_id, evaluation, employee_ids, profiles or {}, notes or {})
+        entries = redis_client.mget([
+            get_result_key(tenant_id, evaluation_id, e, start_date, end_date) for e in employee_ids
+        ])
+    except RedisError as e:
+        logger.warning("No se pudo leer la caché de resultados: %s", str(e))
+        return {}, {}
+
+    hits = {}
+    for employee_id, raw in zip((str(e) for e in employee_ids), entries):
+        if not raw:
+            continue
+        entry = json.loads(raw)
+        if entry.get("stamp") == stamps[employee_id]:
+            hits[employee_id] = entry["result"]
+
+    return hits, {e: stamp for e, stamp in stamps.items() if e not in hits}
+
+
+def store_cached_results(tenant_id, evaluation_id, results: Dict[str, Any], stamps: Dict[str, Dict[str, Any]],
+                         start_date, end_date) -> None:
+    # Los sellos se leyeron ANTES de calcular: un cambio durante el cálculo invalida el resultado guardado
+    entries = {e: r for e, r in results.items() if e in stamps and isinstance(r, dict)}
+    if not entries:
+        return
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for employee_id, result in entries.items():
+            pipe.setex(
+                get_result_key(tenant_id, evaluation_id, employee_id, start_date, end_date),
+                settings.EVALUATION_RESULT_CACHE_TTL,
+                json.dumps({"stamp": stamps[employee_id], "result": result}, default=str)
+            )
+        pipe.execute()
+    except RedisError as e:
+        logger.warning("No se pudo guardar la caché de resultados: %s", str(e))
+
+
+def bump_data_versions(tenant_id, task_id, colaborador_ids: Iterable[Any]) -> None:
+    """
+    Invalida los resultados en caché que dependen de la tarea para esos colaboradores.
+    Una versión que no existe (nueva o expirada) arranca desde la hora actual en nanosegundos,
+    así un contador que expiró nunca vuelve a un valor ya usado por un resultado vigente.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for colaborador_id in set(str(c) for c in colaborador_ids):
+        key = get_version_key(tenant_id, task_id, colaborador_id)
+        pipe.set(key, time.time_ns(), nx=True)
+        pipe.incr(key)
+        pipe.expire(key, settings.EVALUATION_RESULT_CACHE_TTL * 2)
+    pipe.execute()
@@ -1,10 +1,14 @@
 from collections import defaultdict
 from datetime import datetime
 import json
+from typing import List
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from evaluation.mongo_client import get_collection  # Ajusta el import según tu proyecto
-from evaluation.services.kpi_calculator import get_kpi_evaluation
-from concurrent.futures import ThreadPoolExecutor
+from evaluation.services.kpi_calculator import get_fused_kpi_evaluations
+from evaluation.services.index_provisioning import ensure_kpi_indexes
+from evaluation.utils.executor import run_parallel
 import pytz
 import logging
 from dateutil.parser import parse as parse_date
@@ -13,17 +17,11 @@ logger = logging.getLogger(__name__)
 
 LOCAL_TZ = pytz.timezone("America/Guayaquil")
 
-def save_or_update_evaluation(tenant_id: str, data: dict):
-    """
-    Guarda o actualiza la evaluación KPI de un empleado para un filtro y rango específico
-    usando pymongo y conexión dinámica multi-tenant.
-    """
-    #logger.info("Estoy en save_or_update_evaluation la función que guarda %s")
+DUPLICATE_KEY_ERROR = 11000
 
-    collection = get_collection(tenant_id, "evaluationhistory")  # O el nombre que uses
-
-    # Construir filtro para buscar documento existente
-    filter_query = {
+def get_evaluation_filter(data: dict) -> dict:
+    # Una evaluación guardada por colaborador, evaluación, filtro y rango
+    return {
         "employee_id": data.get("employee_id"),
         "evaluacion_id": data.get("evaluacion_id"),
         "filter_name": data.get("filter_name"),
@@ -31,56 +29,88 @@ def save_or_update_evaluation(tenant_id: str, data: dict):
         "end_date": data.get("end_date"),
     }
 
+def get_metric_kpi_filter(data: dict) -> dict:
+    # Un resultado por colaborador, KPI y rango (los documentos usan `employeeId` / `kpiId`)
+    return {
+        "employeeId": data.get("employeeId"),
+        "kpiId": data.get("kpiId"),
+        "Fecha_de_inicio": data.get("Fecha_de_inicio"),
+        "Fecha_de_fin": data.get("Fecha_de_fin"),
+    }
+
+def upsert_document(collection, filter_query: dict, data: dict):
+    """
+    Inserta o actualiza el documento en un solo viaje a MongoDB y lo retorna ya actualizado.
+    Si dos escrituras concurrentes insertan a la vez, el índice único rechaza una y se reintenta como update.
+    """
+    try:
+        return collection.find_one_and_update(
+            filter_query, {"$set": data}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return collection.find_one_and_update(filter_query, {"$set": data}, return_document=ReturnDocument.AFTER)
+
+def build_upserts(documents: List[dict], get_filter) -> List[UpdateOne]:
+    return [UpdateOne(get_filter(data), {"$set": data}, upsert=True) for data in documents]
+
+def bulk_upsert(collection, operations: List[UpdateOne]):
+    """
+    Envía los upserts en lote sin orden: un fallo no detiene el resto. Los que chocan con el
+    índice único por una inserción concurrente se reintentan una vez (ya existe el documento).
+    """
+    if not operations:
+        return None
+    try:
+        return collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        duplicated = [err["index"] for err in errors if err.get("code") == DUPLICATE_KEY_ERROR]
+        if len(duplicated) != len(errors):
+            raise
+        logger.info("Reintentando %s upserts concurrentes en %s", len(duplicated), collection.name)
+        return collection.bulk_write([operations[i] for i in duplicated], ordered=False)
+
+def save_or_update_evaluation(tenant_id: str, data: dict):
+    """
+    Guarda o actualiza la evaluación KPI de un empleado para un filtro y rango específico
+    usando pymongo y conexión dinámica multi-tenant.
+    """
+    collection = get_collection(tenant_id, "evaluationhistory")  # O el nombre que uses
+
     # Actualizar o insertar campo "created_at"
     data["created_at"] = datetime.utcnow()
 
-    # Buscar si ya existe documento
-    existing = collection.find_one(filter_query)
-
-    if existing:
-        # Actualizar el documento existente
-        collection.update_one(filter_query, {"$set": data})
-        updated_doc = collection.find_one(filter_query)
-        return updated_doc
-    else:
-        # Insertar nuevo documento
-        result = collection.insert_one(data)
-        new_doc = collection.find_one({"_id": result.inserted_id})
-        return new_doc
-    
+    return upsert_document(collection, get_evaluation_filter(data), data)
+
+def save_evaluations(tenant_id: str, documents: List[dict]):
+    # Igual que `save_or_update_evaluation` pero para muchas evaluaciones en un solo bulk_write
+    created_at = datetime.utcnow()
+    for data in documents:
+        data["created_at"] = created_at
+
+    collection = get_collection(tenant_id, "evaluationhistory")
+    return bulk_upsert(collection, build_upserts(documents, get_evaluation_filter))
+
 def save_or_update_metric_kpi_evaluation(tenant_id: str, data: dict):
     """
     Guarda o actualiza la evaluación KPI de un empleado para un filtro y rango específico
     usando pymongo y conexión dinámica multi-tenant.
     """
-    #logger.info("Estoy en save_or_update_evaluation la función que guarda %s")
-
     collection = get_collection(tenant_id, "kpievaluationhistory")  # O el nombre que uses
 
-    # Construir filtro para buscar documento existente
-    filter_query = {
-        "employeeId": data.get("employee_id"),
-        "kpiId": data.get("kpi_id"),
-        "Fecha_de_inicio": data.get("start_date"),
-        "Fecha_de_fin": data.get("end_date"),
-    }
-
     # Actualizar o insertar campo "created_at"
     data["Fecha_de_creacion"] = datetime.utcnow()
 
-    # Buscar si ya existe documento
-    existing = collection.find_one(filter_query)
-
-    if existing:
-        # Actualizar el documento existente
-        collection.update_one(filter_query, {"$set": data})
-        updated_doc = collection.find_one(filter_query)
-        return updated_doc
-    else:
-        # Insertar nuevo documento
-        result = collection.insert_one(data)
-        new_doc = collection.find_one({"_id": result.inserted_id})
-        return new_doc
+    return upsert_document(collection, get_metric_kpi_filter(data), data)
+
+def save_metric_kpi_evaluations(tenant_id: str, documents: List[dict]):
+    # Igual que `save_or_update_metric_kpi_evaluation` pero para muchos resultados en un solo bulk_write
+    created_at = datetime.utcnow()
+    for data in documents:
+        data["Fecha_de_creacion"] = created_at
+
+    collection = get_collection(tenant_id, "kpievaluationhistory")
+    return bulk_upsert(collection, build_upserts(documents, get_metric_kpi_filter))
     
 def normalize_to_local_date(iso_str):
     dt = parse_date(iso_str)
@@ -110,6 +140,7 @@ def process_task_group(tenant_id, task_id, colaboradores_data):
         "Campo_a_evaluar": 1, "Filtro_de_fecha": 1,
         "Filters": 1, "Dias_no_laborables": 1}
     ))
+    ensure_kpi_indexes(tenant_id, kpis)
 
     # 🔹 Extraer filtros únicos
     filtros_fecha = set()
@@ -141,10 +172,13 @@ def process_task_group(tenant_id, task_id, colaboradores_data):
         sub_agregado = {colaborador_id: agrupados[colaborador_id]}
         return process_kpi_evaluations(tenant_id, task_id, kpis, sub_agregado)
 
-    with ThreadPoolExecutor() as executor:
-        all_results = list(executor.map(wrapper, agrupados.keys()))
+    all_results = run_parallel(tenant_id, wrapper, list(agrupados.keys()))
+
+    # 🔹 Todos los resultados del grupo en un solo bulk_write
+    documents = [doc for resultados in all_results for doc in resultados]
+    save_metric_kpi_evaluations(tenant_id, documents)
 
-    print(f"✅ Procesamiento paralelo completo. Total grupos: {len(all_results)}")
+    print(f"✅ Procesamiento paralelo completo. Total grupos: {len(all_results)}, documentos: {len(documents)}")
 
 
 def process_kpi_evaluations(tenant_id, task_id, kpis, agrupados):
@@ -163,22 +197,25 @@ def process_kpi_evaluations(tenant_id, task_id, kpis, agrupados):
             tenant_id, task_id, colaborador_id, fecha, start_date, end_date, kpis
         )
 
-    with ThreadPoolExecutor() as executor:
-        resultados = list(executor.map(task_runner, trabajos))
+    resultados = run_parallel(tenant_id, task_runner, trabajos)
 
-    return resultados
+    return [doc for documentos in resultados for doc in documentos]
 
 def calculate_single_evaluation(tenant_id, task_id, colaborador_id, fecha, start_date, end_date, kpis):
     """
-    Ejecuta en paralelo las evaluaciones de cada KPI para un colaborador en un rango de fechas,
-    y guarda cada resultado en la colección de evaluaciones históricas.
+    Evalúa juntos los KPIs de la tarea para un colaborador en un rango de fechas y retorna
+    los documentos a guardar en la colección de evaluaciones históricas.
     """
-    def wrapper(kpi_data):
-        result = get_kpi_evaluation(task_id, kpi_data, tenant_id, colaborador_id, start_date, end_date)
+    # Todos los KPIs comparten la tarea: una sola pasada sobre tasklog para el colaborador y el día
+    fused_results = get_fused_kpi_evaluations(task_id, kpis, tenant_id, [colaborador_id], start_date, end_date)
+
+    documents = []
+    for kpi_data, kpi_results in zip(kpis, fused_results):
+        result = kpi_results.get(str(colaborador_id), {})
 
         print(f"📦 Resultado para KPI {kpi_data.get('Nombre')}: {result}")
 
-        save_data = {
+        documents.append({
             "employeeId": ObjectId(colaborador_id),
             "kpiId": kpi_data["_id"],
             "labelId": "",
@@ -190,13 +227,6 @@ def calculate_single_evaluation(tenant_id, task_id, colaborador_id, fecha, start
             "Fecha_de_fin": end_date,
             "Numero_de_Dias_laborales": result.get("daysConsidered", 0),
             "Numero_de_Dias_no_laborales": result.get("nonConsideredDaysCount", 0),
-        }
-
-        saved_doc = save_or_update_metric_kpi_evaluation(tenant_id, save_data)
-        return saved_doc  # Podrías también devolver el resultado crudo si lo prefieres
-
-    with ThreadPoolExecutor() as executor:
-        results = list(executor.map(wrapper, kpis))
-
-    return results
+        })
 
+    return documents
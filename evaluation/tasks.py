@@ -1,9 +1,27 @@
-import json
 import logging
-from celery import shared_task
-from evaluation.services.services_evaluation_history import ( save_or_update_evaluation, process_task_group) 
-from evaluation.utils.redis_client import redis_client
-from evaluation.utils.redis_helper import is_event_stale
+import time
+from celery import chord, shared_task
+from django.conf import settings
+from evaluation.services.services_evaluation_history import ( save_or_update_evaluation, save_evaluations, process_task_group) 
+from evaluation.services.index_provisioning import provision_collection_indexes
+from evaluation.services.result_cache import bump_data_versions
+from evaluation.utils.tasklog_stream import (
+    ack_events,
+    claim_stale_events,
+    dead_letter_event,
+    dead_letter_exhausted_events,
+    ensure_consumer_group,
+    expand_tasklog_entries,
+    get_backlog,
+    get_consumer_name,
+    get_delivery_counts,
+    get_last_entry_id,
+    migrate_legacy_events,
+    parse_entry_id,
+    promote_due_events,
+    read_new_events,
+    split_exhausted_events,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -12,51 +30,209 @@ def save_employee_evaluation_task(tenant_id, data):
     logger.info("Estoy en save_employee_evalaution_task: %s")
     save_or_update_evaluation(tenant_id, data)
 
+@shared_task
+def save_employee_evaluations_task(tenant_id, documents):
+    # Evaluaciones acumuladas de una nómina o departamento: un solo bulk_write
+    logger.info("Guardando %s evaluaciones en lote", len(documents))
+    save_evaluations(tenant_id, documents)
+
+@shared_task
+def precompute_cacheable_evaluations():
+    # Programada en horario de baja carga: un task por evaluación para repartirlas entre los workers
+    from evaluation.services.evaluation_precompute import list_evaluation_ids
+    from evaluation.services.index_provisioning import list_tenants
+
+    total = 0
+    for tenant_id in list_tenants():
+        try:
+            evaluation_ids = list_evaluation_ids(tenant_id)
+        except Exception as e:
+            logger.warning("No se pudieron listar las evaluaciones del tenant %s: %s", tenant_id, str(e))
+            continue
+        for evaluation_id in evaluation_ids:
+            precompute_evaluation_task.delay(tenant_id, evaluation_id)
+        total += len(evaluation_ids)
+
+    logger.info("Precálculo nocturno encolado: %s evaluaciones", total)
+
+@shared_task
+def precompute_evaluation_task(tenant_id, evaluation_id):
+    from evaluation.services.evaluation_precompute import precompute_evaluation
+    return precompute_evaluation(tenant_id, evaluation_id)
+
+@shared_task
+def provision_tasklog_indexes_task(tenant_id, indexes):
+    # Índices de tasklog de KPIs nuevos detectados por `ensure_kpi_indexes`: [[[campo, dirección], ...]]
+    report = provision_collection_indexes(tenant_id, 'tasklog', [tuple(tuple(key) for key in keys) for keys in indexes])
+    for entry in report:
+        if entry["status"] == "created":
+            logger.info("Índice creado en %s: %s", entry["collection"], entry["keys"])
+        elif entry["status"] in ("skipped", "error"):
+            logger.warning("Índice no creado en %s (%s): %s", entry["collection"], entry.get("error", entry["status"]), entry["keys"])
+
 @shared_task
 def process_tasklog_events():
+    # Programada cada minuto: prepara el stream, reparte la cola entre más workers si hace falta y consume
     print("🔁 Procesando eventos tasklog_events...")
 
-    raw_events = redis_client.lrange("tasklog_events", 0, -1)
-    print(f"Total eventos en cola: {len(raw_events)}")
+    ensure_consumer_group()
+    migrated = migrate_legacy_events(settings.TASKLOG_STREAM_BATCH_SIZE, settings.TASKLOG_DRAIN_MAX_EVENTS)
+    if migrated:
+        print(f"📥 Eventos migrados de la lista anterior: {migrated}")
 
-    grouped = {}
-    to_keep = []  # Eventos que no deben procesarse aún
+    # Respaldo del planificador (`run_tasklog_scheduler`): pasa al stream los eventos diferidos vencidos
+    promoted = promote_due_events(settings.TASKLOG_DRAIN_MAX_EVENTS)
+    if promoted:
+        print(f"⏰ Eventos diferidos vencidos: {promoted}")
 
-    for raw_event in raw_events:
-        try:
-            event = json.loads(raw_event)
-            tenant = event.get("tenant")
-            payload = json.loads(event["payload"])
+    backlog = get_backlog()
+    print(f"Total eventos en cola: {backlog}")
 
-            fecha_str = payload.get("Ultima_actualizacion") or payload.get("Fecha_de_creacion")
-            print(f"📅 Fecha del evento: {fecha_str}")
+    extra_consumers = min(settings.TASKLOG_EVENT_CONSUMERS, -(-backlog // settings.TASKLOG_STREAM_BATCH_SIZE)) - 1
+    for _ in range(max(extra_consumers, 0)):
+        consume_tasklog_events.delay()
 
-            if not is_event_stale(fecha_str, buffer_minutes=1):  # o 20 luego
-                print("⏳ Evento muy reciente. Se mantiene en cola.")
-                to_keep.append(raw_event)
-                continue
+    drain_tasklog_events()
 
-            task_id = payload.get("TaskId")
-            empleado_id = payload.get("colaboradorId")
+@shared_task
+def consume_tasklog_events():
+    drain_tasklog_events()
 
-            if tenant and task_id and empleado_id:
-                grouped.setdefault(tenant, {}).setdefault(task_id, []).append((empleado_id, payload))
+def next_chunk_size(processed, batch_size, max_events, deadline, now):
+    # Tamaño del siguiente lote dentro del presupuesto de la corrida (0 = terminar)
+    if now >= deadline:
+        return 0
+    return max(0, min(batch_size, max_events - processed))
 
-        except Exception as e:
-            print(f"❌ Error procesando evento: {e}")
-            to_keep.append(raw_event)  # En caso de error, no lo pierdas
+def drain_tasklog_events():
+    """
+    Consume el stream en lotes de `TASKLOG_STREAM_BATCH_SIZE` con un tope de eventos y de tiempo
+    por corrida: la memoria se limita a un lote y lo que falte queda para la siguiente corrida
+    (o para otro worker), así una ráfaga de webhooks se procesa de forma constante.
+    """
+    consumer = get_consumer_name()
+    batch_size = settings.TASKLOG_STREAM_BATCH_SIZE
+    max_events = settings.TASKLOG_DRAIN_MAX_EVENTS
+    deadline = time.monotonic() + settings.TASKLOG_DRAIN_MAX_SECONDS
 
-    # Procesar grupos
+    # Hasta el último evento que existía al empezar: lo que llegue mientras tanto queda para la siguiente corrida
+    last_id = parse_entry_id(get_last_entry_id())
+
+    # Primero lo que dejaron sin confirmar otros workers (o un grupo que falló), luego lo nuevo.
+    # Lo que ya falló en cada entrega se aparta en vez de reintentarse para siempre.
+    claimed = claim_stale_events(consumer, batch_size)
+    claimed, exhausted = split_exhausted_events(
+        claimed, get_delivery_counts([entry_id for entry_id, _ in claimed]), settings.TASKLOG_STREAM_MAX_DELIVERIES
+    )
+    dead_letter_exhausted_events(exhausted)
+    processed = process_tasklog_batch(claimed)
+    chunks = 0
+    while last_id is not None:
+        count = next_chunk_size(processed, batch_size, max_events, deadline, time.monotonic())
+        if not count:
+            print(f"⏸️ Presupuesto de la corrida agotado ({consumer}), el resto queda en cola.")
+            break
+        entries = read_new_events(consumer, count)
+        if not entries:
+            break
+        processed += process_tasklog_batch(entries)
+        chunks += 1
+        if parse_entry_id(entries[-1][0]) >= last_id:
+            break
+
+    print(f"✅ Procesamiento finalizado ({consumer}): {processed} eventos en {chunks} lotes.")
+
+def process_tasklog_batch(entries):
+    grouped = {}
+    processing_keys = {}  # {entry_id: hash con los payloads agrupados que se borra al confirmar}
+    done_ids = []  # Eventos que no requieren más trabajo: se confirman de inmediato
+
+    fields_by_id = dict(entries)
+    for entry_id, tenant, payloads, processing_key in expand_tasklog_entries(entries):
+        if processing_key:
+            processing_keys[entry_id] = processing_key
+
+        if payloads is None:
+            print(f"❌ Error procesando evento: {entry_id}")
+            dead_letter_event(entry_id, fields_by_id[entry_id], "No se pudo decodificar el evento")
+            done_ids.append(entry_id)
+            continue
+
+        # Los eventos recientes esperan su margen en `tasklog_events:delayed`: aquí ya vencieron.
+        # Un token trae todos los payloads agrupados de su colaborador, tarea y día.
+        eventos = [
+            (payload.get("TaskId"), payload.get("colaboradorId"), payload)
+            for payload in payloads
+            if tenant and payload.get("TaskId") and payload.get("colaboradorId")
+        ]
+        if not eventos:
+            done_ids.append(entry_id)
+            continue
+        for task_id, empleado_id, payload in eventos:
+            grouped.setdefault(tenant, {}).setdefault(task_id, []).append((entry_id, empleado_id, payload))
+
+    ack_events(done_ids, [processing_keys[i] for i in done_ids if i in processing_keys])
+
+    # Un subtask por (tenant, tarea, lote de colaboradores): cada uno confirma sus eventos si terminó bien
+    subtasks = []
     for tenant_id, tareas in grouped.items():
-        for task_id, empleados_data in tareas.items():
+        for task_id, eventos in tareas.items():
+            for lote in split_by_colaborador(eventos, settings.TASKLOG_GROUP_BATCH_SIZE):
+                entry_ids = list(dict.fromkeys(entry_id for entry_id, _, _ in lote))
+                subtasks.append(process_tasklog_group_task.s(
+                    tenant_id, task_id,
+                    [(empleado_id, payload) for _, empleado_id, payload in lote],
+                    entry_ids,
+                    [processing_keys[i] for i in entry_ids if i in processing_keys],
+                ))
+
+    if not settings.TASKLOG_GROUP_FANOUT:
+        # En el mismo worker, uno tras otro (pool solo / depuración)
+        for subtask in subtasks:
             try:
-                process_task_group(tenant_id, task_id, empleados_data)
+                subtask.apply(throw=True)
             except Exception as e:
+                # Quedan pendientes en el grupo: se reintentan al reclamarlos con XAUTOCLAIM
                 print(f"❌ Error al procesar grupo: {e}")
+    elif subtasks and settings.TASKLOG_GROUP_CHORD:
+        chord(subtasks)(tasklog_groups_done.s())
+    else:
+        for subtask in subtasks:
+            subtask.delay()
+
+    return len(entries)
+
+def split_by_colaborador(eventos, batch_size):
+    # Lotes de eventos con como mucho `batch_size` colaboradores distintos (orden de llegada)
+    por_colaborador = {}
+    for evento in eventos:
+        por_colaborador.setdefault(evento[1], []).append(evento)
 
-    # Limpiar solo lo que ya fue procesado
-    redis_client.delete("tasklog_events")
-    for ev in to_keep:
-        redis_client.rpush("tasklog_events", ev)
+    colaboradores = list(por_colaborador.values())
+    return [
+        [evento for grupo in colaboradores[i:i + batch_size] for evento in grupo]
+        for i in range(0, len(colaboradores), batch_size)
+    ]
 
-    print("✅ Procesamiento finalizado. Eventos recientes se mantienen en cola.")
\ No newline at end of file
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def process_tasklog_group_task(self, tenant_id, task_id, empleados_data, entry_ids, processing_keys):
+    try:
+        process_task_group(tenant_id, task_id, empleados_data)
+    except Exception as e:
+        print(f"❌ Error al procesar grupo: {e}")
+        # Agotados los reintentos, los eventos siguen pendientes en el stream y se reclaman con XAUTOCLAIM
+        raise self.retry(exc=e)
+    finally:
+        # Después de reescribir los rollups (aunque sea en parte): un resultado calculado mientras
+        # tanto con los rollups anteriores queda con un sello viejo y no se vuelve a servir
+        bump_data_versions(tenant_id, task_id, [empleado_id for empleado_id, _ in empleados_data])
+
+    ack_events(entry_ids, processing_keys)
+    return {"tenant": tenant_id, "task": task_id, "colaboradores": len({e for e, _ in empleados_data}), "eventos": len(entry_ids)}
+
+@shared_task
+def tasklog_groups_done(results):
+    # Callback del chord: resumen de los grupos de un lote del stream
+    colaboradores = sum(r["colaboradores"] for r in results)
+    print(f"✅ Lote de tasklog procesado: {len(results)} grupos, {colaboradores} colaboradores.")
+    return {"grupos": len(results), "colaboradores": colaboradores}
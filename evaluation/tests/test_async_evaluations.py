@@ -0,0 +1,48 @@
+from bson import ObjectId
+from django.test import TestCase
+from evaluation.services.evaluations_analysis import index_evaluation_notes
+from evaluation.services.kpi_calculator import build_fused_kpi_queries, read_fused_kpi_values
+
+
+class PrefetchedDataTestCase(TestCase):
+    def test_index_evaluation_notes(self):
+        colaborador, kpi, label = ObjectId(), ObjectId(), ObjectId()
+        doc = {"colaboradorId": colaborador, "kpiId": kpi, "labelId": label, "Nota": 8}
+
+        notes = index_evaluation_notes([doc])
+        self.assertIs(notes[str(colaborador)][(str(kpi), str(label))], doc)
+        self.assertIs(notes[str(colaborador)][(str(kpi), None)], doc)
+
+    def test_read_fused_kpi_values(self):
+        kpis = [
+            {"_id": "65f0c0ffee0000000000000a", "Campo_a_evaluar": "Monto", "Formula": "count", "Filtro_de_fecha": "Fecha_de_creacion"},
+            {"_id": "65f0c0ffee0000000000000b", "Campo_a_evaluar": "Monto", "Formula": "count", "Filtro_de_fecha": "Fecha_de_cierre"},
+            {"_id": "65f0c0ffee0000000000000c", "Campo_a_evaluar": "Monto", "Formula": "count", "Filtro_de_fecha": "Fecha_de_cierre",
+             "Filters": [{"key": "Estado", "value": "Cerrado"}]},
+        ]
+        employee = "65f0c0ffee00000000000002"
+        queries = build_fused_kpi_queries("65f0c0ffee00000000000001", kpis, [employee], None, None)
+        self.assertEqual([positions for positions, _ in queries], [[0], [1, 2]])
+
+        docs_per_query = [
+            [{"_id": ObjectId(employee), "value": 3}],
+            [{"kpi_1": [{"_id": ObjectId(employee), "value": 5}], "kpi_2": []}],
+        ]
+        self.assertEqual(read_fused_kpi_values(kpis, queries, docs_per_query), [{employee: 3}, {employee: 5}, {}])
+
+    def test_value_collecting_formulas_run_outside_facet(self):
+        kpis = [
+            {"_id": "65f0c0ffee0000000000000a", "Campo_a_evaluar": "Monto", "Formula": "sum", "Filtro_de_fecha": "Fecha_de_creacion"},
+            {"_id": "65f0c0ffee0000000000000b", "Campo_a_evaluar": "Monto", "Formula": "median", "Filtro_de_fecha": "Fecha_de_creacion"},
+            {"_id": "65f0c0ffee0000000000000c", "Campo_a_evaluar": "Monto", "Formula": "count", "Filtro_de_fecha": "Fecha_de_creacion"},
+        ]
+        employee = "65f0c0ffee00000000000002"
+        queries = build_fused_kpi_queries("65f0c0ffee00000000000001", kpis, [employee], None, None)
+        self.assertEqual([positions for positions, _ in queries], [[0, 2], [1]])
+        self.assertNotIn("$facet", queries[1][1][1])
+
+        docs_per_query = [
+            [{"kpi_0": [{"_id": ObjectId(employee), "value": 12}], "kpi_2": [{"_id": ObjectId(employee), "value": 3}]}],
+            [{"_id": ObjectId(employee), "value": [2.0, 6.0, 4.0]}],
+        ]
+        self.assertEqual(read_fused_kpi_values(kpis, queries, docs_per_query), [{employee: 12}, {employee: 4}, {employee: 3}])
@@ -0,0 +1,55 @@
+from datetime import date, datetime, timedelta
+import pytz
+from django.test import TestCase
+from evaluation.utils.business_days import (
+    count_working_days,
+    count_working_days_many,
+    previous_working_day,
+)
+
+
+def legacy_working_days(start_date, end_date, excluded_days, holidays=()):
+    # Recorrido día a día usado antes del conteo por bitmask
+    days_considered = 0
+    non_considered_days = 0
+    d = start_date
+    while d <= end_date:
+        if d.weekday() not in excluded_days and d not in holidays:
+            days_considered += 1
+        else:
+            non_considered_days += 1
+        d += timedelta(days=1)
+    return days_considered, non_considered_days
+
+
+class BusinessDaysTestCase(TestCase):
+    def test_matches_day_by_day_count(self):
+        holidays = (date(2025, 1, 1), date(2025, 3, 3), date(2025, 3, 4), date(2025, 5, 3))
+        start = date(2024, 12, 20)
+        for excluded in ([5, 6], [1, 3, 5, 6], [], [6]):
+            for length in range(0, 400, 7):
+                end = start + timedelta(days=length)
+                self.assertEqual(
+                    count_working_days(start, end, excluded, holidays),
+                    legacy_working_days(start, end, excluded, holidays)
+                )
+
+    def test_uses_ecuador_local_days(self):
+        tz = pytz.timezone('UTC')
+        start = tz.localize(datetime(2025, 1, 1, 5, 0, 0))
+        end = tz.localize(datetime(2025, 2, 1, 4, 59, 59, 999000))
+        self.assertEqual(count_working_days(start, end, ["Saturday", "Sunday"]), (23, 8))
+
+    def test_vectorized_matches_scalar(self):
+        holidays = (date(2025, 1, 1), date(2025, 5, 1))
+        ranges = [(date(2025, m, 1), date(2025, m, 28)) for m in range(1, 13)]
+        expected = [count_working_days(s, e, [5, 6], holidays) for s, e in ranges]
+        self.assertEqual(count_working_days_many(ranges, [5, 6], holidays), expected)
+
+    def test_previous_working_day_skips_holidays(self):
+        monday = date(2025, 3, 10)
+        self.assertEqual(previous_working_day(monday, 1, ["Saturday", "Sunday"]), date(2025, 3, 7))
+        self.assertEqual(
+            previous_working_day(monday, 1, ["Saturday", "Sunday"], (date(2025, 3, 7),)),
+            date(2025, 3, 6)
+        )
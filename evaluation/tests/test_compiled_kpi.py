@@ -0,0 +1,80 @@
+from datetime import date, datetime
+from bson import ObjectId
+from django.test import TestCase
+from evaluation.services.kpi_calculator import (
+    build_excluded_days_stages,
+    build_formula_stages,
+    build_fused_kpi_queries,
+    build_month_bucket,
+    compile_kpi,
+    read_fused_kpi_values,
+    to_local_month,
+)
+
+
+class CompiledKpiTestCase(TestCase):
+    kpi_data = {
+        "_id": "65f0c0ffee0000000000000a",
+        "Campo_a_evaluar": "Monto",
+        "Formula": "sum",
+        "Objetivo": "10",
+        "Filtro_de_fecha": "Fecha_de_cierre",
+        "Filters": [{"key": "Estado", "value": "Cerrado"}],
+        "Dias_no_laborables": ["Saturday", "Sunday"],
+    }
+
+    def test_reused_until_definition_changes(self):
+        compiled = compile_kpi(dict(self.kpi_data))
+        self.assertIs(compile_kpi(dict(self.kpi_data, Nombre="Ventas")), compiled)
+
+        changed = compile_kpi(dict(self.kpi_data, Objetivo=20))
+        self.assertIsNot(changed, compiled)
+        self.assertEqual(changed.target, 20.0)
+
+    def test_object_id_filter_is_not_its_hex_string(self):
+        oid = ObjectId()
+        by_oid = compile_kpi(dict(self.kpi_data, Filters=[{"key": "Canal", "value": oid}]))
+        by_str = compile_kpi(dict(self.kpi_data, Filters=[{"key": "Canal", "value": str(oid)}]))
+        self.assertIsNot(by_oid, by_str)
+
+    def test_precomputed_pipeline(self):
+        compiled = compile_kpi(self.kpi_data)
+        self.assertEqual(compiled.target, 10.0)
+        self.assertEqual(compiled.working_days_mask, 0b0011111)
+        self.assertEqual(
+            compiled.roster_stages,
+            build_excluded_days_stages("Fecha_de_cierre", [5, 6])
+            + build_formula_stages("Monto", "sum", group_key="$colaboradorId")
+        )
+
+        task_oid, colaborador = ObjectId(), ObjectId()
+        start, end = datetime(2025, 1, 1), datetime(2025, 1, 31)
+        self.assertEqual(compiled.build_match(task_oid, str(colaborador), start, end), {
+            "TaskId": task_oid,
+            "colaboradorId": colaborador,
+            "Estado": "Cerrado",
+            "Fecha_de_cierre": {"$gte": start, "$lte": end},
+        })
+
+    def test_missing_field(self):
+        with self.assertRaises(ValueError):
+            compile_kpi({"Formula": "count"})
+
+    def test_monthly_buckets(self):
+        compiled = compile_kpi(self.kpi_data)
+        self.assertEqual(
+            compiled.monthly_stages,
+            build_excluded_days_stages("Fecha_de_cierre", [5, 6])
+            + build_formula_stages("Monto", "sum", group_key=build_month_bucket("Fecha_de_cierre"))
+        )
+
+        colaborador = ObjectId()
+        queries = build_fused_kpi_queries(ObjectId(), [self.kpi_data], [colaborador], None, None, by_month=True)
+        self.assertEqual(queries[0][1][1:], compiled.monthly_stages)
+
+        # Inicio del mes local de Guayaquil (UTC-5) tal como lo devuelve pymongo
+        docs = [{"_id": datetime(2025, 1, 1, 5), "value": 4}, {"_id": datetime(2025, 2, 1, 5), "value": 7}]
+        self.assertEqual(
+            read_fused_kpi_values([self.kpi_data], queries, [docs], key=to_local_month),
+            [{date(2025, 1, 1): 4, date(2025, 2, 1): 7}]
+        )
@@ -0,0 +1,129 @@
+import os
+import random
+import time
+from collections import defaultdict
+from unittest import skipUnless
+from django.test import TestCase
+from evaluation.services.evaluations_analysis import calculate_data_sections
+
+
+# Implementación anterior (doble recorrido por sección), como referencia de la salida esperada
+def legacy_calculate_data_sections(resultados):
+    # 1️⃣ Agrupar datos por sección con totales y cuenta, y guardar título
+    medias_por_seccion = {}
+    for resultado in resultados:
+        for seccion in resultado.get("notas_por_seccion", []):
+            seccion_id = seccion["_id"]
+            if seccion_id not in medias_por_seccion:
+                medias_por_seccion[seccion_id] = {
+                    "total": 0,
+                    "count": 0,
+                    "titulo": seccion.get("titulo", "")
+                }
+            medias_por_seccion[seccion_id]["total"] += seccion.get("nota_seccion", 0)
+            medias_por_seccion[seccion_id]["count"] += 1
+
+    # 2️⃣ Calcular promedio por sección
+    promedio_por_seccion = {
+        seccion_id: round(data["total"] / data["count"], 2) if data["count"] > 0 else 0
+        for seccion_id, data in medias_por_seccion.items()
+    }
+
+    # 3️⃣ Construir estructura dataSections
+    data_sections = []
+    for seccion_id, data in medias_por_seccion.items():
+        titulo = data["titulo"]
+        media = promedio_por_seccion.get(seccion_id, 0)
+
+        # Reunir todos los KPIs para la sección
+        all_kpis = []
+        for resultado in resultados:
+            for seccion in resultado.get("notas_por_seccion", []):
+                if seccion["_id"] == seccion_id:
+                    all_kpis.extend(seccion.get("detalles_kpis", []))
+
+        # Agrupar KPIs por _id para promediar notas ponderadas
+        kpi_map = defaultdict(lambda: {"total": 0, "count": 0, "name": ""})
+        for kpi in all_kpis:
+            kpi_id = kpi["_id"]
+            kpi_map[kpi_id]["total"] += kpi.get("nota_ponderada", 0)
+            kpi_map[kpi_id]["count"] += 1
+            if not kpi_map[kpi_id]["name"]:
+                kpi_map[kpi_id]["name"] = kpi.get("kpi", "")
+
+        # Crear lista final de KPIs con promedio
+        kpis = []
+        for kpi_id, kpi_data in kpi_map.items():
+            avg_value = round(kpi_data["total"] / kpi_data["count"], 2) if kpi_data["count"] > 0 else 0
+            kpis.append({
+                "_id": kpi_id,
+                "name": kpi_data["name"],
+                "ranking": "",
+                "value": avg_value,
+                "oldValue": 50,
+                "color": "",
+                "colorRanking": ""
+            })
+
+        data_sections.append({
+            "_id": seccion_id,
+            "name": titulo,
+            "ranking": "",
+            "value": media,
+            "oldValue": 50,
+            "color": "",
+            "colorRanking": "",
+            "selected": False,
+            "kpis": kpis
+        })
+
+    return data_sections
+
+
+
+def build_roster(employees, sections, kpis_per_section, seed=7):
+    rng = random.Random(seed)
+    resultados = []
+    for e in range(employees):
+        notas_por_seccion = []
+        for s in range(sections):
+            # Algunos colaboradores no tienen todos los KPIs de la sección
+            detalles = [
+                {"_id": f"k{s}_{k}", "kpi": f"KPI {s}.{k}", "nota_ponderada": rng.uniform(0, 25)}
+                for k in range(kpis_per_section) if rng.random() > 0.1
+            ]
+            notas_por_seccion.append({
+                "_id": f"s{s}", "titulo": f"Sección {s}", "nota_seccion": rng.uniform(0, 100), "detalles_kpis": detalles
+            })
+        rng.shuffle(notas_por_seccion)
+        resultados.append({"_id": f"e{e}", "notas_por_seccion": notas_por_seccion})
+    return resultados
+
+
+class DataSectionsTestCase(TestCase):
+    def test_matches_previous_implementation(self):
+        resultados = build_roster(60, 6, 4)
+        resultados.append({"_id": "sin_secciones", "notas_por_seccion": []})
+        resultados.append({"_id": "kpi_sin_nombre", "notas_por_seccion": [
+            {"_id": "s0", "nota_seccion": 10, "detalles_kpis": [{"_id": "k_extra", "nota_ponderada": 3}]}
+        ]})
+        self.assertEqual(calculate_data_sections(resultados), legacy_calculate_data_sections(resultados))
+        self.assertEqual(calculate_data_sections([]), [])
+
+    def test_matches_previous_implementation_1k_employees_10_sections(self):
+        resultados = build_roster(1000, 10, 5)
+        self.assertEqual(calculate_data_sections(resultados), legacy_calculate_data_sections(resultados))
+
+    @skipUnless(os.environ.get("RUN_BENCHMARKS"), "Medición de tiempos: solo con RUN_BENCHMARKS=1")
+    def test_benchmark_1k_employees_10_sections(self):
+        resultados = build_roster(1000, 10, 5)
+
+        start = time.perf_counter()
+        legacy_calculate_data_sections(resultados)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        calculate_data_sections(resultados)
+        current_time = time.perf_counter() - start
+
+        self.assertLess(current_time, legacy_time, f"anterior {legacy_time * 1000:.1f} ms, actual {current_time * 1000:.1f} ms")
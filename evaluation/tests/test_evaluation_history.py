@@ -0,0 +1,35 @@
+from datetime import datetime
+from bson import ObjectId
+from django.test import TestCase
+from pymongo import UpdateOne
+from evaluation.services.services_evaluation_history import (
+    build_upserts,
+    get_evaluation_filter,
+    get_metric_kpi_filter,
+)
+
+
+class EvaluationHistoryUpsertTestCase(TestCase):
+    def test_metric_kpi_filter_uses_document_fields(self):
+        employee, kpi = ObjectId(), ObjectId()
+        start, end = datetime(2025, 1, 6, 5), datetime(2025, 1, 7, 4, 59, 59)
+        data = {"employeeId": employee, "kpiId": kpi, "labelId": "", "Nota": 80,
+                "Fecha_de_inicio": start, "Fecha_de_fin": end}
+
+        self.assertEqual(
+            get_metric_kpi_filter(data),
+            {"employeeId": employee, "kpiId": kpi, "Fecha_de_inicio": start, "Fecha_de_fin": end},
+        )
+        self.assertEqual(
+            build_upserts([data], get_metric_kpi_filter),
+            [UpdateOne(get_metric_kpi_filter(data), {"$set": data}, upsert=True)],
+        )
+
+    def test_evaluation_filter(self):
+        data = {"employee_id": "e1", "evaluacion_id": "ev", "filter_name": "ultimo_mes",
+                "start_date": "2025-01-01", "end_date": "2025-01-31", "nota_final": 75}
+        self.assertEqual(
+            get_evaluation_filter(data),
+            {"employee_id": "e1", "evaluacion_id": "ev", "filter_name": "ultimo_mes",
+             "start_date": "2025-01-01", "end_date": "2025-01-31"},
+        )
@@ -0,0 +1,39 @@
+import threading
+from django.test import TestCase
+from evaluation.utils.executor import FairExecutor
+
+
+class FairExecutorTestCase(TestCase):
+    def test_map_keeps_order_and_runs_nested_work_inline(self):
+        executor = FairExecutor(max_workers=4, max_pending=8)
+
+        def outer(n):
+            # El trabajo anidado se ejecuta en el mismo hilo del pool
+            return sum(executor.map("tenant", lambda m: m * n, range(3))), threading.current_thread().name
+
+        results = executor.map("tenant", outer, range(20))
+        self.assertEqual([total for total, _ in results], [3 * n for n in range(20)])
+        self.assertTrue(all(name.startswith("evaluation-worker-") for _, name in results))
+        self.assertLessEqual(len(executor._threads), 4)
+
+    def test_propagates_exceptions(self):
+        executor = FairExecutor(max_workers=2, max_pending=4)
+        with self.assertRaises(ZeroDivisionError):
+            executor.map(None, lambda n: 1 / n, [1, 0, 2])
+
+    def test_round_robin_between_tenants(self):
+        executor = FairExecutor(max_workers=1, max_pending=100)
+        started, gate = threading.Event(), threading.Event()
+        order = []
+
+        # El único hilo queda ocupado mientras se encolan las tareas de ambos tenants
+        blocker = executor.submit("a", lambda: started.set() or gate.wait())
+        started.wait()
+        futures = [executor.submit("a", order.append, f"a{i}") for i in range(3)]
+        futures += [executor.submit("b", order.append, f"b{i}") for i in range(3)]
+        gate.set()
+        blocker.result()
+        for future in futures:
+            future.result()
+
+        self.assertEqual(order, ["a0", "b0", "a1", "b1", "a2", "b2"])
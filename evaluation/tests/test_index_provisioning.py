@@ -0,0 +1,56 @@
+from django.test import TestCase
+from evaluation.services.index_provisioning import (
+    METRIC_KPI_HISTORY_KEYS,
+    UNIQUE_INDEX_OPTIONS,
+    build_duplicates_pipeline,
+    get_kpi_tasklog_indexes,
+    get_unique_index_name,
+    has_index_options,
+)
+from evaluation.services.index_verification import get_history_lookups, get_plan_indexes, get_plan_stages
+
+
+class IndexProvisioningTestCase(TestCase):
+    def test_tasklog_indexes_from_kpis(self):
+        kpis = [
+            {"Filtro_de_fecha": "Fecha_de_cierre", "Filters": [{"key": "Estado", "value": "Cerrado"}]},
+            {"Filtro_de_fecha": "Fecha_de_cierre", "Filters": []},
+            {"Filters": [{"key": "Zona", "value": "Norte"}, {"key": "Estado", "value": "Abierto"}]},
+        ]
+        self.assertEqual(get_kpi_tasklog_indexes(kpis), [
+            (("TaskId", 1), ("colaboradorId", 1), ("Fecha_de_cierre", 1)),
+            (("TaskId", 1), ("colaboradorId", 1), ("Estado", 1), ("Fecha_de_cierre", 1)),
+            (("TaskId", 1), ("colaboradorId", 1), ("Fecha_de_creacion", 1)),
+            (("TaskId", 1), ("colaboradorId", 1), ("Estado", 1), ("Zona", 1), ("Fecha_de_creacion", 1)),
+        ])
+
+    def test_unique_history_index_options(self):
+        options = UNIQUE_INDEX_OPTIONS[METRIC_KPI_HISTORY_KEYS]
+        self.assertFalse(has_index_options({"name": "employeeId_1_kpiId_1", "v": 2}, options))
+        self.assertTrue(has_index_options({"name": "employeeId_1_kpiId_1", "unique": True, **options}, options))
+        self.assertEqual(get_unique_index_name(METRIC_KPI_HISTORY_KEYS),
+                         "employeeId_1_kpiId_1_Fecha_de_inicio_1_Fecha_de_fin_1_unique")
+
+    def test_duplicates_pipeline(self):
+        options = UNIQUE_INDEX_OPTIONS[METRIC_KPI_HISTORY_KEYS]
+        pipeline = build_duplicates_pipeline(METRIC_KPI_HISTORY_KEYS, options, {"Fecha_de_creacion": -1})
+        self.assertEqual(pipeline[0], {"$match": {"employeeId": {"$exists": True}}})
+        self.assertEqual(pipeline[1], {"$sort": {"Fecha_de_creacion": -1}})
+        self.assertEqual(pipeline[2]["$group"]["_id"], {
+            "employeeId": "$employeeId", "kpiId": "$kpiId", "Fecha_de_inicio": "$Fecha_de_inicio", "Fecha_de_fin": "$Fecha_de_fin",
+        })
+        self.assertEqual(pipeline[-1], {"$match": {"n": {"$gt": 1}}})
+        self.assertNotIn("$sort", [next(iter(stage)) for stage in build_duplicates_pipeline(METRIC_KPI_HISTORY_KEYS, options)])
+
+    def test_history_lookups_match_index_prefixes(self):
+        fields = {description: list(query) for _, description, query in get_history_lookups()}
+        self.assertEqual(fields["resultado de KPI de métricas"], [k for k, _ in METRIC_KPI_HISTORY_KEYS])
+        self.assertEqual(fields["rollups diarios"], ["employeeId", "kpiId", "Fecha_de_inicio"])
+        self.assertEqual(fields["notas de evaluación"], ["colaboradorId", "$or"])
+
+    def test_plan_stages(self):
+        plan = {"queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "a_1_b_1"}}}
+        self.assertEqual(get_plan_stages(plan), ["FETCH", "IXSCAN"])
+        self.assertEqual(get_plan_indexes(plan), ["a_1_b_1"])
+        self.assertEqual(get_plan_stages({"stage": "SUBPLAN", "inputStage": {"stage": "OR", "inputStages": [
+            {"stage": "COLLSCAN"}, {"stage": "IXSCAN", "indexName": "x_1"}]}}), ["SUBPLAN", "OR", "COLLSCAN", "IXSCAN"])
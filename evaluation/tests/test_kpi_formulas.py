@@ -0,0 +1,59 @@
+from django.test import TestCase
+from evaluation.services.kpi_calculator import apply_kpi_formula, to_mongo_day_of_week
+from evaluation.services.kpi_formulas import KPI_FORMULAS, get_formula
+
+
+def legacy_apply_kpi_formula(values, formula):
+    # Implementación en Python puro usada antes del registro de fórmulas
+    if formula == "count":
+        return len(values)
+    elif formula == "count_distinct":
+        return len(set(values))
+    elif formula == "sum":
+        numeric_values = []
+        for val in values:
+            if isinstance(val, str):
+                try:
+                    val = float(val)
+                except ValueError:
+                    continue
+            if isinstance(val, (int, float)):
+                numeric_values.append(val)
+        return sum(numeric_values)
+    raise ValueError(f"Invalid KPI formula: {formula}")
+
+
+class KpiFormulasTestCase(TestCase):
+    values = [1, 2.5, "3", " 4.5 ", "abc", "", True, "1e2", 2, "2", {"a": 1}, -1]
+
+    def test_matches_legacy_formulas(self):
+        for formula in ("count", "count_distinct", "sum"):
+            values = [v for v in self.values if not isinstance(v, dict)]
+            self.assertAlmostEqual(apply_kpi_formula(values, formula), legacy_apply_kpi_formula(values, formula))
+
+    def test_new_aggregates(self):
+        values = ["10", 20, "x", 30, 0]
+        self.assertEqual(apply_kpi_formula(values, "avg"), 15)
+        self.assertEqual(apply_kpi_formula(values, "min"), 0)
+        self.assertEqual(apply_kpi_formula(values, "max"), 30)
+        self.assertEqual(apply_kpi_formula(values, "median"), 15)
+        self.assertEqual(apply_kpi_formula(values, "rate"), 75)
+        self.assertEqual(apply_kpi_formula(values, "p50"), 15)
+        self.assertEqual(apply_kpi_formula([], "avg"), 0)
+
+    def test_percentile_names(self):
+        self.assertIs(get_formula("percentile_90"), KPI_FORMULAS["percentile_90"])
+        self.assertEqual(apply_kpi_formula(list(range(101)), "percentil_90"), 90)
+        for name in ("p101", "percentile_", "mode", None):
+            with self.assertRaises(ValueError):
+                get_formula(name)
+
+    def test_additive_formulas(self):
+        self.assertEqual({name for name, f in KPI_FORMULAS.items() if f.additive}, {"count", "sum"})
+
+    def test_finalize_pushed_values(self):
+        self.assertEqual(get_formula("median").finalize([3.0, None, 1.0, 2.0]), 2)
+        self.assertEqual(get_formula("sum").finalize(None), 0)
+
+    def test_mongo_day_of_week(self):
+        self.assertEqual([to_mongo_day_of_week(i) for i in range(7)], [2, 3, 4, 5, 6, 7, 1])
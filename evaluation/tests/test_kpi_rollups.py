@@ -0,0 +1,26 @@
+from datetime import date, datetime
+import pytz
+from django.test import TestCase
+from evaluation.services.kpi_rollups import build_windows, local_day_end, local_day_start
+
+
+class RollupWindowsTestCase(TestCase):
+    def setUp(self):
+        self.start = local_day_start(date(2025, 3, 1))
+        self.end = local_day_end(date(2025, 3, 31))
+
+    def test_contiguous_days_are_merged(self):
+        days = [date(2025, 3, 3), date(2025, 3, 4), date(2025, 3, 5), date(2025, 3, 10), date(2025, 3, 12)]
+        windows = build_windows(days, self.start, self.end)
+
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(windows[0], (local_day_start(date(2025, 3, 3)), local_day_end(date(2025, 3, 5))))
+        self.assertEqual(windows[2], (local_day_start(date(2025, 3, 12)), local_day_end(date(2025, 3, 12))))
+
+    def test_windows_are_clipped_to_range(self):
+        end = pytz.utc.localize(datetime(2025, 3, 31, 12, 0, 0))
+        windows = build_windows([date(2025, 3, 31)], self.start, end)
+        self.assertEqual(windows, [(local_day_start(date(2025, 3, 31)), end)])
+
+    def test_no_days_no_windows(self):
+        self.assertEqual(build_windows([], self.start, self.end), [])
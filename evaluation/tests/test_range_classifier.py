@@ -0,0 +1,44 @@
+from django.test import TestCase
+from evaluation.services import custom_performance
+from evaluation.services.custom_performance import RangeClassifier, get_evaluation_range_by_percentage
+
+
+class RangeClassifierTestCase(TestCase):
+    ranges = [
+        {"title": "Alto", "color": "#00FF00", "minValue": 90, "maxValue": 100},
+        {"title": "Bajo", "color": "#FF0000", "minValue": 0, "maxValue": 60},
+        {"title": "Medio", "color": "#FFFF00", "minValue": 60, "maxValue": 90},
+    ]
+
+    def test_classify(self):
+        classifier = RangeClassifier(self.ranges)
+        self.assertEqual(classifier.classify(59.9)["title"], "Bajo")
+        self.assertEqual(classifier.classify(60)["title"], "Medio")
+        self.assertEqual(classifier.classify(100)["title"], "Alto")
+        self.assertEqual(classifier.classify(140)["title"], "Alto")
+        self.assertIsNone(classifier.classify(-5))
+        self.assertIsNone(RangeClassifier([]).classify(50))
+
+    def test_shared_min_value_keeps_first(self):
+        classifier = RangeClassifier(self.ranges + [{"title": "Medio bis", "color": "#000", "minValue": 60, "maxValue": 90}])
+        self.assertEqual(classifier.classify(75)["title"], "Medio")
+        self.assertEqual(classifier.classify_many([75])[0]["title"], "Medio")
+
+    def test_classify_many_matches_classify(self):
+        classifier = RangeClassifier(self.ranges)
+        scores = [-5, 0, 30.5, 59.99, 60, 89.9, 90, 99.99, 100, 100.01, 250]
+        self.assertEqual(classifier.classify_many(scores), [classifier.classify(s) for s in scores])
+        self.assertEqual(RangeClassifier([]).classify_many([10, 100]), [None, None])
+
+    def test_cached_classifier(self):
+        custom_performance.invalidate_range_classifier()
+        self.assertIsNone(custom_performance.get_cached_range_classifier("acme"))
+
+        classifier = custom_performance.cache_range_classifier("acme", self.ranges)
+        self.assertIs(custom_performance.get_range_classifier("acme"), classifier)
+        self.assertEqual(get_evaluation_range_by_percentage(75, "acme")["title"], "Medio")
+        with self.assertRaises(ValueError):
+            get_evaluation_range_by_percentage(-1, "acme")
+
+        custom_performance.invalidate_range_classifier("acme")
+        self.assertIsNone(custom_performance.get_cached_range_classifier("acme"))
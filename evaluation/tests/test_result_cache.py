@@ -0,0 +1,64 @@
+from datetime import datetime
+from django.test import TestCase, override_settings
+from evaluation.services.custom_performance import RangeClassifier
+from evaluation.services.result_cache import (
+    get_evaluation_stamp,
+    get_evaluation_task_ids,
+    get_inputs_stamp,
+    get_ranges_stamp,
+    get_result_key,
+    lookup_cached_results,
+    store_cached_results,
+)
+
+
+def make_evaluation(peso=100):
+    return {
+        "_id": "65f0c0ffee00000000000001",
+        "Secciones": [
+            {"_id": "s1", "Peso": peso, "KpisSeccion": [
+                {"_id": "k1", "Task": "t2"},
+                {"_id": "k2", "Task": "t1"},
+                {"_id": "k3", "Task": "t2"},
+                {"_id": "k4", "Tipo": "Manual"},
+            ]},
+        ],
+    }
+
+
+class ResultCacheTestCase(TestCase):
+    period = (datetime(2025, 1, 6), datetime(2025, 1, 6, 23, 59, 59))
+
+    def test_result_key_includes_resolved_range(self):
+        self.assertEqual(
+            get_result_key("tn", "ev", "e1", *self.period),
+            "tenant:tn:evalresult:ev:e1:2025-01-06T00:00:00:2025-01-06T23:59:59",
+        )
+
+    def test_evaluation_stamp_follows_definition(self):
+        self.assertEqual(get_evaluation_stamp(make_evaluation()), get_evaluation_stamp(make_evaluation()))
+        self.assertNotEqual(get_evaluation_stamp(make_evaluation()), get_evaluation_stamp(make_evaluation(peso=50)))
+        self.assertEqual(get_evaluation_task_ids(make_evaluation()), ["t1", "t2"])
+
+    def test_inputs_stamp_follows_notes_and_profile(self):
+        profile = {"_id": "e1", "Nombres": "Ana", "Cargo": "Analista"}
+        notes = {("k4", None): {"kpiId": "k4", "Nota": 80}, ("k4", "l1"): {"kpiId": "k4", "labelId": "l1", "Nota": 80}}
+        stamp = get_inputs_stamp(profile, notes)
+
+        self.assertEqual(stamp, get_inputs_stamp(dict(profile), dict(notes)))
+        self.assertNotEqual(stamp, get_inputs_stamp({**profile, "Cargo": "Jefe"}, notes))
+        self.assertNotEqual(stamp, get_inputs_stamp(profile, {**notes, ("k4", None): {"kpiId": "k4", "Nota": 90}}))
+
+    def test_ranges_stamp_follows_ranges(self):
+        ranges = [{"title": "Bueno", "color": "#0f0", "minValue": 70, "maxValue": 100}]
+        self.assertEqual(get_ranges_stamp(RangeClassifier(ranges)), get_ranges_stamp(RangeClassifier(list(ranges))))
+        self.assertNotEqual(
+            get_ranges_stamp(RangeClassifier(ranges)),
+            get_ranges_stamp(RangeClassifier([{**ranges[0], "minValue": 80}]))
+        )
+
+    @override_settings(EVALUATION_RESULT_CACHE=False)
+    def test_disabled_cache_is_always_a_miss(self):
+        self.assertEqual(lookup_cached_results("tn", make_evaluation(), ["e1"], *self.period), ({}, {}))
+        # Sin sellos no se guarda nada (ni se abre conexión a Redis)
+        store_cached_results("tn", "ev", {"e1": {"nota_final": 80}}, {}, *self.period)
@@ -0,0 +1,84 @@
+from datetime import datetime
+from django.test import TestCase
+from evaluation.services.evaluations_analysis import (
+    build_roster_page_response,
+    parse_roster_query,
+    select_roster_rows_to_compute,
+)
+
+
+def make_row(employee_id, nombre, nota):
+    return {
+        "_id": employee_id,
+        "colaborador": f"{nombre} ",
+        "departamento": "Ventas",
+        "cargo": "Asesor",
+        "nota_final": nota,
+        "desempenio": "",
+        "color": "",
+        "notas_por_seccion": [{"_id": "s1", "titulo": "General", "nota_seccion": nota, "detalles_kpis": []}],
+    }
+
+
+class RosterPaginationTestCase(TestCase):
+    evaluados = ["e1", "e2", "e3", "e4"]
+    employees = {
+        "e1": {"_id": "e1", "Nombres": "Diana"},
+        "e2": {"_id": "e2", "Nombres": "Ana"},
+        "e3": {"_id": "e3", "Nombres": "Carla"},
+        "e4": {"_id": "e4", "Nombres": "Beto"},
+    }
+    history = {
+        "e1": {"employee_id": "e1", "nota_final": 80, "desempenio": "", "color": "",
+               "notas_por_seccion": [{"_id": "s1", "titulo": "General", "nota_seccion": 80, "detalles_kpis": []}]},
+        "e3": {"employee_id": "e3", "nota_final": 40, "desempenio": "", "color": "",
+               "notas_por_seccion": [{"_id": "s1", "titulo": "General", "nota_seccion": 40, "detalles_kpis": []}]},
+    }
+    period = (datetime(2025, 1, 1), datetime(2025, 1, 31), 23)
+
+    def test_parse_roster_query(self):
+        self.assertEqual(parse_roster_query(None, None, None), (None, 50, "-nota_final"))
+        self.assertEqual(parse_roster_query("2", "10", "colaborador"), (2, 10, "colaborador"))
+        for page, page_size, sort_by in ((0, 10, None), (1, 0, None), ("x", 10, None), (1, 10, "Sueldo")):
+            with self.assertRaises(ValueError):
+                parse_roster_query(page, page_size, sort_by)
+
+    def test_profile_sort_computes_only_page_rows(self):
+        compute_ids, page_ids = select_roster_rows_to_compute(
+            self.evaluados, self.employees, self.history, "colaborador", False, 1, 2
+        )
+        self.assertEqual(page_ids, ["e2", "e4"])
+        self.assertEqual(compute_ids, ["e2", "e4"])
+
+        compute_ids, page_ids = select_roster_rows_to_compute(
+            self.evaluados, self.employees, self.history, "colaborador", False, 2, 2
+        )
+        self.assertEqual(page_ids, ["e3", "e1"])
+        self.assertEqual(compute_ids, [])
+
+    def test_score_sort_uses_stored_summaries(self):
+        compute_ids, page_ids = select_roster_rows_to_compute(
+            self.evaluados, self.employees, self.history, "nota_final", True, 1, 2
+        )
+        self.assertIsNone(page_ids)
+        self.assertEqual(compute_ids, ["e2", "e4"])
+
+        computed = {"e2": make_row("e2", "Ana", 90), "e4": make_row("e4", "Beto", 40)}
+        response = build_roster_page_response(
+            self.evaluados, self.employees, self.history, computed, None, "nota_final", True, 2, 2, *self.period
+        )
+        self.assertEqual([r["_id"] for r in response["resultados"]], ["e4", "e3"])
+        self.assertEqual(response["totalPages"], 2)
+        self.assertEqual(response["currentPage"], 2)
+        self.assertEqual(response["media_evaluacion"], 62.5)
+        self.assertEqual(response["medias_por_seccion"], [{"_id": "s1", "media": 62.5}])
+        self.assertFalse(response["partialSummary"])
+
+    def test_profile_sort_flags_partial_summary(self):
+        computed = {"e2": make_row("e2", "Ana", 90), "e4": make_row("e4", "Beto", 40)}
+        response = build_roster_page_response(
+            self.evaluados, self.employees, {}, computed, ["e2", "e4"], "colaborador", False, 1, 2, *self.period
+        )
+        self.assertEqual(response["evaluatedEmployees"], 2)
+        self.assertTrue(response["partialSummary"])
+        self.assertEqual(response["media_evaluacion"], 65)
@@ -0,0 +1,68 @@
+import json
+from datetime import date
+from django.test import TestCase
+from evaluation.tasks import next_chunk_size, split_by_colaborador
+from evaluation.utils.redis_helper import get_event_due_timestamp
+from evaluation.utils.tasklog_stream import (
+    decode_tasklog_event,
+    encode_tasklog_event,
+    get_pending_key,
+    get_processing_key,
+    parse_entry_id,
+    split_exhausted_events,
+)
+
+
+class TasklogStreamTestCase(TestCase):
+    payload = {"_id": "68226bb3b6756f3d39a73082", "TaskId": "67b64b0a441df99098206a4e",
+               "colaboradorId": "67b61998441df9909820070c", "Ultima_actualizacion": "2025-04-01T18:57:07.366Z"}
+
+    def test_round_trip(self):
+        fields = encode_tasklog_event("chasqi", self.payload)
+        self.assertEqual(decode_tasklog_event(fields), ("chasqi", self.payload))
+
+    def test_payload_sent_as_json_text(self):
+        fields = encode_tasklog_event("chasqi", json.dumps(self.payload))
+        self.assertEqual(decode_tasklog_event(fields), ("chasqi", self.payload))
+
+        with self.assertRaises(ValueError):
+            decode_tasklog_event({"tenant": "chasqi", "payload": "[1, 2]"})
+
+    def test_entry_ids_sort_numerically(self):
+        self.assertLess(parse_entry_id("999-5"), parse_entry_id("1000-0"))
+        self.assertIsNone(parse_entry_id(None))
+
+    def test_drain_budget(self):
+        self.assertEqual(next_chunk_size(0, 500, 20000, deadline=50, now=0), 500)
+        self.assertEqual(next_chunk_size(19800, 500, 20000, deadline=50, now=10), 200)
+        self.assertEqual(next_chunk_size(20000, 500, 20000, deadline=50, now=10), 0)
+        self.assertEqual(next_chunk_size(100, 500, 20000, deadline=50, now=50), 0)
+
+    def test_exhausted_events_after_max_deliveries(self):
+        entries = [("1-0", {"tenant": "a"}), ("2-0", {"tenant": "b"}), ("3-0", {"tenant": "c"})]
+        retry, exhausted = split_exhausted_events(entries, {"1-0": 6, "2-0": 5}, max_deliveries=5)
+        self.assertEqual(retry, [("2-0", {"tenant": "b"}), ("3-0", {"tenant": "c"})])
+        self.assertEqual(exhausted, [("1-0", {"tenant": "a"})])
+
+    def test_split_by_colaborador(self):
+        eventos = [("1-0", "a", {}), ("2-0", "b", {}), ("3-0", "a", {}), ("4-0", "c", {})]
+        self.assertEqual(
+            split_by_colaborador(eventos, 2),
+            [[("1-0", "a", {}), ("3-0", "a", {}), ("2-0", "b", {})], [("4-0", "c", {})]],
+        )
+        self.assertEqual(split_by_colaborador([], 2), [])
+
+    def test_event_due_timestamp(self):
+        self.assertEqual(get_event_due_timestamp(self.payload, 60), 1743533827.366 + 60)
+        self.assertEqual(get_event_due_timestamp({"Fecha_de_creacion": "2025-04-01T18:57:07Z"}, 0), 1743533827)
+        self.assertEqual(get_event_due_timestamp({}, 60), 0)
+        self.assertEqual(get_event_due_timestamp({"Ultima_actualizacion": "no es fecha"}, 60), 0)
+
+    def test_coalescing_keys(self):
+        # Un hash de pendientes por tenant, tarea, colaborador y día local; uno en proceso por entrada del stream
+        pending_key = get_pending_key("chasqi", self.payload["TaskId"], self.payload["colaboradorId"], date(2025, 4, 1))
+        self.assertEqual(
+            pending_key,
+            "tasklog_events:pending:chasqi:67b64b0a441df99098206a4e:67b61998441df9909820070c:2025-04-01",
+        )
+        self.assertEqual(get_processing_key(pending_key, "1-0"), f"{pending_key}:1-0")
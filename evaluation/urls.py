@@ -7,6 +7,7 @@ urlpatterns = [
     path('sections-with-kpis/', views.group_secctions_and_kpis, name='group_secctions_and_kpis'),
     path('timeline-employee-evaluation/', views.timeline_employee_evaluation, name='timeline-employee-evaluation'),
     path('evaluate/', views.evaluate, name='evaluate'),
+    path('evaluate/async/', views.evaluate_async, name='evaluate-async'),
     path('get-employee-evaluations', views.get_employee_evaluations, name='get-employee-evaluations'),
     path('save-main-evaluation/', views.save_main_employee_evaluation, name='save-main-employee-evaluation'),
     path('webhook/tasklog/', views.recibir_tasklog_trigger, name='recibir_tasklog_trigger'),
@@ -0,0 +1,152 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pytz
+
+# Zona horaria de Ecuador
+TIMEZONE = pytz.timezone("America/Guayaquil")
+
+# Mapeo de días en Python: 0 = lunes, 1 = martes, ..., 6 = domingo
+DAY_NAME_TO_INDEX = {
+    "Monday": 0,
+    "Tuesday": 1,
+    "Wednesday": 2,
+    "Thursday": 3,
+    "Friday": 4,
+    "Saturday": 5,
+    "Sunday": 6
+}
+
+ALL_DAYS_MASK = 0b1111111
+
+
+def parse_excluded_days(excluded_days: Optional[Iterable]) -> List[int]:
+    """
+    Normaliza los días no laborables a índices de Python (0 = lunes ... 6 = domingo).
+    Acepta nombres en inglés ("Saturday") o índices ya convertidos.
+    """
+    indices = []
+    for day in excluded_days or []:
+        if isinstance(day, int) and 0 <= day <= 6:
+            indices.append(day)
+        elif day in DAY_NAME_TO_INDEX:
+            indices.append(DAY_NAME_TO_INDEX[day])
+    return indices
+
+
+def working_days_mask(excluded_days: Optional[Iterable]) -> int:
+    """
+    Bitmask de días laborables: el bit i está encendido si el día i de la semana se trabaja.
+    """
+    mask = ALL_DAYS_MASK
+    for day in parse_excluded_days(excluded_days):
+        mask &= ~(1 << day)
+    return mask
+
+
+def to_local_date(value) -> date:
+    """
+    Convierte un datetime (aware o naive) o un date al día calendario local de Ecuador.
+    """
+    if isinstance(value, datetime):
+        return value.astimezone(TIMEZONE).date() if value.tzinfo else value.date()
+    return value
+
+
+def count_working_days(start_date, end_date, excluded_days: Optional[Iterable],
+                       holidays: Optional[Sequence[date]] = None, mask: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Cuenta en tiempo constante los días laborables y no laborables entre dos fechas (inclusive).
+
+    :param excluded_days: Días no laborables (nombres o índices).
+    :param holidays: Feriados del tenant como secuencia ORDENADA de `date`
+                     (ver `get_tenant_holidays`). Un feriado que cae en día laborable
+                     se cuenta como no laborable.
+    :param mask: Opcional. Bitmask ya calculado con `working_days_mask(excluded_days)`.
+    :return: (dias_considerados, dias_no_considerados)
+    """
+    start_day = to_local_date(start_date)
+    end_day = to_local_date(end_date)
+
+    total_days = (end_day - start_day).days + 1
+    if total_days <= 0:
+        return 0, 0
+
+    if mask is None:
+        mask = working_days_mask(excluded_days)
+
+    # Semanas completas aportan siempre la misma cantidad de días laborables
+    full_weeks, remainder = divmod(total_days, 7)
+    days_considered = full_weeks * bin(mask).count("1")
+
+    first_weekday = start_day.weekday()
+    for offset in range(remainder):
+        if mask >> ((first_weekday + offset) % 7) & 1:
+            days_considered += 1
+
+    # Restar feriados que caen en días laborables dentro del rango
+    if holidays:
+        lo = bisect_left(holidays, start_day)
+        hi = bisect_right(holidays, end_day)
+        for holiday in holidays[lo:hi]:
+            if mask >> holiday.weekday() & 1:
+                days_considered -= 1
+
+    return days_considered, total_days - days_considered
+
+
+def count_working_days_many(ranges: Sequence[Tuple], excluded_days: Optional[Iterable],
+                            holidays: Optional[Sequence[date]] = None) -> List[Tuple[int, int]]:
+    """
+    Versión vectorizada de `count_working_days` para muchos rangos a la vez usando
+    `numpy.busday_count`. Devuelve una lista de (dias_considerados, dias_no_considerados).
+    """
+    if not ranges:
+        return []
+
+    mask = working_days_mask(excluded_days)
+    if mask == 0:
+        # numpy no acepta una semana sin días hábiles
+        return [(0, max((to_local_date(e) - to_local_date(s)).days + 1, 0)) for s, e in ranges]
+
+    weekmask = [bool(mask >> day & 1) for day in range(7)]
+    starts = np.array([to_local_date(s) for s, _ in ranges], dtype="datetime64[D]")
+    # busday_count excluye el día final, por eso se suma un día
+    ends = np.array([to_local_date(e) for _, e in ranges], dtype="datetime64[D]") + np.timedelta64(1, "D")
+    ends = np.maximum(ends, starts)
+
+    holiday_array = np.array(list(holidays or []), dtype="datetime64[D]")
+    considered = np.busday_count(starts, ends, weekmask=weekmask, holidays=holiday_array)
+    totals = (ends - starts).astype(int)
+
+    return [(int(c), int(t - c)) for c, t in zip(considered, totals)]
+
+
+def is_working_day(day: date, excluded_days: Optional[Iterable],
+                   holidays: Optional[Sequence[date]] = None) -> bool:
+    day = to_local_date(day)
+    if not working_days_mask(excluded_days) >> day.weekday() & 1:
+        return False
+    if holidays:
+        idx = bisect_left(holidays, day)
+        return not (idx < len(holidays) and holidays[idx] == day)
+    return True
+
+
+def previous_working_day(from_date, count: int, excluded_days: Optional[Iterable],
+                         holidays: Optional[Sequence[date]] = None):
+    """
+    Retrocede `count` días laborables desde `from_date` (sin contar el propio día).
+    Conserva el tipo y la zona horaria del valor recibido.
+    """
+    if working_days_mask(excluded_days) == 0:
+        raise ValueError("La evaluación no tiene días laborables configurados")
+
+    current = from_date
+    found = 0
+    while found < count:
+        current -= timedelta(days=1)
+        if is_working_day(current, excluded_days, holidays):
+            found += 1
+    return current
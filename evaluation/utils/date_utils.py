@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 import pytz
 from dateutil.relativedelta import relativedelta
+from evaluation.utils.business_days import previous_working_day
 
 # Zona horaria de Ecuador
 TIMEZONE = pytz.timezone("America/Guayaquil")
@@ -16,23 +17,14 @@ LUXON_DAY_NAMES = {
     'Sunday': 6
 }
 
-def calculate_evaluation_range(filter_range, excluded_days):
+def calculate_evaluation_range(filter_range, excluded_days, holidays=None):
     now = datetime.now(TIMEZONE)
     start = None
     end = None
 
-    def is_workday(date):
-        day_name = date.strftime('%A')  # e.g., 'Monday'
-        return day_name not in excluded_days
-
     def get_previous_workday(from_date, count):
-        date = from_date
-        found = 0
-        while found < count:
-            date -= timedelta(days=1)
-            if is_workday(date):
-                found += 1
-        return date
+        # Mismo criterio de día laborable que el conteo de días (bitmask + feriados del tenant)
+        return previous_working_day(from_date, count, excluded_days, holidays)
 
     if filter_range == "dia_anterior":
         start = get_previous_workday(now, 1).replace(hour=0, minute=0, second=0, microsecond=0)
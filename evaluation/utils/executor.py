@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Iterable, List, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_worker_context = threading.local()
+
+
+class FairExecutor:
+    """
+    Pool de hilos acotado y compartido por todo el proceso.
+
+    - Las tareas se encolan por tenant y los hilos toman una tarea de cada tenant por turno
+      (round robin), así un tenant con mucho trabajo no deja esperando a los demás.
+    - La cola total es limitada: `submit` se bloquea cuando está llena (backpressure).
+    - Una tarea que se envía desde un hilo del pool se ejecuta en el mismo hilo. Así el
+      paralelismo anidado (empleados → secciones → KPIs) no crea hilos nuevos ni puede
+      bloquear el pool esperando tareas que nunca arrancan.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, name: str = "evaluation"):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.name = name
+        self._queues = OrderedDict()  # {tenant_id: deque[(future, fn, args, kwargs)]}
+        self._pending = 0
+        self._idle = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._threads = []
+
+    @staticmethod
+    def in_worker() -> bool:
+        return getattr(_worker_context, "executor", None) is not None
+
+    def submit(self, tenant_id: Optional[str], fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+
+        if self.in_worker():
+            self._run(future, fn, args, kwargs)
+            return future
+
+        with self._not_full:
+            while self._pending >= self.max_pending:
+                self._not_full.wait()
+            self._queues.setdefault(tenant_id, deque()).append((future, fn, args, kwargs))
+            self._pending += 1
+            self._start_worker_if_needed()
+            self._not_empty.notify()
+
+        return future
+
+    def map(self, tenant_id: Optional[str], fn: Callable, *iterables: Iterable) -> List[Any]:
+        # Igual que `list(ThreadPoolExecutor.map(...))`: resultados en orden, propaga la primera excepción
+        if self.in_worker():
+            return [fn(*args) for args in zip(*iterables)]
+
+        futures = [self.submit(tenant_id, fn, *args) for args in zip(*iterables)]
+        return [future.result() for future in futures]
+
+    def _start_worker_if_needed(self):
+        # Los hilos se crean a demanda hasta `max_workers` y se mantienen vivos
+        if self._idle < self._pending and len(self._threads) < self.max_workers:
+            thread = threading.Thread(
+                target=self._worker, name=f"{self.name}-worker-{len(self._threads)}", daemon=True
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_task(self):
+        # Round robin: toma la primera tarea del primer tenant y lo manda al final de la fila
+        tenant_id, queue = next(iter(self._queues.items()))
+        task = queue.popleft()
+        if queue:
+            self._queues.move_to_end(tenant_id)
+        else:
+            del self._queues[tenant_id]
+        self._pending -= 1
+        self._not_full.notify()
+        return task
+
+    def _worker(self):
+        _worker_context.executor = self
+        while True:
+            with self._not_empty:
+                self._idle += 1
+                while not self._pending:
+                    self._not_empty.wait()
+                self._idle -= 1
+                future, fn, args, kwargs = self._next_task()
+            self._run(future, fn, args, kwargs)
+
+    @staticmethod
+    def _run(future: Future, fn: Callable, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+
+_shared_executor = None
+_shared_executor_pid = None
+_shared_executor_lock = threading.Lock()
+
+
+def get_executor() -> FairExecutor:
+    """
+    Retorna el pool compartido del proceso. Su tamaño no supera el pool de conexiones
+    de MongoDB para que los hilos nunca esperen una conexión libre. Los hilos no sobreviven
+    a un fork: un proceso hijo (worker prefork) crea su propio pool.
+    """
+    global _shared_executor, _shared_executor_pid
+    if _shared_executor is None or _shared_executor_pid != os.getpid():
+        with _shared_executor_lock:
+            if _shared_executor is None or _shared_executor_pid != os.getpid():
+                from evaluation.mongo_client import get_client
+
+                max_pool_size = get_client().options.pool_options.max_pool_size or settings.EVALUATION_EXECUTOR_WORKERS
+                max_workers = max(1, min(settings.EVALUATION_EXECUTOR_WORKERS, max_pool_size))
+                _shared_executor = FairExecutor(max_workers, settings.EVALUATION_EXECUTOR_MAX_PENDING)
+                _shared_executor_pid = os.getpid()
+                logger.info("Pool de evaluación: %s hilos, %s tareas en cola", max_workers,
+                            settings.EVALUATION_EXECUTOR_MAX_PENDING)
+    return _shared_executor
+
+
+def run_parallel(tenant_id: Optional[str], fn: Callable, *iterables: Iterable) -> List[Any]:
+    return get_executor().map(tenant_id, fn, *iterables)
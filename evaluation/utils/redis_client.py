@@ -1,4 +1,7 @@
+import asyncio
+import weakref
 import redis
+import redis.asyncio as aioredis
 from django.conf import settings
 
 redis_client = redis.StrictRedis(
@@ -6,4 +9,25 @@ redis_client = redis.StrictRedis(
     port=settings.REDIS_PORT,
     db=settings.REDIS_DB,
     decode_responses=True
-)
\ No newline at end of file
+)
+
+# Clientes asíncronos: cada event loop necesita el suyo (ver `close_async_redis_client`)
+_async_redis_clients = weakref.WeakKeyDictionary()
+
+def get_async_redis_client():
+    loop = asyncio.get_running_loop()
+    client = _async_redis_clients.get(loop)
+    if client is None:
+        client = aioredis.StrictRedis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True
+        )
+        _async_redis_clients[loop] = client
+    return client
+
+async def close_async_redis_client():
+    client = _async_redis_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -1,16 +1,22 @@
-from datetime import datetime, timezone
+from datetime import timezone
 from dateutil.parser import parse as parse_date
 
-def is_event_stale(iso_date_str, buffer_minutes=0.5):
+def get_event_datetime(payload):
+    # Última actualización (o creación) del tasklog como datetime aware; None si falta o no es válida
+    iso_date_str = payload.get("Ultima_actualizacion") or payload.get("Fecha_de_creacion")
     if not iso_date_str:
-        return False
+        return None
     try:
-        fecha = parse_date(iso_date_str)  # puede ser aware
-        now = datetime.now(timezone.utc)  # 👈 hazlo aware también
-        print(f"⌛ UTC ahora: {now.isoformat()}")
-        diff = (now - fecha).total_seconds()
-        print(f"🕒 Diferencia exacta: {diff:.2f} segundos")
-        return diff > (buffer_minutes * 60)
-    except Exception as e:
+        fecha = parse_date(iso_date_str)
+    except (TypeError, ValueError, OverflowError) as e:
         print(f"❌ Error parseando fecha: {e}")
-        return False
\ No newline at end of file
+        return None
+    return fecha if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+
+def get_event_due_timestamp(payload, buffer_seconds):
+    """
+    Momento (epoch) desde el que un evento de tasklog puede procesarse: su última
+    actualización más el margen. Sin fecha válida, de inmediato.
+    """
+    fecha = get_event_datetime(payload)
+    return fecha.timestamp() + buffer_seconds if fecha else 0
@@ -0,0 +1,393 @@
+"""
+Cola de eventos de tasklog en un Redis Stream con grupo de consumidores.
+
+Un evento entra al stream cuando vence su margen (`TASKLOG_EVENT_BUFFER_SECONDS` desde su
+`Ultima_actualizacion` / `Fecha_de_creacion`); antes espera en un sorted set con la fecha de
+vencimiento como score, del que `run_tasklog_scheduler` mueve solo los vencidos.
+
+Los eventos se agrupan al llegar: los payloads pendientes de un mismo (tenant, TaskId, colaboradorId,
+día local) se guardan en un hash (uno por tasklog `_id`) y a la cola entra un solo token por hash,
+así una ráfaga de actualizaciones de un colaborador y día provoca un solo recálculo. Los duplicados
+exactos (`_id` + `Ultima_actualizacion`) se descartan con SET NX.
+
+Cada worker lee con XREADGROUP un lote disjunto de eventos y los confirma (XACK + XDEL) solo
+después de procesarlos. Los que quedan pendientes (worker caído o grupo con error) los reclama
+otro consumidor con XAUTOCLAIM cuando superan `TASKLOG_STREAM_CLAIM_IDLE_MS`. Una entrada
+entregada más de `TASKLOG_STREAM_MAX_DELIVERIES` veces se aparta en `tasklog_events:dead`.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import pytz
+from django.conf import settings
+from redis.exceptions import ResponseError
+from evaluation.utils.redis_client import redis_client
+from evaluation.utils.business_days import to_local_date
+from evaluation.utils.redis_helper import get_event_datetime, get_event_due_timestamp
+
+logger = logging.getLogger(__name__)
+
+TASKLOG_STREAM = "tasklog_events:stream"
+TASKLOG_GROUP = "evaluation"
+# Eventos que no se pueden decodificar (o que fallan en cada entrega): se apartan para revisarlos sin bloquear la cola
+TASKLOG_DEAD_STREAM = "tasklog_events:dead"
+# Cursor de XAUTOCLAIM entre corridas: recorre toda la lista de pendientes, no solo las primeras
+TASKLOG_CLAIM_CURSOR = "tasklog_events:claim_cursor"
+# Eventos que todavía no cumplen su margen: {evento: timestamp de vencimiento}
+TASKLOG_DELAYED = "tasklog_events:delayed"
+# Payloads pendientes por (tenant, tarea, colaborador, día local): {tasklog _id: payload}
+TASKLOG_PENDING_PREFIX = "tasklog_events:pending"
+# Marcas de eventos ya recibidos (tasklog _id + fecha de actualización)
+TASKLOG_SEEN_PREFIX = "tasklog_events:seen"
+# Lista usada antes del stream; se vacía hacia el stream al consumir
+LEGACY_TASKLOG_LIST = "tasklog_events"
+
+# Los payloads tomados por un consumidor se conservan hasta confirmar su entrada (o reclamarla)
+PROCESSING_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Mueve al stream, de forma atómica, hasta ARGV[2] eventos diferidos con vencimiento <= ARGV[1]
+PROMOTE_DUE_EVENTS = redis_client.register_script("""
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, member in ipairs(due) do
+    local fields = {}
+    for k, v in pairs(cjson.decode(member)) do
+        table.insert(fields, k)
+        table.insert(fields, v)
+    end
+    redis.call('XADD', KEYS[2], '*', unpack(fields))
+    redis.call('ZREM', KEYS[1], member)
+end
+return #due
+""")
+
+# Agrega un payload a su hash de pendientes.
+# KEYS: hash de pendientes, sorted set de diferidos, marca de duplicado
+# ARGV: campo (tasklog _id), payload, token, vencimiento, usar marca (0/1), TTL de la marca
+# Retorna -1 si es un duplicado exacto, 1 si el hash es nuevo (hay que encolar el token) y 0 si no.
+COALESCE_EVENT = redis_client.register_script("""
+if ARGV[5] == '1' and not redis.call('SET', KEYS[3], '1', 'NX', 'EX', tonumber(ARGV[6])) then
+    return -1
+end
+local existed = redis.call('EXISTS', KEYS[1])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+if existed == 0 then
+    return 1
+end
+-- Si el token sigue diferido, su vencimiento se posterga hasta el del evento más reciente
+if redis.call('ZSCORE', KEYS[2], ARGV[3]) then
+    redis.call('ZADD', KEYS[2], 'GT', ARGV[4], ARGV[3])
+end
+return 0
+""")
+
+# Toma los payloads pendientes de un token. Al reclamar la entrada se devuelven los mismos.
+# KEYS: hash de pendientes, hash en proceso de la entrada; ARGV: TTL
+TAKE_PENDING = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return {}
+    end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    redis.call('EXPIRE', KEYS[2], tonumber(ARGV[1]))
+end
+return redis.call('HVALS', KEYS[2])
+""")
+
+
+# Elimina del grupo, de forma atómica, los consumidores sin entradas pendientes inactivos hace más de ARGV[1] ms
+# (procesos terminados: cada worker usa `host:pid`). KEYS: stream; ARGV: inactividad, grupo, consumidor actual
+REMOVE_IDLE_CONSUMERS = redis_client.register_script("""
+local removed = 0
+for _, consumer in ipairs(redis.call('XINFO', 'CONSUMERS', KEYS[1], ARGV[2])) do
+    local info = {}
+    for i = 1, #consumer, 2 do
+        info[consumer[i]] = consumer[i + 1]
+    end
+    if info['name'] ~= ARGV[3] and info['pending'] == 0 and info['idle'] > tonumber(ARGV[1]) then
+        redis.call('XGROUP', 'DELCONSUMER', KEYS[1], ARGV[2], info['name'])
+        removed = removed + 1
+    end
+end
+return removed
+""")
+
+
+def get_consumer_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def ensure_consumer_group() -> None:
+    try:
+        redis_client.xgroup_create(TASKLOG_STREAM, TASKLOG_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def encode_tasklog_event(tenant_id: str, payload: Any) -> Dict[str, str]:
+    return {"tenant": tenant_id, "payload": payload if isinstance(payload, str) else json.dumps(payload)}
+
+
+def decode_payload(raw: str) -> Dict[str, Any]:
+    # El payload llega como objeto JSON desde el webhook, o como texto JSON desde otros productores
+    payload = json.loads(raw)
+    if isinstance(payload, str):
+        payload = json.loads(payload)
+    if not isinstance(payload, dict):
+        raise ValueError("El payload del evento no es un objeto")
+    return payload
+
+
+def decode_tasklog_event(fields: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+    return fields.get("tenant"), decode_payload(fields["payload"])
+
+
+def get_fields_due_timestamp(fields: Dict[str, str]) -> float:
+    try:
+        _, payload = decode_tasklog_event(fields)
+    except (KeyError, TypeError, ValueError):
+        return 0  # Inválido: al stream de inmediato, el consumidor lo aparta
+    return get_event_due_timestamp(payload, settings.TASKLOG_EVENT_BUFFER_SECONDS)
+
+
+def route_tasklog_event(client, fields: Dict[str, str], due: float, now: float) -> None:
+    # Al stream si ya venció su margen; si no, al sorted set de diferidos (`client` puede ser un pipeline)
+    if due <= now:
+        client.xadd(TASKLOG_STREAM, fields)
+    else:
+        client.zadd(TASKLOG_DELAYED, {json.dumps(fields, sort_keys=True): due})
+
+
+def get_pending_key(tenant_id: str, task_id: str, colaborador_id: str, local_date) -> str:
+    return f"{TASKLOG_PENDING_PREFIX}:{tenant_id}:{task_id}:{colaborador_id}:{local_date.isoformat()}"
+
+
+def get_seen_key(tenant_id: str, tasklog_id: str, updated_at: Optional[str]) -> str:
+    return f"{TASKLOG_SEEN_PREFIX}:{tenant_id}:{tasklog_id}:{updated_at or ''}"
+
+
+def get_processing_key(pending_key: str, entry_id: str) -> str:
+    return f"{pending_key}:{entry_id}"
+
+
+def publish_tasklog_event(tenant_id: str, payload: Any) -> int:
+    """
+    Encola el evento agrupándolo con los pendientes del mismo colaborador, tarea y día local.
+
+    :return: -1 si era un duplicado exacto, 1 si encoló un token nuevo, 0 si se agregó a uno pendiente.
+    """
+    fields = encode_tasklog_event(tenant_id, payload)
+    now = time.time()
+    try:
+        payload = decode_payload(fields["payload"])
+    except (TypeError, ValueError):
+        redis_client.xadd(TASKLOG_STREAM, fields)  # El consumidor lo aparta
+        return 1
+
+    event_date = get_event_datetime(payload)
+    due = event_date.timestamp() + settings.TASKLOG_EVENT_BUFFER_SECONDS if event_date else 0
+    task_id, colaborador_id = payload.get("TaskId"), payload.get("colaboradorId")
+    if not (tenant_id and task_id and colaborador_id):
+        route_tasklog_event(redis_client, fields, due, now)
+        return 1
+
+    pending_key = get_pending_key(tenant_id, task_id, colaborador_id, to_local_date(event_date or datetime.now(pytz.utc)))
+    tasklog_id = payload.get("_id")
+    seen_key = get_seen_key(tenant_id, tasklog_id, payload.get("Ultima_actualizacion") or payload.get("Fecha_de_creacion"))
+    token = {"tenant": tenant_id, "pending": pending_key}
+
+    result = COALESCE_EVENT(
+        keys=[pending_key, TASKLOG_DELAYED, seen_key],
+        args=[
+            str(tasklog_id) if tasklog_id else hashlib.md5(fields["payload"].encode()).hexdigest(),
+            fields["payload"], json.dumps(token, sort_keys=True), due,
+            1 if tasklog_id else 0, settings.TASKLOG_DEDUPE_TTL_SECONDS,
+        ]
+    )
+    if result == 1:
+        route_tasklog_event(redis_client, token, due, now)
+    return result
+
+
+def take_pending_payloads(tokens: List[Tuple[str, Dict[str, str]]]) -> Dict[str, Tuple[str, List[str]]]:
+    # Payloads de cada token en un solo pipeline: {entry_id: (hash en proceso, [payloads])}
+    if not tokens:
+        return {}
+    pipe = redis_client.pipeline(transaction=False)
+    processing_keys = []
+    for entry_id, fields in tokens:
+        processing_key = get_processing_key(fields["pending"], entry_id)
+        TAKE_PENDING(keys=[fields["pending"], processing_key], args=[PROCESSING_TTL_SECONDS], client=pipe)
+        processing_keys.append(processing_key)
+    return {
+        entry_id: (processing_key, values)
+        for (entry_id, _), processing_key, values in zip(tokens, processing_keys, pipe.execute())
+    }
+
+
+def promote_due_events(limit: int) -> int:
+    return PROMOTE_DUE_EVENTS(keys=[TASKLOG_DELAYED, TASKLOG_STREAM], args=[time.time(), limit])
+
+
+def get_next_due_timestamp():
+    entries = redis_client.zrange(TASKLOG_DELAYED, 0, 0, withscores=True)
+    return entries[0][1] if entries else None
+
+
+def expand_tasklog_entries(entries: List[Tuple[str, Dict[str, str]]]) -> List[Tuple[str, Optional[str], List[Dict[str, Any]], Optional[str]]]:
+    """
+    Resuelve las entradas leídas del stream: los tokens traen los payloads agrupados de su hash,
+    los eventos sueltos traen su propio payload.
+
+    :return: [(entry_id, tenant, [payloads], hash en proceso o None)]. Un evento suelto que no se
+             puede decodificar llega con `payloads = None` para que el consumidor lo aparte.
+    """
+    taken = take_pending_payloads([(entry_id, fields) for entry_id, fields in entries if "pending" in fields])
+
+    expanded = []
+    for entry_id, fields in entries:
+        if entry_id in taken:
+            processing_key, values = taken[entry_id]
+            payloads = []
+            for value in values:
+                try:
+                    payloads.append(decode_payload(value))
+                except (TypeError, ValueError) as e:
+                    logger.warning("Payload inválido en %s: %s", processing_key, str(e))
+            expanded.append((entry_id, fields.get("tenant"), payloads, processing_key))
+            continue
+        try:
+            tenant, payload = decode_tasklog_event(fields)
+            expanded.append((entry_id, tenant, [payload], None))
+        except (KeyError, TypeError, ValueError):
+            expanded.append((entry_id, fields.get("tenant"), None, None))
+    return expanded
+
+
+def migrate_legacy_events(count: int, limit: int) -> int:
+    # Pasa al stream los eventos que quedaron en la lista anterior (LPUSH: el más antiguo está a la derecha).
+    # RPOP con `count` saca cada lote de forma atómica; como mucho `limit` eventos por corrida.
+    moved = 0
+    while moved < limit:
+        raw_events = redis_client.rpop(LEGACY_TASKLOG_LIST, min(count, limit - moved))
+        if not raw_events:
+            return moved
+        pipe = redis_client.pipeline(transaction=False)
+        now = time.time()
+        for raw_event in raw_events:
+            try:
+                event = json.loads(raw_event)
+                fields = encode_tasklog_event(event.get("tenant") or "", event["payload"])
+                route_tasklog_event(pipe, fields, get_fields_due_timestamp(fields), now)
+            except (KeyError, TypeError, ValueError) as e:
+                pipe.xadd(TASKLOG_DEAD_STREAM, {"raw": raw_event, "error": str(e)})
+        pipe.execute()
+        moved += len(raw_events)
+    return moved
+
+
+def claim_stale_events(consumer: str, count: int) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    Entradas entregadas hace más de `TASKLOG_STREAM_CLAIM_IDLE_MS` y nunca confirmadas.
+    Cada corrida sigue desde donde quedó la anterior (vuelve a "0-0" al terminar la lista),
+    así un bloque de entradas que siempre fallan no impide reclamar las que vienen después.
+    También elimina del grupo los consumidores inactivos que ya no tienen pendientes.
+    """
+    response = redis_client.xautoclaim(
+        TASKLOG_STREAM, TASKLOG_GROUP, consumer,
+        min_idle_time=settings.TASKLOG_STREAM_CLAIM_IDLE_MS,
+        start_id=redis_client.get(TASKLOG_CLAIM_CURSOR) or "0-0", count=count
+    )
+    redis_client.set(TASKLOG_CLAIM_CURSOR, response[0])
+
+    # Redis 6.2 devuelve sin campos las entradas ya eliminadas del stream: solo queda confirmarlas
+    deleted = [entry_id for entry_id, fields in response[1] if not fields]
+    if deleted:
+        redis_client.xack(TASKLOG_STREAM, TASKLOG_GROUP, *deleted)
+
+    # Los consumidores de procesos que ya no existen quedan sin pendientes tras el XAUTOCLAIM
+    removed = REMOVE_IDLE_CONSUMERS(
+        keys=[TASKLOG_STREAM], args=[settings.TASKLOG_STREAM_CLAIM_IDLE_MS, TASKLOG_GROUP, consumer]
+    )
+    if removed:
+        logger.info("%s consumidores inactivos eliminados del grupo %s", removed, TASKLOG_GROUP)
+    return [(entry_id, fields) for entry_id, fields in response[1] if fields]
+
+
+def get_delivery_counts(entry_ids: List[str]) -> Dict[str, int]:
+    # Veces que se entregó cada entrada pendiente (XPENDING), en un solo pipeline
+    if not entry_ids:
+        return {}
+    pipe = redis_client.pipeline(transaction=False)
+    for entry_id in entry_ids:
+        pipe.xpending_range(TASKLOG_STREAM, TASKLOG_GROUP, min=entry_id, max=entry_id, count=1)
+    return {p["message_id"]: p["times_delivered"] for result in pipe.execute() for p in result}
+
+
+def split_exhausted_events(entries: List[Tuple[str, Dict[str, str]]], delivery_counts: Dict[str, int],
+                           max_deliveries: int) -> Tuple[List[Tuple[str, Dict[str, str]]], List[Tuple[str, Dict[str, str]]]]:
+    # (entradas que se reintentan, entradas que superaron `max_deliveries` entregas)
+    retry, exhausted = [], []
+    for entry in entries:
+        (exhausted if delivery_counts.get(entry[0], 0) > max_deliveries else retry).append(entry)
+    return retry, exhausted
+
+
+def dead_letter_exhausted_events(entries: List[Tuple[str, Dict[str, str]]]) -> None:
+    # Se apartan con sus payloads agrupados (para reenviarlos a mano) y se confirman
+    if not entries:
+        return
+    fields_by_id = dict(entries)
+    processing_keys = []
+    for entry_id, _, payloads, processing_key in expand_tasklog_entries(entries):
+        fields = fields_by_id[entry_id]
+        if processing_key:
+            processing_keys.append(processing_key)
+            fields = {**fields, "payloads": json.dumps(payloads, default=str)}
+        dead_letter_event(entry_id, fields, f"Más de {settings.TASKLOG_STREAM_MAX_DELIVERIES} entregas sin confirmar")
+    ack_events([entry_id for entry_id, _ in entries], processing_keys)
+    logger.warning("%s eventos de tasklog apartados en %s tras fallar en cada entrega", len(entries), TASKLOG_DEAD_STREAM)
+
+
+def read_new_events(consumer: str, count: int) -> List[Tuple[str, Dict[str, str]]]:
+    response = redis_client.xreadgroup(TASKLOG_GROUP, consumer, {TASKLOG_STREAM: ">"}, count=count)
+    return [entry for _, entries in response for entry in entries]
+
+
+def ack_events(entry_ids: List[str], processing_keys: Optional[List[str]] = None) -> None:
+    # Confirmados y eliminados (con sus payloads en proceso): el stream solo guarda lo que falta procesar
+    if not entry_ids:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.xack(TASKLOG_STREAM, TASKLOG_GROUP, *entry_ids)
+    pipe.xdel(TASKLOG_STREAM, *entry_ids)
+    if processing_keys:
+        pipe.delete(*processing_keys)
+    pipe.execute()
+
+
+def dead_letter_event(entry_id: str, fields: Dict[str, str], error: str) -> None:
+    redis_client.xadd(TASKLOG_DEAD_STREAM, {**fields, "entry_id": entry_id, "error": error})
+
+
+def get_last_entry_id():
+    entries = redis_client.xrevrange(TASKLOG_STREAM, count=1)
+    return entries[0][0] if entries else None
+
+
+def parse_entry_id(entry_id):
+    # "1718000000000-3" → (1718000000000, 3), comparable en orden del stream
+    if entry_id is None:
+        return None
+    ms, seq = entry_id.split("-")
+    return int(ms), int(seq)
+
+
+def get_backlog() -> int:
+    return redis_client.xlen(TASKLOG_STREAM)
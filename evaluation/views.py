@@ -1,14 +1,21 @@
 from django.views.decorators.csrf import csrf_exempt
 from django_ratelimit.decorators import ratelimit
+from django.core.handlers.asgi import ASGIRequest
 from django.http import JsonResponse
 import json
 from bson import ObjectId
+from evaluation.mongo_client import close_async_client
+from evaluation.utils.redis_client import close_async_redis_client
 
 from evaluation.evaluate_strategy.strategy import (
     DepartmentBasedEvaluation,
     EvaluationBasedEvaluation,
     EmployeeBasedEvaluation,
-    EvaluationContext
+    EvaluationContext,
+    AsyncDepartmentBasedEvaluation,
+    AsyncEvaluationBasedEvaluation,
+    AsyncEmployeeBasedEvaluation,
+    AsyncEvaluationContext
 )
   
 from evaluation.services.departments_analysis import (
@@ -21,7 +28,8 @@ from evaluation.services.evaluations_analysis import (
     group_secctions_kpis,
     employee_evaluations,
     save_main_employee_evaluation_function,
-    get_timeline_employee_evaluation
+    get_timeline_employee_evaluation,
+    parse_roster_query
 )
 
 from evaluation.services.evaluation_cache import save_changed_tasklogs
@@ -141,6 +149,12 @@ def evaluate(request):
     if not tenant_id:
         return JsonResponse({"error": "Falta el parámetro tenantId"}, status=400)
 
+    # Paginación y orden de la nómina (solo evaluación completa); sin `page` se retorna todo
+    try:
+        page, page_size, sort_by = parse_roster_query(data.get('page'), data.get('pageSize'), data.get('sortBy'))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
     # Verifica si los datos llegaron correctamente
     print(f"Tenant ID: {tenant_id}, Evaluation ID: {evaluation_id}, Employee ID: {employee_id}, Department ID: {department_id},Filter Range: {filter_range}, Start Date: {start_date_str}, End Date: {end_date_str}")
 
@@ -152,7 +166,48 @@ def evaluate(request):
         strategy = EvaluationBasedEvaluation()
 
     context = EvaluationContext(strategy)
-    result = context.calculate(tenant_id, filter_range, start_date_str, end_date_str, employee_id, evaluation_id, department_id)
+    result = context.calculate(tenant_id, filter_range, start_date_str, end_date_str, employee_id, evaluation_id, department_id,
+                               page=page, page_size=page_size, sort_by=sort_by)
+
+    return JsonResponse(result, safe=False)
+
+@csrf_exempt
+async def evaluate_async(request):
+    # Mismos parámetros y respuesta que `evaluate`, con consultas asíncronas (servir con ASGI)
+    tenant_id = request.headers.get('x-tenant-id')
+    data = json.loads(request.body)
+    evaluation_id = data.get('evaluationId', None)
+    employee_id = data.get('employeeId', None)
+    department_id = data.get('departmentId', None)
+    filter_range = data.get('filterRange')
+    start_date_str = data.get('startDateE', None)
+    end_date_str = data.get('endDateE', None)
+
+    if not tenant_id:
+        return JsonResponse({"error": "Falta el parámetro tenantId"}, status=400)
+
+    # Paginación y orden de la nómina (solo evaluación completa); sin `page` se retorna todo
+    try:
+        page, page_size, sort_by = parse_roster_query(data.get('page'), data.get('pageSize'), data.get('sortBy'))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if department_id:
+        strategy = AsyncDepartmentBasedEvaluation()
+    elif employee_id:
+        strategy = AsyncEmployeeBasedEvaluation()
+    else:
+        strategy = AsyncEvaluationBasedEvaluation()
+
+    context = AsyncEvaluationContext(strategy)
+    try:
+        result = await context.calculate(tenant_id, filter_range, start_date_str, end_date_str, employee_id, evaluation_id, department_id,
+                                         page=page, page_size=page_size, sort_by=sort_by)
+    finally:
+        if not isinstance(request, ASGIRequest):
+            # Con WSGI la vista corre en un event loop propio: sus clientes no se vuelven a usar
+            await close_async_client()
+            await close_async_redis_client()
 
     return JsonResponse(result, safe=False)
 